@@ -1,669 +1,203 @@
 import streamlit as st
-import requests
+import http_client
+import telemetry
+from config import DEBUG_SIDEBAR
+from cutout import cutout_sources, warm_up as warm_cutouts
+from embeddings import index_images_background, model_loading, similar_outfits
+import palettes
+import typeahead
+from image_cache import (
+    cached_thumbnail_path, cached_thumbnail_url, lqip, thumbnail_path, thumbnail_urls, warm_thumbnails,
+)
+from engine import recommend_for_movie, recommend_for_song
+from media_api import (
+    DEFAULT_COUNTRY, OUTFIT_MAX_PAGES, OUTFIT_POOL_SIZE, get_country_lookups, get_movie_page,
+    get_outfit_images, get_outfit_page, get_provider_cache, get_streaming_platforms_batch,
+    outfit_query, prefetch_movie_page, prefetch_outfit_page, prefetch_outfit_pools,
+    prefetch_streaming_platforms,
+)
+from session_records import Outfit, compact_movies, compact_outfits, outfit_images
+from style_data import genre_options, style_to_brands
+from uploads import upload_image
+import os
 import urllib.parse
-import base64
-import json
-import time
-import random
-from PIL import Image
-from io import BytesIO
-import numpy as np
 import streamlit.components.v1 as components
-from streamlit_lottie import st_lottie
-from streamlit_js_eval import streamlit_js_eval
-
-# -------------------------------------------------------------------
-# Secrets & API Keys
-# -------------------------------------------------------------------
-QLOO_API_KEY        = st.secrets["api"]["qloo_key"]
-TMDB_API_KEY        = st.secrets["api"]["tmdb_key"]
-UNSPLASH_ACCESS_KEY = st.secrets["api"]["unsplash_key"]
-lastfm_API_KEY = st.secrets["api"]["lastfm_key"]
-SPOTIFY_CLIENT_ID = st.secrets["spotify"]["client_id"]
-SPOTIFY_CLIENT_SECRET = st.secrets["spotify"]["client_secret"]
-
-# -------------------------------------------------------------------
-# Style & Genre Mappings
-# -------------------------------------------------------------------
-genre_options = ["comedy","horror","romance","action","animation","crime","sci-fi","drama"]
-
-style_search_terms = {
-    "indie":       "indie aesthetic outfit",
-    "retro":       "retro fashion look",
-    "grunge":      "grunge style clothing",
-    "punk":        "punk outfit fashion",
-    "minimalist":  "minimalist outfit woman",
-    "techwear":    "techwear fashion look",
-    "cottagecore": "cottagecore outfit",
-    "fairycore":   "fairycore aesthetic clothes",
-    "cyberpunk":   "cyberpunk style clothes",
-    "soft girl":   "soft girl outfit aesthetic",
-    "streetwear":  "streetwear fashion",
-    "clean girl":  "clean girl fashion",
-    "gothic":      "gothic outfit",
-    "boho":        "boho fashion woman",
-    "vintage":     "vintage aesthetic look",
-    "dark academia":"dark academia outfit",
-    "avant-garde": "avant-garde fashion",
-    "90s-core":    "90s aesthetic outfit",
-    "maximalist":  "colorful maximalist fashion",
-    "classic":     "classic elegant fashion",
-    "preppy":      "preppy outfit aesthetic",
-    "normcore":    "normcore fashion",
-    "utilitarian": "utilitarian outfit",
-    "alt":         "alt fashion look",
-    "emo":         "emo aesthetic outfit",
-    "softcore":    "softcore aesthetic clothes",
-    "cozy":        "cozy aesthetic fashion",
-    "eclectic":    "eclectic fashion look",
-    "biker":       "biker outfit aesthetic",
-    "scandi":      "scandi fashion",
-    "y2k":         "y2k fashion",
-    "artcore":     "artcore fashion",
-    "experimental":"experimental outfit",
-    "conceptual":  "conceptual fashion"
-}
 
-style_to_brands = {
-    "indie":       ["Urban Outfitters","Monki","Lazy Oaf"],
-    "retro":       ["Beyond Retro","Levi's","Dickies"],
-    "normcore":    ["Uniqlo","Everlane","Muji"],
-    "cottagecore": ["Doen","Christy Dawn","Reformation"],
-    "vintage":     ["Depop","Thrifted","Rokit"],
-    "soft girl":   ["Brandy Melville","YesStyle","Princess Polly"],
-    "grunge":      ["Killstar","Disturbia","Hot Topic"],
-    "punk":        ["Tripp NYC","Punk Rave","AllSaints"],
-    "techwear":    ["Acronym","Nike ISPA","Guerrilla Group"],
-    "cyberpunk":   ["Demobaza","Y-3","Rick Owens"],
-    "gothic":      ["Killstar","The Black Angel","Punk Rave"],
-    "classic":     ["Ralph Lauren","J.Crew","Brooks Brothers"],
-    "preppy":      ["Tommy Hilfiger","GANT","Lacoste"],
-    "minimalist":  ["COS","Everlane","Arket"],
-    "streetwear":  ["Supreme","Stüssy","Palace"],
-    "boho":        ["Anthropologie","Spell","Free People"],
-    "fairycore":   ["Selkie","For Love & Lemons","Free People"],
-    "scandi":      ["Arket","Weekday","COS"],
-    "clean girl":  ["Skims","Aritzia","Zara"],
-    "avant-garde": ["Comme des Garçons","Maison Margiela","Rick Owens"],
-    "glam":        ["House of CB","Revolve","PrettyLittleThing"],
-    "maximalist":  ["Desigual","Moschino","The Attico"],
-    "90s-core":    ["Tommy Jeans","Fila","Champion"],
-    "dark academia":["Massimo Dutti","Ralph Lauren","Zara"]
-}
+# Import policy: keep top-level imports light. Heavy optional stacks (rembg,
+# onnxruntime, onnx, timm, replicate) are imported inside the functions that
+# use them; benchmarks/startup_bench.py fails if any of them load at startup.
 
-genre_to_tags = {
-    "comedy":    ["quirky","heartwarming","nostalgic"],
-    "horror":    ["dark","intense","surreal"],
-    "romance":   ["romantic","elegant","whimsical"],
-    "sci-fi":    ["futuristic","surreal","dramatic"],
-    "drama":     ["emotional","elegant","nostalgic"],
-    "action":    ["gritty","rebellious","intense"],
-    "animation": ["whimsical","quirky","nostalgic"],
-    "crime":     ["gritty","dark","minimalist"]
-}
+# Recommendation pipelines live in engine.py, network helpers in media_api.py,
+# mappings in style_data.py.
 
-music_to_tags = {
-    "pop":        ["quirky","whimsical"],
-    "rock":       ["gritty","rebellious"],
-    "electronic": ["futuristic","edgy"],
-    "jazz":       ["elegant","nostalgic"],
-    "classical":  ["elegant","minimalist"],
-    "hip-hop":    ["streetwear","edgy"]
-}
-
-tag_to_style = {
-    "quirky":      ["indie","retro","normcore"],
-    "romantic":    ["cottagecore","vintage","soft girl"],
-    "gritty":      ["grunge","punk","utilitarian"],
-    "futuristic":  ["techwear","cyberpunk"],
-    "dark":        ["gothic","alt","emo"],
-    "elegant":     ["classic","preppy","minimalist"],
-    "rebellious":  ["punk","streetwear","biker"],
-    "heartwarming":["softcore","cozy","vintage"],
-    "whimsical":   ["fairycore","boho","eclectic"],
-    "minimalist":  ["scandi","normcore","clean girl"],
-    "dramatic":    ["avant-garde","glam","maximalist"],
-    "nostalgic":   ["retro","vintage","90s-core"],
-    "intense":     ["military","dark academia","utilitarian"],
-    "surreal":     ["artcore","experimental","conceptual"],
-    "edgy":        ["streetwear","alt","y2k"]
-}
-
-# Genre to Tags
-# (other dictionaries omitted here to save space, same as previous version)
-# Include: genre_to_tags, music_to_tags, tag_to_style, style_to_brands
-# [Insert same dictionaries from your previous code here]
-@st.cache_data(ttl=600)
 def upload_to_imgbb(image_file):
+    # Deduplicated by content hash, downscaled if oversized, streamed (see uploads.py)
     api_key = st.secrets["imgbb"]["imgbb_api_key"]
-    url = "https://api.imgbb.com/1/upload"
-
-    # Read and encode image
-    image_bytes = image_file.read()
-    b64_encoded = base64.b64encode(image_bytes).decode("utf-8")
-
-    payload = {
-        "key": api_key,
-        "image": b64_encoded
-    }
-
-    response = requests.post(url, data=payload)
-    data = response.json()
-    return data["data"]["url"] if data.get("data") else None
+    return upload_image(image_file, api_key, getattr(image_file, "name", "upload.jpg"))
 
 @st.cache_data
 def load_lottie_url(url):
-    r = requests.get(url)
+    r = http_client.get(url)
     if r.status_code != 200:
         return None
     return r.json()
 
-def render_coverflow(images):
-    image_html = ''.join(f"<div class='slide'><img src='{url}' onclick=\"selectImage('{url}')\"></div>" for url in images)
-
-    html_code = f"""
-    <style>
-        .slider-container {{
-            position: relative;
-            width: 100%;
-            overflow: hidden;
-            padding: 10px 0;
-        }}
-        .slider {{
-            display: flex;
-            gap: 16px;
-            transition: transform 0.3s ease;
-            padding: 10px;
-            scroll-behavior: smooth;
-            overflow-x: auto;
-            scrollbar-width: none;
-            -ms-overflow-style: none;
-        }}
-        .slider::-webkit-scrollbar {{
-            display: none;
-        }}
-        .slide {{
-            flex: 0 0 auto;
-            width: 200px;
-            height: 300px;
-            border-radius: 12px;
-            overflow: hidden;
-            box-shadow: 0 6px 12px rgba(0,0,0,0.25);
-            cursor: pointer;
-            transition: transform 0.2s ease;
-        }}
-        .slide img {{
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-        }}
-        .slide:hover {{
-            transform: scale(1.05);
-        }}
-        .arrow {{
-            position: absolute;
-            top: 50%;
-            transform: translateY(-50%);
-            font-size: 32px;
-            color: #333;
-            background: rgba(255, 255, 255, 0.7);
-            border-radius: 50%;
-            padding: 4px 12px;
-            cursor: pointer;
-            z-index: 10;
-        }}
-        .arrow.left {{
-            left: 10px;
-        }}
-        .arrow.right {{
-            right: 10px;
-        }}
-    </style>
-    
-    <div class="slider-container">
-        <div class="arrow left" onclick="document.getElementById('slider').scrollBy({{left: -220, behavior: 'smooth'}})">&#10094;</div>
-        <div class="slider" id="slider">
-            {image_html}
-        </div>
-        <div class="arrow right" onclick="document.getElementById('slider').scrollBy({{left: 220, behavior: 'smooth'}})">&#10095;</div>
-    </div>
-
-    <script>
-    function selectImage(url) {{
-        const message = {{ type: 'SELECT_OUTFIT', url }};
-        window.parent.postMessage(message, '*');
-    }}
-    </script>
-    """
-
-    components.html(html_code, height=360, scrolling=False)
-    
-# -------------------------------------------------------------------
-# Helpers
-# -------------------------------------------------------------------
-def get_pexels_images(query, per_page=5):
-    try:
-        headers = {
-            "Authorization": st.secrets["api"]["pexels_key"]
-        }
-        params = {
-            "query": query,
-            "per_page": per_page
-        }
-        resp = requests.get("https://api.pexels.com/v1/search", headers=headers, params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            return [photo["src"]["medium"] for photo in data.get("photos", [])]
-    except:
-        return []
-    return []
-
-def get_pixabay_images(query, per_page=5):
-    try:
-        params = {
-            "key": st.secrets["api"]["pixabay_key"],
-            "q": query,
-            "image_type": "photo",
-            "per_page": per_page
-        }
-        resp = requests.get("https://pixabay.com/api/", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            return [img["webformatURL"] for img in data.get("hits", [])]
-    except:
-        return []
-    return []
-
-def qloo_search_entity(name, entity_type="movie"):
-    ENTITY_URN_TYPES = {
-        "movie": "urn:entity:movie",
-        "music": "urn:entity:artist",
-        "genre": "urn:entity:genre"
-    }
-
-    headers = {
-        "X-API-Key": QLOO_API_KEY
-    }
-    url = "https://hackathon.api.qloo.com/search"
-    params = {
-        "query": name.strip().title(),
-        "types": ENTITY_URN_TYPES.get(entity_type, "urn:entity:movie")
-    }
+# Virtualized coverflow (frontend/coverflow): lazy images with srcset and inline
+# LQIP placeholders; reports {"event": "more"} near the end and {"event": "select"}
+_coverflow = components.declare_component(
+    "coverflow", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "coverflow"))
 
-    try:
-        resp = requests.get(url, headers=headers, params=params)
-        if resp.status_code == 200:
-            results = resp.json().get("results", [])
-            if results:
-                return results[0].get("id")
-            else:
-                return None
-        else:
-            return None
-    except Exception as e:
-        return None
+COVERFLOW_EAGER = 8   # slides whose thumbnails are rendered before the first paint
 
+# Approximate pixel widths of each provider's image sizes, for srcset
+PROVIDER_WIDTHS = {
+    "unsplash": {"small": 400, "regular": 1080},
+    "pexels":   {"small": 350, "regular": 940},
+    "pixabay":  {"small": 640, "regular": 1280},
+}
 
-def get_qloo_recommendations(entity_urn):
-    headers = {
-        "X-API-Key": QLOO_API_KEY,
-        "Content-Type": "application/json"
-    }
-    url = "https://hackathon.api.qloo.com/v1/insights/recommendations"
-    payload = {
-        "entities": [entity_urn],
-        "type": "movie"
-    }
-
-    try:
-        resp = requests.post(url, headers=headers, json=payload)
-        if resp.status_code == 200:
-            data = resp.json()
-            return [rec["name"].lower() for rec in data.get("results", [])]
-        else:
-            return []
-    except Exception as e:
-        return []
-
-def get_style_tags_from_qloo(input_type, input_value, api_key, limit=5):
-    endpoint_map = {
-        "movie": "movies",
-        "music": "music",
-        "genre": "tags"
-    }
-
-    # Step 1: Search the entity
-    entity_type = endpoint_map.get(input_type)
-    if not entity_type:
-        return []
-
-    url = f"https://hackathon.api.qloo.com/v1/search"
-    headers = {
-        "X-API-Key": api_key,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "name": input_value,
-        "limit": 1
-    }
-    search_response = requests.post(url, headers=headers, json=payload)
-
-    if search_response.status_code != 200:
-        return []
-
-    entities = search_response.json().get("results", [])
-    
-    if not entities:
-        return []
-
-    entity = entities[0]
-    entity_id = entity.get("entity_id")
-
-    if not entity_id:
-        return []
-
-    # Step 2: Get related entities
-    related_url = f"https://hackathon.api.qloo.com/v1/{entity_type}/related"
-    payload = {
-        "entity_id": entity_id,
-        "limit": limit
-    }
-
-    related_response = requests.post(related_url, headers=headers, json=payload)
-    if related_response.status_code != 200:
-        return []
-
-    related_entities = related_response.json().get("results", [])
-
-    # Step 3: Extract and combine tags
-    style_tags = set()
-    for entity in related_entities:
-        for tag in entity.get("tags", []):
-            style_tags.add(tag.get("name"))
-
-    return list(style_tags)
-
+def coverflow_item(img):
+    urls = img["urls"]
+    regular = urls["regular"]
+    widths = PROVIDER_WIDTHS.get(img.get("provider"), PROVIDER_WIDTHS["unsplash"])
+    thumb = cached_thumbnail_url(regular, "coverflow")
+    srcset = [f"{thumb} 200w"] if thumb else []
+    if urls.get("small") and urls["small"] != regular:
+        srcset.append(f"{urls['small']} {widths['small']}w")
+    srcset.append(f"{regular} {widths['regular']}w")
+    return {"url": regular, "src": thumb or urls.get("small") or regular,
+            "srcset": ", ".join(srcset), "lqip": lqip(regular)}
+
+def is_new_select(event):
+    # Component values persist across reruns; only act on a click once
+    return (bool(event) and event.get("event") == "select"
+            and event.get("seq") != st.session_state.get("outfit_select_seq"))
+
+def is_new_more(event, loaded):
+    # Same once-only rule for "more"; seq must match the list the browser saw, so an
+    # event left over from before Refresh (or from a longer list) is ignored
+    return (bool(event) and event.get("event") == "more" and event.get("seq") == loaded
+            and event.get("nonce") != st.session_state.get("fitting_room_more_nonce"))
+
+def select_outfit(event, images):
+    st.session_state.outfit_select_seq = event.get("seq")
+    st.session_state.selected_outfit_url = event["url"]
+    st.session_state.selected_outfit = next(
+        (Outfit.from_image(img) for img in images if img["urls"]["regular"] == event["url"]), None)
+
+AS_TYPED = "As typed"
+
+def pick_suggestion(text, kinds, key):
+    # Local typeahead matches, or spelling corrections when nothing matches;
+    # AS_TYPED (the default) or None when there is nothing to pick
+    matches = typeahead.suggest(text, kinds)
+    prompt = "Suggestions:"
+    if not matches:
+        matches, prompt = typeahead.corrections(text, kinds), "Did you mean:"
+    if not matches:
+        return None
+    return st.radio(prompt, [AS_TYPED] + matches, horizontal=True,
+                    format_func=lambda e: e if e is AS_TYPED else typeahead.label(e),
+                    key=f"{key}:{typeahead.normalize(text)}")
+
+def resolve_input(text, picked, kinds):
+    # A picked suggestion, else only an unambiguous exact-name match: never a fuzzy substitute
+    if picked is not None and picked is not AS_TYPED:
+        return picked
+    return typeahead.exact(text, kinds) if text else None
+
+def render_coverflow(images, has_more=False, key=None):
+    # First screen rendered now, the rest warmed in the background for later reruns
+    regulars = [img["urls"]["regular"] for img in images]
+    thumbnail_urls(regulars[:COVERFLOW_EAGER], "coverflow")
+    warm_thumbnails(regulars[COVERFLOW_EAGER:], "coverflow")
+    index_images_background(images)      # embeddings for "more like this"
+    items = [coverflow_item(img) for img in images]
+    return _coverflow(items=items, has_more=has_more, slide_width=200, slide_height=300,
+                      key=key, default=None)
 
-def get_qloo_related_styles(domain, name, limit=8):
-    url = f"https://hackathon.api.qloo.com/v1/{domain}/related"
-    headers = {
-        "X-API-Key": QLOO_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "name": name,
-        "limit": limit
-    }
+# -------------------------------------------------------------------
+# Session helpers
+# -------------------------------------------------------------------
+def set_archetypes(styles):
+    st.session_state.archetypes = styles
+    prefetch_outfit_pools(styles)
 
+def get_client_ip():
+    # Behind Streamlit's proxy the browser's address is the first X-Forwarded-For hop
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            items = response.json().get("results", [])
-            return [item["name"].lower() for item in items]
-        else:
-            return []
-    except Exception as e:
-        return []
-
-def get_archetypes_from_media(movie=None, genre=None, music=None):
-    raw_tags = []
-    if movie:
-        res = requests.get(
-            "https://api.themoviedb.org/3/search/movie",
-            params={"api_key": TMDB_API_KEY, "query": movie}
-        ).json().get("results", [])
-        if res:
-            id2name = {28:"action",35:"comedy",18:"drama",10749:"romance",
-                       27:"horror",16:"animation",878:"sci-fi",80:"crime"}
-            for gid in res[0].get("genre_ids", []):
-                raw_tags += genre_to_tags.get(id2name.get(gid, ""), [])
-    elif genre:
-        raw_tags = genre_to_tags.get(genre.lower(), [])
-    elif music:
-        raw_tags = music_to_tags.get(music.lower(), [])
-
-    arch = set()
-    for t in raw_tags:
-        arch.update(tag_to_style.get(t, []))
-    return list(arch)
-
-@st.cache_data(ttl=0, show_spinner=False)
-def get_outfit_images(q, per_page=5):
-    # 1️⃣ Try Unsplash first
-    try:
-        page_num = random.randint(1, 5)
-        random_suffix = random.randint(0, 10000)
-        query = f"{q} {random_suffix}"
-
-        resp = requests.get(
-            "https://api.unsplash.com/search/photos",
-            headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
-            params={"query": query, "per_page": per_page, "page": page_num}
+        forwarded = st.context.headers.get("X-Forwarded-For", "")
+        return forwarded.split(",")[0].strip() or "me"
+    except Exception:
+        return "me"
+
+def resolve_user_country():
+    if st.session_state.get("country_resolved"):
+        return
+    lookups = get_country_lookups()
+    ip = get_client_ip()
+    country = lookups.cache.get(ip)
+    if country:
+        st.session_state.user_country = country
+        st.session_state.country_resolved = True
+    else:
+        lookups.prefetch(ip)   # picked up on a later rerun
+
+def debug_enabled():
+    return DEBUG_SIDEBAR or st.query_params.get("debug") == "1"
+
+def render_debug_sidebar(trace_id):
+    # Opt-in (?debug=1 or STYLETWIN_DEBUG=1): per-provider latency and this rerun's waterfall
+    sidebar = st.sidebar
+    sidebar.subheader("⏱️ Latency")
+    latency = telemetry.provider_latency()
+    if latency:
+        sidebar.dataframe(
+            [{"provider": p, "calls": s["count"], "p50 ms": round(s["p50"] * 1000, 1),
+              "p95 ms": round(s["p95"] * 1000, 1), "errors": s["errors"]}
+             for p, s in latency.items()],
+            hide_index=True, use_container_width=True,
         )
+    else:
+        sidebar.caption("No upstream calls recorded yet.")
+
+    spans = sorted(telemetry.trace_spans(trace_id), key=lambda s: s.start)
+    sidebar.subheader("Last rerun")
+    if not spans:
+        sidebar.caption("No spans in this rerun.")
+        return
+    t0 = spans[0].start
+    total = max(s.start + s.duration for s in spans) - t0 or 1e-9
+    depth = {}
+    rows = []
+    for s in spans:
+        depth[s.id] = depth.get(s.parent_id, -1) + 1
+        left = (s.start - t0) / total * 100
+        width = max(s.duration / total * 100, 0.5)
+        label = (s.name + (f" [{s.cache}]" if s.cache else "") + (f" {s.status}" if s.status else "")
+                 + (f" ({s.detail})" if s.detail else ""))
+        failed = s.error or (isinstance(s.status, int) and s.status >= 400)
+        color = "#e5533d" if failed else "#4c8bf5" if s.kind == "http" else "#9aa5b1"
+        rows.append(
+            f"<div style='font-size:11px;margin-left:{depth[s.id] * 8}px;white-space:nowrap'>"
+            f"{label} · {s.duration * 1000:.0f} ms</div>"
+            f"<div style='position:relative;height:6px;background:#f0f2f6'>"
+            f"<div style='position:absolute;left:{left:.1f}%;width:{width:.1f}%;height:6px;background:{color}'></div></div>"
+        )
+    sidebar.markdown("".join(rows), unsafe_allow_html=True)
+    sidebar.download_button("metrics.prom", telemetry.prometheus_text(), file_name="metrics.prom")
+    sidebar.download_button("metrics.json", telemetry.metrics_json(), file_name="metrics.json")
 
-        if resp.status_code == 200:
-            results = resp.json().get("results", [])
-            if results:
-                return results  # Keep Unsplash structure
-    except:
-        pass
-
-    # 2️⃣ Fallback to Pexels
-    fallback_images = get_pexels_images(q, per_page=per_page)
-    if fallback_images:
-        return [{"urls": {"regular": url}} for url in fallback_images]
-
-    # 3️⃣ Fallback to Pixabay
-    fallback_images = get_pixabay_images(q, per_page=per_page)
-    if fallback_images:
-        return [{"urls": {"regular": url}} for url in fallback_images]
-
-    return []  # Final fallback
-
+# -------------------------------------------------------------------
+# Layout
+# -------------------------------------------------------------------
+st.set_page_config(page_title="AI StyleTwin", layout="wide")
+trace_id = telemetry.start_trace()
+telemetry.start_exporter()   # no-op unless METRICS_PORT is set
+st.title("🧠 AI StyleTwin")
+st.caption("Discover your aesthetic twin in media and fashion.")
 
-def get_user_country():
-    try:
-        import geocoder
-        g = geocoder.ip("me")
-        return g.country or "US"
-    except:
-        return "US"
-
-def get_tmdb_details(name, tmdb_id=None):
-    detail = None
-    if tmdb_id:
-        detail = requests.get(
-            f"https://api.themoviedb.org/3/movie/{tmdb_id}",
-            params={"api_key": TMDB_API_KEY, "language": "en-US"}
-        ).json()
-        if detail.get("status_code") == 34:
-            detail = None
-    if not detail:
-        search = requests.get(
-            "https://api.themoviedb.org/3/search/movie",
-            params={"api_key": TMDB_API_KEY, "query": name, "include_adult": False}
-        ).json().get("results", [])
-        if search:
-            detail = search[0]
-        else:
-            return name, None, ""
-
-    title = detail.get("title", name)
-    poster = detail.get("poster_path")
-    overview = detail.get("overview", "")
-    poster_url = f"https://image.tmdb.org/t/p/w200{poster}" if poster else None
-    return title, poster_url, overview
-
-def get_similar_movies(movie_name, limit=5):
-    search_url = "https://api.themoviedb.org/3/search/movie"
-    params = {"api_key": TMDB_API_KEY, "query": movie_name}
-    search_resp = requests.get(search_url, params=params).json()
-    results = search_resp.get("results", [])
-
-    if not results:
-        return []
-
-    movie_id = results[0]["id"]
-    rec_url = f"https://api.themoviedb.org/3/movie/{movie_id}/recommendations"
-    rec_params = {"api_key": TMDB_API_KEY}
-    rec_resp = requests.get(rec_url, params=rec_params).json()
-    recs = rec_resp.get("results", [])[:limit]
-
-    return [
-        {
-            "id": r.get("id"),
-            "title": r.get("title"),
-            "overview": r.get("overview", ""),
-            "poster": f"https://image.tmdb.org/t/p/w200{r['poster_path']}" if r.get("poster_path") else None
-        }
-        for r in recs
-    ]
-
-def get_movies_by_genre(genre_name, country_code="US"):
-    GENRE_MAP = {
-        "action": 28, "comedy": 35, "drama": 18, "sci-fi": 878,
-        "romance": 10749, "horror": 27, "animation": 16, "crime": 80
-        # Add more genres if needed
-    }
-    genre_id = GENRE_MAP.get(genre_name.lower())
-    if not genre_id:
-        st.warning("Selected genre is not supported.")
-        return []
-
-    url = "https://api.themoviedb.org/3/discover/movie"
-    params = {
-        "api_key": TMDB_API_KEY,
-        "with_genres": genre_id,
-        "region": country_code,
-        "sort_by": "popularity.desc",
-        "language": "en-US"
-    }
-    response = requests.get(url, params=params).json()
-    return [{
-        "title": m.get("title"),
-        "id": m.get("id"),
-        "poster": f"https://image.tmdb.org/t/p/w200{m['poster_path']}" if m.get("poster_path") else None,
-        "overview": m.get("overview")
-    } for m in response.get("results", [])]
-
-def get_streaming_platforms(movie_id, country_code):
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/watch/providers"
-    params = {"api_key": TMDB_API_KEY}
-    response = requests.get(url, params=params).json()
-    
-    country_info = response.get("results", {}).get(country_code, {})
-    flatrate = country_info.get("flatrate", [])
-    link = country_info.get("link", None)  # Generic landing page
-    
-    return flatrate, link
-
-
-def get_similar_songs(song_name, limit=5):
-    base_url = "http://ws.audioscrobbler.com/2.0/"
-
-    search_params = {
-        "method": "track.search",
-        "track": song_name,
-        "api_key": lastfm_API_KEY,
-        "format": "json",
-        "limit": 1
-    }
-    search_resp = requests.get(base_url, params=search_params).json()
-    results = search_resp.get("results", {}).get("trackmatches", {}).get("track", [])
-
-    # Ensure results is a list
-    if isinstance(results, dict):
-        results = [results]
-
-    if not results:
-        return []
-
-    artist = results[0].get("artist")
-    track = results[0].get("name")
-
-    sim_params = {
-        "method": "track.getsimilar",
-        "artist": artist,
-        "track": track,
-        "api_key": lastfm_API_KEY,
-        "format": "json",
-        "limit": limit
-    }
-
-    sim_resp = requests.get(base_url, params=sim_params).json()
-    similar = sim_resp.get("similartracks", {}).get("track", [])
-
-    if isinstance(similar, dict):
-        similar = [similar]
-
-    return [
-        {
-            "title": s.get("name", "Unknown"),
-            "artist": s.get("artist", {}).get("name", "Unknown"),
-            "url": s.get("url", "#")
-        }
-        for s in similar
-    ]
-
-# --- Spotify Auth ---
-def get_spotify_token(client_id, client_secret):
-    auth_url = 'https://accounts.spotify.com/api/token'
-    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {'Authorization': f'Basic {auth_header}'}
-    data = {'grant_type': 'client_credentials'}
-    resp = requests.post(auth_url, headers=headers, data=data)
-    return resp.json().get("access_token")
-    
-# --- Spotify Search ---
-def get_spotify_song_data(song_name, token, limit=5):
-    search_url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": song_name, "type": "track", "limit": limit}
-
-    resp = requests.get(search_url, headers=headers, params=params).json()
-    tracks = resp.get("tracks", {}).get("items", [])
-
-    return [
-        {
-            "title": t["name"],
-            "artist": t["artists"][0]["name"],
-            "album_img": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
-            "preview_url": t.get("preview_url"),
-            "spotify_url": t["external_urls"]["spotify"]
-        }
-        for t in tracks
-    ]
-
-def detect_spotify_genre(song_name, token):
-    search_url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": song_name, "type": "track", "limit": 1}
-
-    resp = requests.get(search_url, headers=headers, params=params).json()
-    tracks = resp.get("tracks", {}).get("items", [])
-
-    if not tracks:
-        return None, None  # No result
-
-    track = tracks[0]
-    artist_id = track["artists"][0]["id"]
-
-    # Fetch artist details to get genre
-    artist_url = f"https://api.spotify.com/v1/artists/{artist_id}"
-    artist_resp = requests.get(artist_url, headers=headers).json()
-    genres = artist_resp.get("genres", [])
-
-    # Map Spotify genres to your defined keys
-    mapped_genre = None
-    for g in genres:
-        for known_genre in music_to_tags.keys():
-            if known_genre in g.lower():
-                mapped_genre = known_genre
-                break
-        if mapped_genre:
-            break
-
-    return mapped_genre, track["name"] + " - " + track["artists"][0]["name"]
+st.write("---")
 
 # -------------------------------------------------------------------
 # Session State Setup
@@ -678,12 +212,17 @@ for key, default in [
     ("selected_style", None),
     ("ready_for_fashion", False),
     ("similar_movies", []),
-    ("user_country", get_user_country()),
-    ("movie_page", 1)
+    ("user_country", DEFAULT_COUNTRY),
+    ("movie_page", 1),
+    ("movie_source", None),        # TMDB list behind similar_movies, paged incrementally
+    ("movie_remote_page", 1),
+    ("movie_remote_total", 1),
 ]:
     if key not in st.session_state:
         st.session_state[key] = default
 
+resolve_user_country()
+
 # 🛠 Tab Navigation (Make sure this sets from session state)
 tabs = [TAB_MEDIA, TAB_FASHION, TAB_FIT]
 selected_tab = st.radio("Go to:", tabs,
@@ -702,21 +241,9 @@ if "ready_for_fashion" not in st.session_state:
 if "similar_movies" not in st.session_state:
     st.session_state["similar_movies"] = []
 
-if "user_country" not in st.session_state:
-    st.session_state.user_country = get_user_country()
-
 if "movie_page" not in st.session_state:
     st.session_state.movie_page = 1
 
-# -------------------------------------------------------------------
-# Layout
-# -------------------------------------------------------------------
-st.set_page_config(page_title="AI StyleTwin", layout="wide")
-st.title("🧠 AI StyleTwin")
-st.caption("Discover your aesthetic twin in media and fashion.")
-
-st.write("---")
-
 # -------------------------------------------------------------------
 # Media Style Match + Music Recommendations
 # -------------------------------------------------------------------
@@ -732,40 +259,30 @@ if st.session_state.active_tab == TAB_MEDIA:
     # ----------------------------
     if mode == "🎬 Find My Fashion Style":
         movie_input = st.text_input("Enter a movie title:")
+        picked_movie = pick_suggestion(movie_input, ("movie", "genre"), "movie_suggestion")
         selected_genre = st.selectbox("…or pick a genre:", [""] + genre_options)
 
         if st.button("Get Recommendations"):
             if not movie_input and not selected_genre:
                 st.warning("Please enter a movie title or genre.")
             else:
-                media_name = movie_input if movie_input else selected_genre
-                entity_urn = qloo_search_entity(media_name, entity_type="movie")
-        
-                qloo_styles = []
-                used_fallback = False
-        
-                if entity_urn:
-                    style_tags = get_style_tags_from_qloo("movie", media_name, QLOO_API_KEY)
-                    if style_tags:
-                        qloo_styles = style_tags
-                    else:
-                        used_fallback = True
-                else:
-                    used_fallback = True
-        
-                if used_fallback:
+                title, genre, tmdb_id = movie_input or None, selected_genre or None, None
+                entry = resolve_input(movie_input, picked_movie, ("movie", "genre"))
+                if entry and entry["kind"] == "genre":
+                    title, genre = None, entry["name"]
+                elif entry:
+                    title, tmdb_id = entry["name"], entry.get("id")
+                result = recommend_for_movie(title, genre, st.session_state.user_country, tmdb_id)
+                if result["source"] != "qloo":
                     st.info("Attempted to use Qloo API. No valid styles found, falling back to TMDB/Spotify-based recommendation engine.")
-                    qloo_styles = get_archetypes_from_media(movie=movie_input or selected_genre)
-        
-                if qloo_styles:
-                    st.session_state.archetypes = qloo_styles
+
+                if result["archetypes"]:
+                    set_archetypes(result["archetypes"])
                     st.session_state.ready_for_fashion = True
-        
-                    if movie_input:
-                        st.session_state.similar_movies = get_similar_movies(movie_input)
-                    elif selected_genre:
-                        st.session_state.similar_movies = get_movies_by_genre(selected_genre, st.session_state.user_country)
-        
+                    st.session_state.similar_movies = compact_movies(result["similar_movies"])
+                    st.session_state.movie_source = result["movie_source"]
+                    st.session_state.movie_remote_page = 1
+                    st.session_state.movie_remote_total = result["movie_total_pages"]
                     st.session_state.selected_style = None
                     st.session_state.movie_page = 1
 
@@ -800,31 +317,52 @@ if st.session_state.active_tab == TAB_MEDIA:
                 if pagination_cols[i + 1].button(str(i + 1), key=f"page_{i+1}"):
                     st.session_state.movie_page = i + 1
             
-            # "Next" arrow
+            # "Next" arrow; past the last local page it pulls the next TMDB page
+            source = st.session_state.movie_source
+            more_remote = source and st.session_state.movie_remote_page < st.session_state.movie_remote_total
             if pagination_cols[-1].button("→", key="next_page"):
                 if st.session_state.movie_page < total_pages:
                     st.session_state.movie_page += 1
+                elif more_remote:
+                    next_page = get_movie_page(source, st.session_state.movie_remote_page + 1)
+                    seen = {m.id for m in st.session_state.similar_movies}
+                    st.session_state.similar_movies += compact_movies(
+                        m for m in next_page["movies"] if m.get("id") not in seen)
+                    st.session_state.movie_remote_page += 1
+                    total_pages = (len(st.session_state.similar_movies) + page_size - 1) // page_size
+                    if st.session_state.movie_page < total_pages:
+                        st.session_state.movie_page += 1
+
+            # On the last local page, fetch the next TMDB page in the background
+            if more_remote and st.session_state.movie_page >= total_pages:
+                prefetch_movie_page(source, st.session_state.movie_remote_page + 1)
             
             start_idx = (st.session_state.movie_page - 1) * page_size
             end_idx = start_idx + page_size
             current_movies = st.session_state.similar_movies[start_idx:end_idx]
+
+            # Resolve the whole page's providers at once, then warm the next page
+            provider_cache = get_provider_cache()
+            country = st.session_state.user_country
+            page_ids = [m.id for m in current_movies if m.id]
+            page_providers = get_streaming_platforms_batch(page_ids, country, provider_cache)
+            next_ids = [m.id for m in st.session_state.similar_movies[end_idx:end_idx + page_size] if m.id]
+            prefetch_streaming_platforms(next_ids, country, provider_cache)
+            thumbnail_urls([m.poster for m in current_movies if m.poster], "poster")
         
             for m in current_movies:
-                if not m or "title" not in m:
-                    continue  # skip invalid entries
-        
                 cols = st.columns([1, 4])
                 with cols[0]:
-                    if m.get("poster"):
-                        st.image(m["poster"], width=100)
+                    if m.poster:
+                        st.image(thumbnail_path(m.poster, "poster") or m.poster, width=100)
         
                 with cols[1]:
-                    st.markdown(f"**{m.get('title', 'Untitled')}**")
-                    st.caption(m.get("overview", "No description available."))
+                    st.markdown(f"**{m.title or 'Untitled'}**")
+                    st.caption(m.overview or "No description available.")
         
-                    movie_id = m.get("id")
+                    movie_id = m.id
                     if movie_id:
-                        providers, landing_link = get_streaming_platforms(movie_id, st.session_state.user_country)
+                        providers, landing_link = page_providers.get(movie_id, ([], None))
                         if providers:
                             st.markdown("🌐 Available on:")
                             logos = st.columns(len(providers))
@@ -859,64 +397,42 @@ if st.session_state.active_tab == TAB_MEDIA:
     # ----------------------------
     else:
         song_input = st.text_input("Enter a song you like:")
-        
+        picked_song = pick_suggestion(song_input, ("track",), "song_suggestion")
+
         if st.button("Get Similar Songs"):
             if not song_input:
                 st.warning("Please enter a song name first.")
             else:
+                track = resolve_input(song_input, picked_song, ("track",))
                 with st.spinner("🔍 Getting Spotify previews and fashion styles..."):
-                    client_id = st.secrets["spotify"]["client_id"]
-                    client_secret = st.secrets["spotify"]["client_secret"]
-                    token = get_spotify_token(client_id, client_secret)
-            
-                    if not token:
-                        st.error("Failed to retrieve Spotify token.")
-                    else:
-                        genre_key, display_song_name = detect_spotify_genre(song_input, token)
-            
-                        if not genre_key:
-                            st.warning("Could not detect genre from Spotify.")
-                            genre_key = None
-                        
-                        qloo_styles = get_qloo_related_styles("music", song_input, limit=6)
-                        
-                        if qloo_styles:
-                            st.session_state.archetypes = qloo_styles
-                            st.session_state.ready_for_fashion = True
-                        else:
-                            st.info("Attempted to use Qloo API. No valid styles found, falling back to TMDB/Spotify-based recommendation engine.")
-                            fallback_styles = get_archetypes_from_media(music=genre_key)
-                            if fallback_styles:
-                                st.session_state.archetypes = fallback_styles
-                                st.session_state.ready_for_fashion = True
-                            else:
-                                st.error("Could not detect any fashion styles.")
-                                
-                            # Optional: show Spotify previews
-                            similar_tracks = get_similar_songs(song_input)
-                            if similar_tracks:
-                                spotify_enriched = []
-                                for track in similar_tracks:
-                                    enriched = get_spotify_song_data(f"{track['title']} {track['artist']}", token, limit=1)
-                                    if enriched:
-                                        spotify_enriched.append(enriched[0])
-            
-                                for song in spotify_enriched:
-                                    cols = st.columns([1, 4])
-                                    with cols[0]:
-                                        if song["album_img"]:
-                                            st.image(song["album_img"], width=80)
-                                    with cols[1]:
-                                        st.markdown(f"**🎵 {song['title']}** by *{song['artist']}*")
-                                        if song["preview_url"]:
-                                            st.audio(song["preview_url"], format="audio/mp3")
-                                        st.markdown(f"[🔗 Listen on Spotify]({song['spotify_url']})")
-                                    st.write("---")
+                    result = recommend_for_song(track["name"] if track else song_input, track=track)
 
-        
-                                # 🎯 Auto-generate fashion archetypes from genre
-                                st.session_state.archetypes = get_archetypes_from_media(music=genre_key)
-                                st.session_state.ready_for_fashion = True
+                if result["error"] == "spotify_token":
+                    st.error("Failed to retrieve Spotify token.")
+                else:
+                    if not result["genre"]:
+                        st.warning("Could not detect genre from Spotify.")
+
+                    if result["source"] != "qloo":
+                        st.info("Attempted to use Qloo API. No valid styles found, falling back to TMDB/Spotify-based recommendation engine.")
+                    if result["archetypes"]:
+                        set_archetypes(result["archetypes"])
+                        st.session_state.ready_for_fashion = True
+                    else:
+                        st.error("Could not detect any fashion styles.")
+
+                    # Spotify previews
+                    for song in result["similar_songs"]:
+                        cols = st.columns([1, 4])
+                        with cols[0]:
+                            if song["album_img"]:
+                                st.image(song["album_img"], width=80)
+                        with cols[1]:
+                            st.markdown(f"**🎵 {song['title']}** by *{song['artist']}*")
+                            if song["preview_url"]:
+                                st.audio(song["preview_url"], format="audio/mp3")
+                            st.markdown(f"[🔗 Listen on Spotify]({song['spotify_url']})")
+                        st.write("---")
 
     
         if st.session_state.ready_for_fashion:
@@ -939,14 +455,38 @@ elif st.session_state.active_tab == TAB_FASHION:
     else:
         st.success("Detected archetypes: " + ", ".join(st.session_state.archetypes))
 
+        # Start every style's pool at once; the loop below then renders from memory
+        prefetch_outfit_pools(st.session_state.archetypes)
+
+        # Colour filter: each card shows the look with the most of that colour (palettes.py)
+        color = st.selectbox("🎨 Colour", ["any", *palettes.COLOR_NAMES], key="color_filter",
+                             format_func=str.title)
+
         cols = st.columns(2)
         for idx, style in enumerate(st.session_state.archetypes):
             with cols[idx % 2]:
                 st.markdown(f"### 👗 {style.title()} Look")
-                with st.spinner("Fetching outfit image..."):
-                    imgs = get_outfit_images(style_search_terms.get(style, f"{style} outfit"), per_page=1)
+                q = outfit_query(style)
+                with st.spinner("Fetching outfit image..."), telemetry.span("fashion_card", "flow"):
+                    imgs = get_outfit_images(q, per_page=OUTFIT_POOL_SIZE)
+                    if color != "any":
+                        imgs = palettes.sort_by_color(q, imgs, color)
+                    else:
+                        palettes.index_images_background(q, imgs)   # ready for a filter later
                 if imgs:
-                    st.image(imgs[0]["urls"]["small"], use_container_width=True)
+                    card_url = imgs[0]["urls"]["regular"]
+                    # Never download on the render path: the provider's small image until the card thumbnail is ready
+                    card = cached_thumbnail_path(card_url, "card")
+                    if not card:
+                        card = imgs[0]["urls"]["small"]
+                        warm_thumbnails([card_url], "card")
+                    st.image(card, use_container_width=True)
+                    chips = palettes.swatches(q, card_url)
+                    if chips:
+                        st.markdown("".join(
+                            f"<span style='display:inline-block;width:18px;height:18px;border-radius:50%;"
+                            f"margin-right:4px;background:{c}'></span>" for c in chips
+                        ), unsafe_allow_html=True)
                 else:
                     st.warning("No preview image found.")
 
@@ -959,6 +499,7 @@ elif st.session_state.active_tab == TAB_FASHION:
                 if st.button(f"Try {style}", key=f"try_{style}"):
                     st.session_state.selected_style = style
                     st.session_state.selected_outfit_url = None  # User will pick this in fitting room
+                    st.session_state.selected_outfit = None
                     st.session_state.active_tab = TAB_FIT
                     st.rerun()
 
@@ -979,26 +520,101 @@ else:
     else:
         st.success(f"Showing outfits for: **{style.title()}**")
 
+        q = outfit_query(style)
+
         # Persistent Refresh Button
         refresh_col, _ = st.columns([1, 3])
         with refresh_col:
-            if st.button("🔄 Refresh Outfits"):
-                with st.spinner("Loading outfits..."):
-                    st.session_state.fitting_room_outfits = get_outfit_images(style_search_terms[style], per_page=5)
-
-        # Load outfits initially if not already loaded
-        if "fitting_room_outfits" not in st.session_state:
-            with st.spinner("Loading outfits..."):
-                st.session_state.fitting_room_outfits = get_outfit_images(style_search_terms[style], per_page=10)
-
-        outfit_urls = [img["urls"]["regular"] for img in st.session_state.get("fitting_room_outfits", [])]
-
-        if outfit_urls:
+            refresh = st.button("🔄 Refresh Outfits")
+
+        # (Re)load the first page on refresh or when the style changed
+        if refresh or st.session_state.get("fitting_room_style") != style:
+            with st.spinner("Loading outfits..."), telemetry.span("style_view_outfits", "flow"):
+                st.session_state.fitting_room_outfits = compact_outfits(get_outfit_images(q, per_page=OUTFIT_POOL_SIZE))
+            st.session_state.fitting_room_style = style
+            st.session_state.fitting_room_page = 1
+            st.session_state.fitting_room_exhausted = False
+
+        # Kept compact in the session; the image dicts only live for this rerun
+        outfits = outfit_images(st.session_state.fitting_room_outfits)
+        page = st.session_state.fitting_room_page
+        has_more = not st.session_state.fitting_room_exhausted and page < OUTFIT_MAX_PAGES
+
+        # Colour filter over the looks already loaded; no new provider search
+        color = st.selectbox("🎨 Colour", ["any", *palettes.COLOR_NAMES], key="fitting_room_color",
+                             format_func=str.title)
+        shown = outfits
+        if color != "any" and outfits:
+            with telemetry.span("filter_by_color", "flow"):
+                shown = palettes.filter_by_color(q, outfits, color)
+            has_more = False                  # paging resumes with the filter cleared
+            if not shown:
+                st.info(f"None of the {len(outfits)} loaded looks is mostly {color}.")
+        elif outfits:
+            palettes.index_images_background(q, outfits)
+
+        if shown:
             st.markdown("### 👗 Browse the looks below:")
-            render_coverflow(outfit_urls)
-        else:
+            if has_more:
+                prefetch_outfit_page(q, page + 1)
+            event = render_coverflow(shown, has_more=has_more, key=f"coverflow_{style}")
+
+            # Scrolled near the end: append the next provider page
+            if has_more and is_new_more(event, len(outfits)):
+                st.session_state.fitting_room_more_nonce = event.get("nonce")
+                seen = {img["urls"]["regular"] for img in outfits}
+                fresh = [img for img in get_outfit_page(q, page + 1) if img["urls"]["regular"] not in seen]
+                st.session_state.fitting_room_outfits = st.session_state.fitting_room_outfits + compact_outfits(fresh)
+                st.session_state.fitting_room_page = page + 1
+                st.session_state.fitting_room_exhausted = not fresh or page + 1 >= OUTFIT_MAX_PAGES
+                st.rerun()
+            elif is_new_select(event):
+                select_outfit(event, shown)
+
+            # Nearest neighbours of the clicked look from the local embedding index
+            selected_outfit = st.session_state.get("selected_outfit")
+            if selected_outfit:
+                with st.spinner("Finding similar looks..."), telemetry.span("more_like_this", "flow"):
+                    similar = similar_outfits(selected_outfit.image())
+                if similar:
+                    st.markdown("### ✨ More like this")
+                    similar_event = render_coverflow(similar, key="coverflow_similar")
+                    if is_new_select(similar_event):
+                        select_outfit(similar_event, similar)
+                        st.rerun()
+                elif model_loading():
+                    st.caption("Still indexing looks; similar ones will show up shortly.")
+        elif not outfits:
             st.warning("No outfits found for this style.")
 
+        # Optional cut-out stage (cutout.py): the model only loads once someone turns it on
+        with st.expander("✂️ Cut-outs"):
+            use_cutouts = st.toggle("Remove backgrounds", key="cutouts_enabled")
+            photo = st.file_uploader("Your photo (optional)", type=["jpg", "jpeg", "png", "webp"],
+                                     key="cutout_photo")
+            if use_cutouts:
+                warm_cutouts()
+                selected = st.session_state.get("selected_outfit_url")
+                if not selected and not photo:
+                    st.caption("Click a look above or upload a photo to cut it out.")
+                else:
+                    # Both images go through the model as one batch
+                    with st.spinner("Removing backgrounds..."), telemetry.span("style_view_cutouts", "flow"):
+                        look_cut, photo_cut = cutout_sources([selected or None, photo])
+                    look_col, photo_col = st.columns(2)
+                    for col, source, path, caption in ((look_col, selected, look_cut, "Selected look"),
+                                                       (photo_col, photo, photo_cut, "Your photo")):
+                        if not source:
+                            continue
+                        with col:
+                            if path:
+                                st.image(path, caption=caption, use_container_width=True)
+                            else:
+                                st.warning(f"Couldn't remove the background ({caption.lower()}).")
+
         if st.button("🔙 Back to Fashion Tab"):
             st.session_state.active_tab = TAB_FASHION
             st.rerun()
+
+if debug_enabled():
+    render_debug_sidebar(trace_id)
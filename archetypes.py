@@ -0,0 +1,103 @@
+"""Vectorized archetype scoring.
+
+The genre -> tag -> style dictionaries are compiled once into dense NumPy
+weight matrices, so scoring a movie (or thousands of them) is a
+matrix-vector (matrix-matrix) product instead of nested set unions, and
+styles come back ranked with scores.
+"""
+import numpy as np
+
+
+class ArchetypeScorer:
+    def __init__(self, genre_to_tags, tag_to_style, music_to_tags):
+        tags = list(dict.fromkeys(
+            [t for ts in genre_to_tags.values() for t in ts]
+            + [t for ts in music_to_tags.values() for t in ts]
+            + list(tag_to_style)
+        ))
+        self.styles = list(dict.fromkeys(s for ss in tag_to_style.values() for s in ss))
+        self.genres = list(genre_to_tags)
+        self.music = list(music_to_tags)
+
+        tag_idx = {t: i for i, t in enumerate(tags)}
+        style_idx = {s: i for i, s in enumerate(self.styles)}
+        self.genre_idx = {g: i for i, g in enumerate(self.genres)}
+        self.music_idx = {m: i for i, m in enumerate(self.music)}
+
+        def source_matrix(mapping, keys):
+            m = np.zeros((len(keys), len(tags)), dtype=np.float32)
+            for i, key in enumerate(keys):
+                for t in mapping[key]:
+                    m[i, tag_idx[t]] += 1.0
+            return m
+
+        tag_style = np.zeros((len(tags), len(self.styles)), dtype=np.float32)
+        for t, ss in tag_to_style.items():
+            for s in ss:
+                tag_style[tag_idx[t], style_idx[s]] += 1.0
+
+        # Precomputed source x style weights: one product per query, not two
+        self.genre_style = source_matrix(genre_to_tags, self.genres) @ tag_style
+        self.music_style = source_matrix(music_to_tags, self.music) @ tag_style
+
+    # --- inputs -------------------------------------------------------
+    def music_keys_for(self, spotify_genres):
+        """Map free-form Spotify genres ("uk hip-hop", "dance pop") to music keys."""
+        keys = []
+        for g in spotify_genres or []:
+            g = g.lower()
+            keys += [k for k in self.music if k in g and k not in keys]
+        return keys
+
+    def _vector(self, genres=(), music=()):
+        scores = np.zeros(len(self.styles), dtype=np.float32)
+        g = [self.genre_idx[x] for x in genres if x in self.genre_idx]
+        m = [self.music_idx[x] for x in music if x in self.music_idx]
+        if g:
+            scores += self.genre_style[g].sum(axis=0)
+        if m:
+            scores += self.music_style[m].sum(axis=0)
+        return scores
+
+    # --- ranking ------------------------------------------------------
+    def _rank(self, scores, top_k):
+        nonzero = np.flatnonzero(scores)
+        if not nonzero.size:
+            return []
+        # Highest score first; ties keep tag_to_style order (stable sort)
+        order = nonzero[np.argsort(-scores[nonzero], kind="stable")][:top_k]
+        total = float(scores[nonzero].sum())
+        return [(self.styles[i], float(scores[i]) / total) for i in order]
+
+    def score(self, genres=(), music=(), spotify_genres=(), top_k=8):
+        """Ranked [(style, score), ...] for one item; scores sum to <= 1."""
+        music = list(music) + self.music_keys_for(spotify_genres)
+        return self._rank(self._vector(genres, music), top_k)
+
+    def score_batch(self, genre_lists, top_k=8):
+        """Score many items at once (offline precomputation).
+
+        ``genre_lists`` is a sequence of genre-name lists; returns one ranked
+        list per item, identical to ``score`` for the same genres. Work is a
+        single (items x genres) @ (genres x styles) product plus a row-wise
+        stable sort, so ties keep tag_to_style order as in ``_rank``.
+        """
+        n = len(genre_lists)
+        counts = np.zeros((n, len(self.genres)), dtype=np.float32)
+        for row, genres in enumerate(genre_lists):
+            for g in genres:
+                col = self.genre_idx.get(g)
+                if col is not None:
+                    counts[row, col] += 1.0
+        scores = counts @ self.genre_style
+
+        k = min(top_k, len(self.styles))
+        if k == 0 or n == 0:
+            return [[] for _ in range(n)]
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        results = []
+        for row in range(n):
+            cols = top[row][scores[row, top[row]] > 0]
+            total = float(scores[row].sum())
+            results.append([(self.styles[c], float(scores[row, c]) / total) for c in cols])
+        return results
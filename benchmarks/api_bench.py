@@ -0,0 +1,206 @@
+"""Latency and round-trip benchmark for the network helpers and user flows.
+
+Starts the local stand-in server (benchmarks/mock_api.py), points
+config.py at it, then times every helper in media_api.py and the three
+user flows (Get Recommendations, Get Similar Songs, Fashion tab fill):
+
+* cold - every process-wide cache is emptied before each iteration
+* warm - same input again with caches kept
+
+For each case it reports p50/p95/p99 latency and upstream calls per
+iteration. Cold call counts are checked against CALL_BUDGETS, so a change
+that adds a round-trip fails the run (exit 1). The check is skipped when
+faults are injected, since retries add calls. Rate limiting is off unless
+--rate-limit is given, so the numbers are upstream latency, not queueing.
+
+    python benchmarks/api_bench.py --iterations 20 --latency 0.05 --jitter 0.01
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockAPIServer, parse_route_latency  # noqa: E402
+from telemetry import percentile  # noqa: E402
+
+# Max upstream calls per cold iteration
+CALL_BUDGETS = {
+    "get_tmdb_details":              1,
+    "get_similar_movies":            2,
+    "get_movies_by_genre":           1,
+    "get_streaming_platforms_batch": 5,
+    "get_archetypes_from_media":     1,
+    "get_similar_songs":             2,
+    "get_spotify_song_data":         2,
+    "detect_spotify_genre":          3,
+    "enrich_tracks_with_spotify":    6,
+    "qloo_search_entity":            1,
+    "get_style_tags_from_qloo":      2,
+    "get_qloo_related_styles":       1,
+    "get_outfit_images":             1,
+    "flow: get recommendations":     9,
+    "flow: get similar songs":       11,
+    "flow: recommendations by id":   8,
+    "flow: similar songs by id":     10,
+    "flow: fashion tab":             6,
+    "flow: browse movie pages":      3,
+    "flow: movie detail+providers":  1,
+}
+
+
+def build_cases(api):
+    token = lambda: api.get_spotify_token(api.SPOTIFY_CLIENT_ID, api.SPOTIFY_CLIENT_SECRET)
+    tracks = [{"title": f"Song {i}", "artist": f"Artist {i}"} for i in range(5)]
+    styles = ["grunge", "boho", "techwear", "vintage", "y2k", "gothic"]
+
+    def movie_flow():
+        title = "Blade Runner"
+        entity = api.qloo_search_entity(title, entity_type="movie")
+        styles_found = api.get_style_tags_from_qloo("movie", title, api.QLOO_API_KEY, entity_id=entity)
+        if not styles_found:
+            styles_found = api.get_archetypes_from_media(movie=title)
+        movies = api.get_similar_movies(title)
+        api.get_streaming_platforms_batch([m["id"] for m in movies[:5]], "US", api.get_provider_cache())
+        return styles_found
+
+    def canonical_movie_flow():
+        # Title picked from the typeahead index: TMDB id known, no search
+        title, movie_id = "Blade Runner", 603
+        entity = api.qloo_search_entity(title, entity_type="movie")
+        styles_found = api.get_style_tags_from_qloo("movie", title, api.QLOO_API_KEY, entity_id=entity)
+        if not styles_found:
+            styles_found = api.get_archetypes_from_media(movie=title, movie_id=movie_id)
+        movies = api.get_movie_page(api.similar_movies_source(title, movie_id), 1)["movies"][:5]
+        api.get_streaming_platforms_batch([m["id"] for m in movies], "US", api.get_provider_cache())
+        return styles_found
+
+    def music_flow(track_id=None, artist=None):
+        song = "Midnight City"
+        t = token()
+        genre_key, _ = api.detect_spotify_genre(song, t, track_id=track_id)
+        if not api.get_qloo_related_styles("music", song, limit=6):
+            api.get_archetypes_from_media(music=genre_key)
+        similar = api.get_similar_songs(song, artist=artist)
+        return api.enrich_tracks_with_spotify(similar, t, api.get_enrichment_cache())
+
+    def browse_flow():
+        # Media tab paging: page 1, next page prefetched in the background, then shown
+        source = api.similar_movies_source("Blade Runner")
+        first = api.get_movie_page(source, 1)
+        api.prefetch_movie_page(source, 2)
+        return first["movies"] + api.get_movie_page(source, 2)["movies"]
+
+    def detail_flow():
+        # Detail and watch providers share one append_to_response call
+        api.get_tmdb_details("Blade Runner", tmdb_id=603)
+        return api.get_streaming_platforms(603, "US")
+
+    def fashion_flow():
+        api.prefetch_outfit_pools(styles)
+        return [api.get_outfit_images(api.outfit_query(s), per_page=1) for s in styles]
+
+    return [
+        ("get_tmdb_details",              lambda: api.get_tmdb_details("Blade Runner")),
+        ("get_similar_movies",            lambda: api.get_similar_movies("Blade Runner")),
+        ("get_movies_by_genre",           lambda: api.get_movies_by_genre("horror", "US")),
+        ("get_streaming_platforms_batch", lambda: api.get_streaming_platforms_batch(
+            list(range(100, 105)), "US", api.get_provider_cache())),
+        ("get_archetypes_from_media",     lambda: api.get_archetypes_from_media(movie="Blade Runner")),
+        ("get_similar_songs",             lambda: api.get_similar_songs("Midnight City")),
+        ("get_spotify_song_data",         lambda: api.get_spotify_song_data("Midnight City", token(), limit=1)),
+        ("detect_spotify_genre",          lambda: api.detect_spotify_genre("Midnight City", token())),
+        ("enrich_tracks_with_spotify",    lambda: api.enrich_tracks_with_spotify(
+            tracks, token(), api.get_enrichment_cache())),
+        ("qloo_search_entity",            lambda: api.qloo_search_entity("Blade Runner")),
+        ("get_style_tags_from_qloo",      lambda: api.get_style_tags_from_qloo("movie", "Blade Runner", api.QLOO_API_KEY)),
+        ("get_qloo_related_styles",       lambda: api.get_qloo_related_styles("music", "Midnight City", limit=6)),
+        ("get_outfit_images",             lambda: api.get_outfit_images(api.outfit_query("grunge"), per_page=5)),
+        ("flow: get recommendations",     movie_flow),
+        ("flow: get similar songs",       music_flow),
+        ("flow: recommendations by id",   canonical_movie_flow),
+        ("flow: similar songs by id",     lambda: music_flow(track_id="t1", artist="M83")),
+        ("flow: fashion tab",             fashion_flow),
+        ("flow: browse movie pages",      browse_flow),
+        ("flow: movie detail+providers",  detail_flow),
+    ]
+
+
+def run_case(server, api, fn, iterations, cold):
+    latencies, calls = [], []
+    if not cold:
+        api.clear_caches()
+        fn()                                  # warm-up, not timed
+    for _ in range(iterations):
+        if cold:
+            api.clear_caches()
+        before = server.snapshot()
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+        calls.append(sum((server.snapshot() - before).values()))
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "calls_per_iter": sum(calls) / len(calls),
+        "max_calls": max(calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--route-latency", action="append", metavar="ROUTE=SECONDS")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the per-provider rate limiter on")
+    parser.add_argument("--only", help="substring filter on case names")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server = MockAPIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           rate_429=args.rate_429, retry_after=0, seed=1,
+                           route_latency=parse_route_latency(args.route_latency)).start()
+    os.environ.update(server.env())
+    os.environ.setdefault("HTTP_CACHE_DIR", tempfile.mkdtemp(prefix="http-cache-"))
+    os.environ.setdefault("TYPEAHEAD_PATH", os.path.join(tempfile.mkdtemp(prefix="typeahead-"), "entries.jsonl"))
+    os.environ.setdefault("TRACK_GRAPH_PATH", os.path.join(tempfile.mkdtemp(prefix="track-graph-"), "graph.npz"))
+    if not args.rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+    import media_api as api   # after the env points config.py at the mock server
+
+    check_calls = not (args.error_rate or args.rate_429)
+    results, failed = {}, False
+    print(f"{'case':<32}{'mode':<6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls':>8}")
+    for name, fn in build_cases(api):
+        if args.only and args.only not in name:
+            continue
+        for mode in ("cold", "warm"):
+            r = run_case(server, api, fn, args.iterations, cold=(mode == "cold"))
+            results[f"{name} [{mode}]"] = r
+            flag = ""
+            budget = CALL_BUDGETS.get(name)
+            if check_calls and mode == "cold" and budget is not None and r["max_calls"] > budget:
+                flag = f"  FAIL (budget {budget})"
+                failed = True
+            print(f"{name:<32}{mode:<6}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                  f"{r['calls_per_iter']:>8.1f}{flag}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    server.stop()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
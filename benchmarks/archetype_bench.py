@@ -0,0 +1,58 @@
+"""Archetype scoring throughput (archetypes.py), and a check that the two paths agree.
+
+Draws --items random genre lists from the app's genre dictionary and ranks
+them with ``score`` one at a time and with ``score_batch``. Every item must
+get the same ranking both ways (same styles, same order on ties); the
+script exits 1 on any mismatch.
+
+    python benchmarks/archetype_bench.py --items 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from media_api import ARCHETYPE_TOP_K, get_archetype_scorer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--top-k", type=int, default=ARCHETYPE_TOP_K)
+    args = parser.parse_args()
+
+    scorer = get_archetype_scorer()
+    rng = random.Random(0)
+    # Single genres first: every one of them, at every k, is where ties show up
+    items = [[g] for g in scorer.genres]
+    items += [rng.sample(scorer.genres, rng.randint(1, min(3, len(scorer.genres))))
+              for _ in range(args.items - len(items))]
+
+    t0 = time.perf_counter()
+    one = [scorer.score(genres=g, top_k=args.top_k) for g in items]
+    single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    batch = scorer.score_batch(items, top_k=args.top_k)
+    batched = time.perf_counter() - t0
+    print(f"{len(items)} items  top_k {args.top_k}  {len(scorer.styles)} styles")
+    print(f"score        {len(items) / single:10.0f} items/s")
+    print(f"score_batch  {len(items) / batched:10.0f} items/s")
+
+    mismatches = [i for i, (a, b) in enumerate(zip(one, batch))
+                  if [s for s, _ in a] != [s for s, _ in b]
+                  or any(abs(x - y) > 1e-6 for (_, x), (_, y) in zip(a, b))]
+    for k in range(1, args.top_k + 1):
+        mismatches += [g for g in scorer.genres
+                       if scorer.score(genres=[g], top_k=k) != scorer.score_batch([[g]], top_k=k)[0]]
+    if mismatches:
+        print(f"MISMATCH  {len(mismatches)} cases rank differently in score and score_batch")
+        sys.exit(1)
+    print("score and score_batch agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""CPU latency and throughput of the background-removal stage (cutout.py).
+
+Runs synthetic photos through the warm session pool without touching the
+on-disk cut-out cache:
+
+* warm-up    - loading the model and running the dummy inference, per pool
+* latency    - one image at a time, end to end (decode, preprocess,
+  inference, mask), p50/p95
+* throughput - a burst of images submitted together, for each max batch size
+
+Numbers are for the host it runs on; ``--sessions`` and ``--threads``
+override the core-based sizing. Needs rembg and onnxruntime (the model is
+downloaded on first use unless --model-path is given).
+
+    python benchmarks/cutout_bench.py --model u2netp --images 16 --batches 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telemetry import percentile  # noqa: E402
+
+
+def synthetic_photos(count, size, seed=1):
+    """JPEG bytes: a bright blob on a noisy gradient, roughly outfit-photo sized."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w]
+    photos = []
+    for _ in range(count):
+        bg = (np.stack([xx / w, yy / h, np.full_like(xx, 0.5, dtype=float)], -1) * 200
+              + rng.normal(0, 12, (h, w, 3)))
+        cx, cy = rng.uniform(0.3, 0.7) * w, rng.uniform(0.3, 0.7) * h
+        blob = ((xx - cx) / (0.2 * w)) ** 2 + ((yy - cy) / (0.35 * h)) ** 2 < 1
+        bg[blob] = rng.uniform(0, 255, 3)
+        out = BytesIO()
+        Image.fromarray(np.clip(bg, 0, 255).astype(np.uint8)).save(out, "JPEG", quality=85)
+        photos.append(out.getvalue())
+    return photos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.environ.get("REMBG_MODEL", "u2net"))
+    parser.add_argument("--model-path", help="local .onnx file instead of rembg's download")
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", default="800x1200", help="synthetic photo WxH")
+    parser.add_argument("--batches", default="1,2,4", help="max batch sizes to measure")
+    parser.add_argument("--sessions", type=int, help="pool size (default: sized to cores)")
+    parser.add_argument("--threads", type=int, help="intra-op threads per session")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    os.environ["REMBG_MODEL"] = args.model
+    if args.model_path:
+        os.environ["REMBG_MODEL_PATH"] = args.model_path
+    import cutout   # after the env picks the model
+    from inference import CORES, POOL_SIZE, SessionPool
+
+    sessions = args.sessions or POOL_SIZE
+    threads = args.threads or max(1, CORES // sessions)
+    photos = synthetic_photos(args.images, tuple(int(v) for v in args.size.split("x")))
+    print(f"model {args.model}  cores {CORES}  sessions {sessions}  "
+          f"intra-op threads {threads}  images {len(photos)}")
+    results = {"model": args.model, "cores": CORES, "sessions": sessions, "threads": threads}
+
+    pool_input_size = cutout.MODEL_INPUTS.get(args.model, cutout._U2NET_INPUT)[2]
+
+    def new_pool(max_batch):
+        pool = SessionPool("cutout", lambda: cutout._model_path(args.model), pool_input_size,
+                           size=sessions, threads=threads, max_batch=max_batch)
+        t0 = time.perf_counter()
+        pool.wait_ready()
+        return pool, time.perf_counter() - t0
+
+    def cut(pool, data):
+        img = cutout._open(data)
+        pred = pool.run([cutout.preprocess(img, pool.input_size, cutout.MEAN, cutout.STD)])[0][0]
+        return cutout.apply_mask(img, pred)
+
+    pool, warmup = new_pool(1)
+    results["warmup_s"] = round(warmup, 3)
+    results["batchable"] = pool.batchable
+    print(f"warm-up      {warmup:8.2f}s  (batched inference: {'yes' if pool.batchable else 'no'})")
+
+    samples = []
+    for data in photos:
+        t0 = time.perf_counter()
+        cut(pool, data)
+        samples.append(time.perf_counter() - t0)
+    results["latency_ms"] = {"p50": round(percentile(samples, 50) * 1000, 1),
+                             "p95": round(percentile(samples, 95) * 1000, 1)}
+    print(f"latency      p50 {results['latency_ms']['p50']:.1f} ms  p95 {results['latency_ms']['p95']:.1f} ms")
+
+    results["throughput"] = {}
+    images = [cutout._open(data) for data in photos]
+    for max_batch in (int(b) for b in args.batches.split(",")):
+        pool, _ = new_pool(max_batch)
+        arrays = [cutout.preprocess(img, pool.input_size, cutout.MEAN, cutout.STD) for img in images]
+        t0 = time.perf_counter()
+        for future in pool.submit(arrays):
+            future.result()
+        elapsed = time.perf_counter() - t0
+        rate = len(arrays) / elapsed
+        mean_batch = pool.stats["images"] / max(1, pool.stats["batches"])
+        results["throughput"][max_batch] = {"images_per_s": round(rate, 2),
+                                            "per_core": round(rate / CORES, 2),
+                                            "mean_batch": round(mean_batch, 2)}
+        print(f"batch <= {max_batch:<3} {rate:8.2f} img/s  {rate / CORES:6.2f} img/s/core  "
+              f"mean batch {mean_batch:.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Embedding throughput and "more like this" query latency (embeddings.py).
+
+* query   - nearest-neighbour lookups against synthetic float16 indexes of
+  several sizes, through the same memory-mapped files the app uses
+* embed   - synthetic photos through the warm session pool, images/s for
+  each max batch size (skipped with --no-model)
+
+Exits non-zero when the p95 query time at the largest index size misses
+QUERY_TARGET_MS.
+
+    python benchmarks/embedding_bench.py --sizes 1000,5000,15000 --dim 1024
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telemetry import percentile  # noqa: E402
+
+QUERY_TARGET_MS = 20.0
+
+
+def bench_queries(embeddings, size, dim, queries):
+    rng = np.random.default_rng(size)
+    index = embeddings.EmbeddingIndex(tempfile.mkdtemp(prefix="embed-bench-"))
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index.add([(f"u{i}", f"d{i}", {}, v) for i, v in enumerate(vectors)])
+    samples = []
+    for i in rng.integers(0, size, queries):
+        t0 = time.perf_counter()
+        index.nearest(index.vector(int(i)), k=16, exclude=[int(i)])
+        samples.append((time.perf_counter() - t0) * 1000)
+    return percentile(samples, 50), percentile(samples, 95), os.path.getsize(index.vectors_path)
+
+
+def bench_embed(embeddings, count, batches):
+    from cutout_bench import synthetic_photos
+    from PIL import Image
+    from io import BytesIO
+    from inference import SessionPool
+    images = [Image.open(BytesIO(b)).convert("RGB") for b in synthetic_photos(count, (200, 300))]
+    mean, std = embeddings._normalization()
+    for max_batch in batches:
+        pool = SessionPool("embed", embeddings._model_file, (224, 224), max_batch=max_batch)
+        t0 = time.perf_counter()
+        pool.wait_ready()
+        warmup = time.perf_counter() - t0
+        arrays = [embeddings.preprocess(img, pool.input_size, mean, std) for img in images]
+        t0 = time.perf_counter()
+        pool.run(arrays)
+        rate = count / (time.perf_counter() - t0)
+        print(f"embed batch <= {max_batch:<3} {rate:8.1f} img/s  warm-up {warmup:.2f}s  "
+              f"mean batch {pool.stats['images'] / max(1, pool.stats['batches']):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,5000,15000", help="index sizes (rows)")
+    parser.add_argument("--dim", type=int, default=1024, help="vector size (mobilenetv3_small_100: 1024)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--batches", default="1,8,16", help="max batch sizes for the embed run")
+    parser.add_argument("--no-model", action="store_true", help="only benchmark queries")
+    args = parser.parse_args()
+
+    os.environ.setdefault("EMBED_CACHE_DIR", tempfile.mkdtemp(prefix="embed-bench-"))
+    import embeddings
+
+    ok = True
+    sizes = [int(s) for s in args.sizes.split(",")]
+    for size in sizes:
+        p50, p95, disk = bench_queries(embeddings, size, args.dim, args.queries)
+        flag = ""
+        if size == max(sizes) and p95 > QUERY_TARGET_MS:
+            flag, ok = f"  FAIL (target {QUERY_TARGET_MS:.0f} ms)", False
+        print(f"query {size:>7} rows  p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  "
+              f"index {disk / 1e6:6.1f} MB{flag}")
+
+    if not args.no_model:
+        bench_embed(embeddings, args.images, [int(b) for b in args.batches.split(",")])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Local stand-in for every upstream API the app talks to.
+
+One threaded HTTP server emulates the TMDB, Spotify (API + accounts),
+Last.fm, Qloo, Unsplash, Pexels, Pixabay and imgbb endpoints used by
+media_api.py, each under its own path prefix, and returns payloads with the
+same shape as the real services. Responses are deterministic per query so
+caches behave realistically. Latency, jitter, error rate and 429 injection
+are configurable globally or per route, and every request is counted so
+benchmarks can check round-trip counts.
+
+Use in-process::
+
+    server = MockAPIServer(latency=0.05).start()
+    os.environ.update(server.env())   # before importing config / media_api
+
+or standalone::
+
+    python benchmarks/mock_api.py --port 8765 --latency 0.05 --rate-429 0.02
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+STYLE_TAGS = ["indie", "retro", "grunge", "punk", "minimalist", "techwear", "cottagecore",
+              "cyberpunk", "streetwear", "gothic", "boho", "vintage", "dark academia", "y2k"]
+SPOTIFY_GENRES = ["indie pop", "rock", "electronic", "jazz", "classical", "hip-hop", "dance pop"]
+TMDB_GENRE_IDS = [28, 35, 18, 10749, 27, 16, 878, 80]
+
+
+def _seed(*parts):
+    return int(hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()[:8], 16)
+
+
+def _rng(*parts):
+    return random.Random(_seed(*parts))
+
+
+class MockAPIServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_429=0.0, retry_after=1, route_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.route_latency = dict(route_latency or {})
+        self.counts = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._jpeg = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    # --- lifecycle ----------------------------------------------------
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def env(self):
+        """Environment overrides that point config.py at this server."""
+        b = self.base_url
+        return {
+            "TMDB_API_BASE":         f"{b}/tmdb/3",
+            "TMDB_IMAGE_BASE":       f"{b}/tmdb-img",
+            "LASTFM_API_BASE":       f"{b}/lastfm/2.0/",
+            "SPOTIFY_API_BASE":      f"{b}/spotify/v1",
+            "SPOTIFY_ACCOUNTS_BASE": f"{b}/spotify-accounts",
+            "QLOO_API_BASE":         f"{b}/qloo",
+            "UNSPLASH_API_BASE":     f"{b}/unsplash",
+            "PEXELS_API_BASE":       f"{b}/pexels/v1",
+            "PIXABAY_API_BASE":      f"{b}/pixabay/api/",
+            "IMGBB_API_BASE":        f"{b}/imgbb/1",
+            "API_QLOO_KEY": "mock", "API_TMDB_KEY": "mock", "API_UNSPLASH_KEY": "mock",
+            "API_LASTFM_KEY": "mock", "API_PEXELS_KEY": "mock", "API_PIXABAY_KEY": "mock",
+            "SPOTIFY_CLIENT_ID": "mock", "SPOTIFY_CLIENT_SECRET": "mock",
+            "IMGBB_IMGBB_API_KEY": "mock",
+        }
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.counts)
+
+    # --- payloads -----------------------------------------------------
+    def image_url(self, name):
+        return f"{self.base_url}/img/{name}.jpg"
+
+    def jpeg_bytes(self):
+        if self._jpeg is None:
+            from PIL import Image
+            buf = BytesIO()
+            Image.new("RGB", (1080, 1620), (180, 120, 90)).save(buf, "JPEG", quality=85)
+            self._jpeg = buf.getvalue()
+        return self._jpeg
+
+    def tmdb_movie(self, movie_id):
+        r = _rng("movie", movie_id)
+        return {
+            "id": movie_id,
+            "title": f"Movie {movie_id}",
+            "overview": "A mock overview. " * r.randint(5, 20),
+            "poster_path": f"/poster{movie_id}.jpg",
+            "genre_ids": r.sample(TMDB_GENRE_IDS, r.randint(1, 3)),
+            "popularity": r.random() * 100,
+        }
+
+    def tmdb_recommendations(self, movie_id, page):
+        return {"page": page, "total_pages": 5, "results": [
+            self.tmdb_movie(movie_id * 7 + page * 20 + i) for i in range(20)]}
+
+    def tmdb_providers(self, movie_id):
+        r = _rng("providers", str(movie_id))
+        providers = [{"provider_name": f"Stream{n}", "logo_path": f"/logo{n}.png"}
+                     for n in r.sample(range(20), r.randint(0, 3))]
+        return {"id": movie_id, "results": {
+            "US": {"link": "https://www.themoviedb.org/watch", "flatrate": providers}}}
+
+    def spotify_track(self, track_id):
+        r = _rng("track", track_id)
+        artist_id = f"artist{r.randint(1, 500)}"
+        return {
+            "id": track_id,
+            "name": f"Track {track_id}",
+            "artists": [{"id": artist_id, "name": f"Artist {artist_id[6:]}"}],
+            "album": {"images": [{"url": self.image_url(f"album-{track_id}")}]},
+            "preview_url": f"{self.base_url}/preview/{track_id}.mp3",
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        }
+
+    def route(self, method, path, query, body, headers):
+        """Return (route_name, status, payload-or-bytes, extra_headers)."""
+        q = {k: v[0] for k, v in query.items()}
+
+        # --- TMDB ---
+        if path == "/tmdb/3/search/movie":
+            base = _seed(q.get("query", "")) % 100000
+            return "tmdb.search", 200, {"results": [self.tmdb_movie(base + i) for i in range(5)]}, {}
+        m = re.fullmatch(r"/tmdb/3/movie/(\d+)/recommendations", path)
+        if m:
+            return "tmdb.recommendations", 200, self.tmdb_recommendations(int(m.group(1)), int(q.get("page", 1))), {}
+        m = re.fullmatch(r"/tmdb/3/movie/(\d+)/watch/providers", path)
+        if m:
+            return "tmdb.providers", 200, self.tmdb_providers(int(m.group(1))), {}
+        m = re.fullmatch(r"/tmdb/3/movie/(\d+)", path)
+        if m:
+            movie_id = int(m.group(1))
+            movie = self.tmdb_movie(movie_id)
+            appended = q.get("append_to_response", "").split(",")
+            if "recommendations" in appended:
+                movie["recommendations"] = self.tmdb_recommendations(movie_id, 1)
+            if "watch/providers" in appended:
+                movie["watch/providers"] = self.tmdb_providers(movie_id)
+            return "tmdb.movie", 200, movie, {}
+        if path == "/tmdb/3/discover/movie":
+            base = _seed(q.get("with_genres"), q.get("region"), q.get("page", 1)) % 100000
+            return "tmdb.discover", 200, {"page": int(q.get("page", 1)), "total_pages": 50, "results": [
+                self.tmdb_movie(base + i) for i in range(20)]}, {}
+        if path.startswith("/tmdb-img/"):
+            return "tmdb.image", 200, self.jpeg_bytes(), {"Content-Type": "image/jpeg"}
+
+        # --- Last.fm ---
+        if path == "/lastfm/2.0/":
+            if q.get("method") == "track.search":
+                r = _rng("lfm", q.get("track", ""))
+                return "lastfm.search", 200, {"results": {"trackmatches": {"track": [
+                    {"name": q.get("track", "").title(), "artist": f"Artist {r.randint(1, 500)}"}]}}}, {}
+            if q.get("method") == "track.getsimilar":
+                r = _rng("lfm-sim", q.get("artist"), q.get("track"))
+                return "lastfm.similar", 200, {"similartracks": {"track": [
+                    {"name": f"Song {r.randint(1, 10 ** 6)}", "artist": {"name": f"Artist {r.randint(1, 500)}"},
+                     "url": "https://www.last.fm/music/mock", "match": round(1 - i * 0.05, 3)}
+                    for i in range(int(q.get("limit", 5)))]}}, {}
+            return "lastfm.other", 400, {"error": 3, "message": "Invalid method"}, {}
+
+        # --- Spotify ---
+        if path == "/spotify-accounts/api/token" and method == "POST":
+            return "spotify.token", 200, {"access_token": f"tok{self._random.random()}",
+                                          "token_type": "Bearer", "expires_in": 3600}, {}
+        if path.startswith("/spotify/v1/"):
+            if not headers.get("Authorization", "").startswith("Bearer tok"):
+                return "spotify.unauthorized", 401, {"error": {"status": 401, "message": "Invalid access token"}}, {}
+            if path == "/spotify/v1/search":
+                base = _seed(q.get("q", "")) % 10 ** 6
+                return "spotify.search", 200, {"tracks": {"items": [
+                    self.spotify_track(f"t{base + i}") for i in range(int(q.get("limit", 5)))]}}, {}
+            if path == "/spotify/v1/tracks":
+                ids = [i for i in q.get("ids", "").split(",") if i]
+                return "spotify.tracks", 200, {"tracks": [self.spotify_track(i) for i in ids]}, {}
+            m = re.fullmatch(r"/spotify/v1/tracks/([^/]+)", path)
+            if m:
+                return "spotify.track", 200, self.spotify_track(m.group(1)), {}
+            m = re.fullmatch(r"/spotify/v1/artists/([^/]+)", path)
+            if m:
+                r = _rng("artist", m.group(1))
+                return "spotify.artist", 200, {"id": m.group(1), "genres": r.sample(SPOTIFY_GENRES, 2)}, {}
+
+        # --- Qloo ---
+        if path == "/qloo/search":
+            name = q.get("query", "")
+            return "qloo.search", 200, {"results": [
+                {"entity_id": f"urn:mock:{_seed(name) % 10 ** 6}", "name": name}]}, {}
+        m = re.fullmatch(r"/qloo/v1/(\w+)/related", path)
+        if m:
+            r = _rng("qloo", json.dumps(body, sort_keys=True))
+            return "qloo.related", 200, {"results": [
+                {"name": r.choice(STYLE_TAGS), "tags": [{"name": t} for t in r.sample(STYLE_TAGS, 2)]}
+                for _ in range((body or {}).get("limit", 5))]}, {}
+        if path == "/qloo/v1/insights/recommendations":
+            return "qloo.recommendations", 200, {"results": [{"name": f"Movie {i}"} for i in range(5)]}, {}
+
+        # --- Image providers ---
+        if path == "/unsplash/search/photos":
+            r = _rng("unsplash", q.get("query"), q.get("page"))
+            return "unsplash.search", 200, {"results": [
+                {"id": f"u{i}", "urls": {k: self.image_url(f"u{r.randint(1, 10 ** 6)}-{k}")
+                                         for k in ("raw", "full", "regular", "small", "thumb")}}
+                for i in range(int(q.get("per_page", 10)))]}, {}
+        if path == "/pexels/v1/search":
+            r = _rng("pexels", q.get("query"), q.get("page"))
+            return "pexels.search", 200, {"photos": [
+                {"src": {k: self.image_url(f"p{r.randint(1, 10 ** 6)}-{k}") for k in ("large", "medium", "tiny")}}
+                for _ in range(int(q.get("per_page", 15)))]}, {}
+        if path == "/pixabay/api/":
+            r = _rng("pixabay", q.get("q"), q.get("page"))
+            return "pixabay.search", 200, {"hits": [
+                {k: self.image_url(f"x{r.randint(1, 10 ** 6)}-{k}")
+                 for k in ("largeImageURL", "webformatURL", "previewURL")}
+                for _ in range(int(q.get("per_page", 20)))]}, {}
+        if path.startswith("/img/"):
+            return "image", 200, self.jpeg_bytes(), {"Content-Type": "image/jpeg"}
+
+        # --- imgbb ---
+        if path == "/imgbb/1/upload" and method == "POST":
+            return "imgbb.upload", 200, {"data": {"url": self.image_url(f"upload-{self._random.randint(1, 10 ** 9)}")}}, {}
+
+        return "unknown", 404, {"error": "not found", "path": path}, {}
+
+    # --- request handling ---------------------------------------------
+    def _delay(self, route_name):
+        provider = route_name.split(".")[0]
+        base = self.route_latency.get(route_name, self.route_latency.get(provider, self.latency))
+        with self._lock:
+            delay = base + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _fault(self):
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.error_rate:
+            return 500
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"      # keep-alive, like the real APIs
+            disable_nagle_algorithm = True     # headers and body go out as separate writes
+
+            def _handle(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = None
+                if raw and "json" in (self.headers.get("Content-Type") or ""):
+                    body = json.loads(raw)
+
+                if parts.path == "/__stats":
+                    return self._send(200, dict(server.snapshot()), {})
+                if parts.path == "/__reset":
+                    server.reset_counts()
+                    return self._send(200, {"ok": True}, {})
+
+                name, status, payload, extra = server.route(
+                    method, parts.path, parse_qs(parts.query), body, self.headers)
+                with server._lock:
+                    server.counts[name] += 1
+                server._delay(name)
+
+                fault = server._fault()
+                if fault == 429:
+                    return self._send(429, {"error": "rate limited"},
+                                      {"Retry-After": str(server.retry_after)})
+                if fault == 500:
+                    return self._send(500, {"error": "injected failure"}, {})
+
+                if name.startswith("tmdb.") and isinstance(payload, dict) and status == 200:
+                    etag = '"%s"' % hashlib.md5(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+                    extra = {"ETag": etag, "Cache-Control": "public, max-age=60", **extra}
+                    if self.headers.get("If-None-Match") == etag:
+                        return self._send(304, b"", extra)
+                return self._send(status, payload, extra)
+
+            def _send(self, status, payload, extra):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                if not isinstance(payload, bytes):
+                    self.send_header("Content-Type", "application/json")
+                for k, v in extra.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def parse_route_latency(values):
+    out = {}
+    for item in values or []:
+        name, _, seconds = item.partition("=")
+        out[name] = float(seconds)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500s")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of 429s")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--route-latency", action="append", metavar="ROUTE=SECONDS",
+                        help="per provider/route latency, e.g. unsplash=0.8 or tmdb.search=0.2")
+    args = parser.parse_args()
+
+    server = MockAPIServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                           args.rate_429, args.retry_after, parse_route_latency(args.route_latency))
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    print(f"# serving on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
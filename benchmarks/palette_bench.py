@@ -0,0 +1,72 @@
+"""Throughput of the dominant-colour palette extractor (palettes.py).
+
+Runs synthetic thumbnail-sized photos through ``palette`` + ``color_shares``:
+
+* one thread - images per second on a single core
+* N threads  - images per second with PALETTE_CONCURRENCY threads, and per core
+
+and times a colour filter over a per-style index of --index-size looks.
+
+    python benchmarks/palette_bench.py --images 500
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import palettes  # noqa: E402
+from cutout_bench import synthetic_photos  # noqa: E402
+
+
+def extract(img):
+    return palettes.color_shares(*palettes.palette(img))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--size", default="200x300", help="photo WxH (coverflow thumbnails are 200x300)")
+    parser.add_argument("--threads", type=int, default=palettes.PALETTE_CONCURRENCY)
+    parser.add_argument("--index-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    size = tuple(int(v) for v in args.size.split("x"))
+    images = [Image.open(BytesIO(b)).convert("RGB") for b in synthetic_photos(args.images, size)]
+    print(f"{len(images)} images {args.size}  cores {cores}")
+
+    t0 = time.perf_counter()
+    for img in images:
+        extract(img)
+    rate = len(images) / (time.perf_counter() - t0)
+    print(f"1 thread     {rate:8.1f} img/s  {rate:8.1f} img/s/core")
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(extract, images))
+        rate = len(images) / (time.perf_counter() - t0)
+    used = min(args.threads, cores)
+    print(f"{args.threads} threads    {rate:8.1f} img/s  {rate / used:8.1f} img/s/core")
+
+    index = palettes.PaletteIndex()
+    sample = [palettes.palette(img) for img in images[:50]]
+    for i in range(args.index_size):
+        index.add(f"u{i}", *sample[i % len(sample)])
+    urls = [f"u{i}" for i in range(args.index_size)]
+    t0 = time.perf_counter()
+    shares = index.shares(urls, "blue")
+    np.argsort(-shares, kind="stable")
+    print(f"filter {args.index_size} looks by colour: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
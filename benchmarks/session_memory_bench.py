@@ -0,0 +1,84 @@
+"""Bytes per Streamlit session for the similar-movie and outfit lists.
+
+Builds --sessions synthetic sessions. Each one holds a couple of TMDB
+pages of similar movies and a few pages of looks, drawn from a shared
+catalogue. Every session decodes its own JSON, the way response_cache and
+the provider searches hand it out. Memory is measured with tracemalloc in
+two modes:
+
+* before - the dicts media_api returns (format_movie / normalize_image)
+* after  - session_records: slotted records with shared strings
+
+    python benchmarks/session_memory_bench.py --sessions 300
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import session_records  # noqa: E402
+from media_api import OUTFIT_POOL_SIZE, format_movie, normalize_image  # noqa: E402
+
+
+def catalogue(movies, looks, seed=0):
+    rng = random.Random(seed)
+    words = ["the", "a", "city", "night", "love", "story", "dark", "river", "young", "war", "home", "last"]
+    tmdb = [{"id": 1000 + i, "title": " ".join(rng.choices(words, k=3)).title(),
+             "overview": " ".join(rng.choices(words, k=rng.randint(30, 70))).capitalize() + ".",
+             "poster_path": f"/{rng.getrandbits(64):016x}.jpg", "genre_ids": [18, 10749],
+             "release_date": "2019-05-01", "vote_average": 7.1, "popularity": 41.5}
+            for i in range(movies)]
+    unsplash = [{"id": f"{i:011d}", "urls": {
+        kind: f"https://images.unsplash.com/photo-{1500000000000 + i}-{rng.getrandbits(48):012x}"
+              f"?ixlib=rb-4.0.3&q=80&fm=jpg&crop=entropy&cs=tinysrgb&w={w}&fit=max"
+        for kind, w in (("regular", 1080), ("small", 400), ("thumb", 200))}}
+        for i in range(looks)]
+    return tmdb, unsplash
+
+
+def session(tmdb, unsplash, rng, compact):
+    """One session's lists, decoded from fresh JSON like a cache read."""
+    movies = [format_movie(m) for m in json.loads(json.dumps(rng.sample(tmdb, 40)))]
+    looks = [normalize_image("unsplash", r["urls"]["regular"], r["urls"]["small"], r["urls"]["thumb"])
+             for r in json.loads(json.dumps(rng.sample(unsplash, OUTFIT_POOL_SIZE * 3)))]
+    if compact:
+        return session_records.compact_movies(movies), session_records.compact_outfits(looks)
+    return movies, looks
+
+
+def measure(tmdb, unsplash, sessions, compact):
+    session_records._shared.clear()
+    rng = random.Random(1)
+    gc.collect()
+    tracemalloc.start()
+    kept = [session(tmdb, unsplash, rng, compact) for _ in range(sessions)]
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return used / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--movies", type=int, default=500, help="distinct movies across all sessions")
+    parser.add_argument("--looks", type=int, default=900, help="distinct looks across all sessions")
+    args = parser.parse_args()
+
+    tmdb, unsplash = catalogue(args.movies, args.looks)
+    before = measure(tmdb, unsplash, args.sessions, compact=False)
+    after = measure(tmdb, unsplash, args.sessions, compact=True)
+    print(f"{args.sessions} sessions  40 movies + {OUTFIT_POOL_SIZE * 3} looks each")
+    print(f"before  {before / 1024:8.1f} KiB/session")
+    print(f"after   {after / 1024:8.1f} KiB/session  ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Each measurement runs in a fresh interpreter so nothing is warm:
+
+* import   - importing the app's helper modules (no Streamlit script run)
+* first run - a full first script run of Testing.py through Streamlit's
+  AppTest with dummy secrets, i.e. everything the user waits on before the
+  first paint is complete
+
+It also checks the import policy: none of HEAVY_MODULES may be loaded by a
+cold start. Exits non-zero when a target is missed.
+
+    python benchmarks/startup_bench.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGET_S = 1.0
+FIRST_RUN_TARGET_S = 3.0
+HEAVY_MODULES = ["rembg", "onnxruntime", "onnx", "timm", "torch", "replicate"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+import config, style_data, media_api, image_cache
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+FIRST_RUN_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("Testing.py", default_timeout=60)
+at.secrets["api"] = {k: "dummy" for k in
+                     ["qloo_key", "tmdb_key", "unsplash_key", "lastfm_key", "pexels_key", "pixabay_key"]}
+at.secrets["spotify"] = {"client_id": "dummy", "client_secret": "dummy"}
+at.secrets["imgbb"] = {"imgbb_api_key": "dummy"}
+at.run()
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules),
+                  "exception": [str(e.value) for e in at.exception]}))
+"""
+
+
+def run_cold(snippet):
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def heavy_loaded(modules):
+    return sorted({m.split(".")[0] for m in modules} & set(HEAVY_MODULES))
+
+
+def measure(name, snippet, runs, target):
+    samples, heavy, errors = [], set(), []
+    for _ in range(runs):
+        result = run_cold(snippet)
+        samples.append(result["seconds"])
+        heavy.update(heavy_loaded(result["modules"]))
+        errors += result.get("exception", [])
+    median = statistics.median(samples)
+    ok = median <= target and not heavy and not errors
+    print(f"{name:<10} median {median:.3f}s  min {min(samples):.3f}s  "
+          f"max {max(samples):.3f}s  target {target:.1f}s  {'OK' if ok else 'FAIL'}")
+    if heavy:
+        print(f"  heavy modules loaded at startup: {', '.join(sorted(heavy))}")
+    for e in errors[:3]:
+        print(f"  script error: {e}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    ok = measure("import", IMPORT_SNIPPET, args.runs, IMPORT_TARGET_S)
+    ok = measure("first run", FIRST_RUN_SNIPPET, args.runs, FIRST_RUN_TARGET_S) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Similar-track graph costs (track_graph.py).
+
+Builds a synthetic graph of --tracks tracks, each with FETCH_LIMIT similar
+tracks, through the same .npz file the app uses, then reports:
+
+* query  - p50/p95 of ``similar`` for each hop count
+* update - time to replace one track's edges (the save is deferred)
+* save   - time to write the whole graph (``flush``)
+* load   - time to reopen the graph from disk, and its size
+
+    python benchmarks/track_graph_bench.py --tracks 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import track_graph  # noqa: E402
+from telemetry import percentile  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(prefix="track-graph-"), "graph.npz")
+    graph = track_graph.TrackGraph(path)
+    graph._load()
+    names = [(f"Song {i}", f"Artist {i % 997}") for i in range(args.tracks)]
+    for title, artist in names:
+        graph.add_track(title, artist)
+    matches = np.linspace(1.0, 0.05, track_graph.FETCH_LIMIT)
+    for node in range(args.tracks):
+        targets = rng.integers(0, args.tracks, track_graph.FETCH_LIMIT)
+        graph.set_similar(node, [(*names[t], "#", m) for t, m in zip(targets, matches)])
+    graph.flush()
+    print(f"{args.tracks} tracks  {len(graph._indices)} edges")
+
+    for hops in (1, 2, 3):
+        samples = []
+        for node in rng.integers(0, args.tracks, args.queries):
+            t0 = time.perf_counter()
+            graph.similar(int(node), 5, hops)
+            samples.append((time.perf_counter() - t0) * 1000)
+        print(f"query  hops={hops}  p50 {percentile(samples, 50):6.2f} ms  p95 {percentile(samples, 95):6.2f} ms")
+
+    samples = []
+    for node in rng.integers(0, args.tracks, args.updates):
+        targets = rng.integers(0, args.tracks, track_graph.FETCH_LIMIT)
+        t0 = time.perf_counter()
+        graph.set_similar(int(node), [(*names[t], "#", m) for t, m in zip(targets, matches)])
+        samples.append((time.perf_counter() - t0) * 1000)
+    print(f"update             p50 {percentile(samples, 50):6.2f} ms  p95 {percentile(samples, 95):6.2f} ms")
+
+    t0 = time.perf_counter()
+    graph.flush()
+    print(f"save               {(time.perf_counter() - t0) * 1000:8.1f} ms")
+
+    t0 = time.perf_counter()
+    reopened = track_graph.TrackGraph(path)
+    assert len(reopened) == args.tracks
+    assert reopened.similar(0, 5) == graph.similar(0, 5)
+    print(f"load               {(time.perf_counter() - t0) * 1000:8.1f} ms  file {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
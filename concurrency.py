@@ -0,0 +1,377 @@
+"""Small concurrency helpers shared across the app.
+
+Everything here is process-wide: module state survives Streamlit reruns,
+so caches and pools created here are shared by every session.
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+_MISSING = object()
+
+
+class Priority:
+    """Priority of one unit of work, shared by every thread it fans out to.
+
+    Mutable so that work started as a background prefetch can be promoted
+    when an interactive caller starts waiting on it.
+    """
+    __slots__ = ("background",)
+
+    def __init__(self, background):
+        self.background = background
+
+    def promote(self):
+        if self.background:
+            self.background = False
+            for hook in _promote_hooks:
+                hook()
+
+
+_promote_hooks = []     # called after a promotion (rate_limit re-sorts its queues)
+
+# Set while running fire-and-forget work; rate_limit queues it behind interactive calls
+work_priority = contextvars.ContextVar("work_priority", default=None)
+
+
+def in_background():
+    priority = work_priority.get()
+    return priority is not None and priority.background
+
+
+def on_promote(hook):
+    _promote_hooks.append(hook)
+
+
+def _carry_context(fn, priority=None):
+    """Wrap ``fn`` to run in a copy of the caller's context (keeps trace ids on worker threads)."""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        local = ctx.copy()
+        if priority is not None:
+            local.run(work_priority.set, priority)
+        return local.run(fn, *args, **kwargs)
+    return run
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after set."""
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def run_concurrently(fn, items, max_workers=5):
+    """Call ``fn(item)`` for every item with bounded concurrency.
+
+    Results come back in input order; wall time is roughly the slowest call
+    instead of the sum. Exceptions propagate, so ``fn`` should handle its own.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if len(items) == 1:
+        return [fn(items[0])]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(_carry_context(fn), items))
+
+
+# Shared pool for fire-and-forget work (prefetching the next page, warming caches)
+BACKGROUND_WORKERS = 8
+_background_pool = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS,
+                                      thread_name_prefix="prefetch")
+
+
+def submit_background(fn, *args, priority=None, **kwargs):
+    """Run ``fn`` on the background pool at ``priority`` (a new background Priority by default)."""
+    return _background_pool.submit(_carry_context(fn, priority or Priority(True)), *args, **kwargs)
+
+
+class _Load:
+    __slots__ = ("done", "priority", "claimed")
+
+    def __init__(self):
+        self.done = Future()
+        self.priority = Priority(True)
+        self.claimed = False
+
+
+class BackgroundLoader:
+    """TTL cache whose misses are filled by ``loader(key)``.
+
+    ``prefetch`` starts a background load without waiting. ``get`` returns
+    the cached value or waits on the load already in flight for that key, so
+    a key is never fetched twice at once. A load only stays at background
+    priority while nobody interactive waits for it: ``get`` from an
+    interactive caller promotes a running load, and runs one that is still
+    queued behind other prefetches itself. Empty results are returned but
+    not cached.
+    """
+
+    def __init__(self, loader, ttl, maxsize=1024):
+        self.loader = loader
+        self.cache = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._inflight = {}     # key -> _Load
+        self._lock = threading.Lock()
+
+    def _run(self, key, load):
+        # Whoever claims the load first (pool worker or waiting caller) runs it
+        with self._lock:
+            if load.claimed:
+                return
+            load.claimed = True
+        try:
+            value = self.loader(key)
+            if value:
+                self.cache.set(key, value)
+            load.done.set_result(value)
+        except Exception as e:
+            load.done.set_exception(e)
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is load:
+                    del self._inflight[key]
+
+    def _start(self, key):
+        with self._lock:
+            load = self._inflight.get(key)
+            if load is None and key not in self.cache:
+                load = self._inflight[key] = _Load()
+                submit_background(self._run, key, load, priority=load.priority)
+            return load
+
+    def prefetch(self, key):
+        load = self._start(key)
+        return load.done if load else None
+
+    def get(self, key, timeout=None):
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        load = self._start(key)
+        if load is None:       # landed in the cache between the two checks
+            return self.cache.get(key)
+        if not in_background():
+            load.priority.promote()
+            self._run(key, load)     # no-op unless it is still queued on the pool
+        return load.done.result(timeout=timeout)
+
+
+class InFlightBatches:
+    """Fire-and-forget batches on the background pool, each key in at most one batch at a time.
+
+    ``submit(items, fn)`` drops items whose key is already being processed,
+    runs ``fn(fresh_items)`` in the background and releases the keys when it
+    finishes, whether or not it raised. Like BackgroundLoader's in-flight
+    map, but for batch work whose results are stored elsewhere.
+    """
+
+    def __init__(self):
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, items, fn, key=None):
+        """Start ``fn`` on the items not already in flight; returns those items ([] if none)."""
+        key = key or (lambda item: item)
+        with self._lock:
+            todo, keys = [], []
+            for item in items:
+                k = key(item)
+                if k not in self._inflight:
+                    self._inflight.add(k)
+                    todo.append(item)
+                    keys.append(k)
+        if not todo:
+            return []
+
+        def run():
+            try:
+                fn(todo)
+            finally:
+                with self._lock:
+                    self._inflight.difference_update(keys)
+        submit_background(run)
+        return todo
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    flight wait and get the same result, or the same exception. Nothing is
+    kept once the call finishes, so this is deduplication, not caching.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Returns ``(result, shared)``; ``shared`` is True for waiters."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class CircuitBreaker:
+    """Skip a provider after repeated failures, then let one trial call through.
+
+    closed -> open after ``failure_threshold`` consecutive failures; open ->
+    half-open once ``reset_timeout`` seconds pass; a half-open success closes
+    it again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def hedged_first(calls, hedge_delay=0.5, deadline=5.0, is_valid=bool, breakers=None):
+    """Race ``calls`` ([(name, fn), ...]) in priority order.
+
+    The first call starts immediately; the next one starts after
+    ``hedge_delay`` seconds or as soon as every running call has failed.
+    Returns ``(name, result)`` for the first valid result, or ``(None, None)``
+    once all calls fail or ``deadline`` passes. Providers whose circuit
+    breaker is open are skipped without waiting.
+    """
+    breakers = breakers or {}
+    queue = list(calls)
+    end = time.monotonic() + deadline
+    pending = {}
+
+    def run(name, fn):
+        # Record on completion, even if the race was already decided
+        breaker = breakers.get(name)
+        try:
+            result = fn()
+        except Exception:
+            if breaker:
+                breaker.record_failure()
+            raise
+        if breaker:
+            breaker.record_success()
+        return result
+
+    def launch():
+        # Ask the breaker only when the call really starts: allow() takes a
+        # half-open breaker's single trial slot
+        while queue:
+            name, fn = queue.pop(0)
+            if name not in breakers or breakers[name].allow():
+                pending[_hedge_pool.submit(_carry_context(run), name, fn)] = name
+                return
+
+    launch()
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        timeout = min(hedge_delay, remaining) if queue else remaining
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            if is_valid(result):
+                return name, result
+        # Hedge delay elapsed or a call came back empty: start the next one
+        launch()
+    return None, None
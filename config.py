@@ -0,0 +1,34 @@
+"""Upstream base URLs and API keys.
+
+Base URLs can be pointed somewhere else (e.g. the local stand-in server in
+benchmarks/mock_api.py) through environment variables of the same name.
+Keys come from the environment first (``API_TMDB_KEY``,
+``SPOTIFY_CLIENT_ID``, ...), then from Streamlit secrets.
+"""
+import os
+
+TMDB_API_BASE         = os.environ.get("TMDB_API_BASE", "https://api.themoviedb.org/3")
+TMDB_IMAGE_BASE       = os.environ.get("TMDB_IMAGE_BASE", "https://image.tmdb.org/t/p")
+LASTFM_API_BASE       = os.environ.get("LASTFM_API_BASE", "http://ws.audioscrobbler.com/2.0/")
+SPOTIFY_API_BASE      = os.environ.get("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_BASE = os.environ.get("SPOTIFY_ACCOUNTS_BASE", "https://accounts.spotify.com")
+QLOO_API_BASE         = os.environ.get("QLOO_API_BASE", "https://hackathon.api.qloo.com")
+UNSPLASH_API_BASE     = os.environ.get("UNSPLASH_API_BASE", "https://api.unsplash.com")
+PEXELS_API_BASE       = os.environ.get("PEXELS_API_BASE", "https://api.pexels.com/v1")
+PIXABAY_API_BASE      = os.environ.get("PIXABAY_API_BASE", "https://pixabay.com/api/")
+IMGBB_API_BASE        = os.environ.get("IMGBB_API_BASE", "https://api.imgbb.com/1")
+
+# Latency/waterfall sidebar for every session (otherwise opt in with ?debug=1)
+DEBUG_SIDEBAR = os.environ.get("STYLETWIN_DEBUG") == "1"
+
+
+def secret(section, key):
+    """``st.secrets[section][key]``, overridable by the ``SECTION_KEY`` env var."""
+    env_name = f"{section}_{key}".upper()
+    if env_name in os.environ:
+        return os.environ[env_name]
+    try:
+        import streamlit as st
+        return st.secrets[section][key]
+    except Exception:
+        return None
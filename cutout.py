@@ -0,0 +1,207 @@
+"""Background removal ("cut-outs") with rembg's ONNX models.
+
+The model runs on a warm, batching session pool (inference.py) that is
+loaded once per process; ``CUTOUT_SESSIONS`` and ``CUTOUT_MAX_BATCH``
+override its core-based sizing.
+
+Cut-outs are PNGs on disk keyed by the SHA-256 of the source bytes plus the
+model name, so an image is only ever cut out once per model.
+
+rembg and onnxruntime are imported lazily (see the import policy in
+Testing.py). ``REMBG_MODEL`` picks the model (default ``u2net``);
+``REMBG_MODEL_PATH`` loads a local .onnx file instead of rembg's download.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import http_client
+import telemetry
+from concurrency import TTLCache
+from inference import POOL_SIZE, SessionPool
+
+MODEL = os.environ.get("REMBG_MODEL", "u2net")
+MODEL_PATH = os.environ.get("REMBG_MODEL_PATH")
+CUTOUT_DIR = os.environ.get("CUTOUT_CACHE_DIR", ".cutout_cache")
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+MAX_DIMENSION = 1024          # cut-outs are shown at card size; bigger sources are downscaled first
+
+# Model -> (mean, std, input size), matching rembg's own preprocessing
+_U2NET_INPUT = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320))
+MODEL_INPUTS = {
+    "u2net":             _U2NET_INPUT,
+    "u2netp":            _U2NET_INPUT,
+    "u2net_human_seg":   _U2NET_INPUT,
+    "silueta":           _U2NET_INPUT,
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+
+def _model_path(model):
+    if MODEL_PATH:
+        return MODEL_PATH
+    from rembg.sessions import sessions_class
+    for cls in sessions_class:
+        if cls.name() == model:
+            return str(cls.download_models())
+    raise ValueError(f"unknown rembg model: {model}")
+
+
+def preprocess(img, size, mean, std):
+    """RGB image -> normalised CHW float32 array, the way rembg feeds U2-Net."""
+    arr = np.asarray(img.convert("RGB").resize(size, Image.LANCZOS), dtype=np.float32)
+    arr /= max(float(arr.max()), 1e-6)
+    arr = (arr - np.asarray(mean, np.float32)) / np.asarray(std, np.float32)
+    return arr.transpose(2, 0, 1)
+
+
+def apply_mask(img, pred):
+    """Cut ``img`` out with a model prediction (HxW floats) as its alpha channel."""
+    lo, hi = float(pred.min()), float(pred.max())
+    pred = (pred - lo) / (hi - lo) if hi > lo else np.zeros_like(pred)
+    mask = Image.fromarray((pred * 255).astype(np.uint8), "L").resize(img.size, Image.LANCZOS)
+    cut = img.convert("RGBA")
+    cut.putalpha(mask)
+    return cut
+
+
+_pool = SessionPool("cutout", lambda: _model_path(MODEL), MODEL_INPUTS.get(MODEL, _U2NET_INPUT)[2],
+                    size=int(os.environ.get("CUTOUT_SESSIONS", POOL_SIZE)),
+                    max_batch=int(os.environ.get("CUTOUT_MAX_BATCH", 4)))
+MEAN, STD, _ = MODEL_INPUTS.get(MODEL, _U2NET_INPUT)
+cache_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def warm_up():
+    """Start loading the model in the background; returns immediately."""
+    _pool.start()
+
+
+def _cache_path(data):
+    digest = hashlib.sha256(data + b"|" + MODEL.encode()).hexdigest()
+    return os.path.join(CUTOUT_DIR, digest[:32] + ".png")
+
+
+def _open(data):
+    img = Image.open(BytesIO(data))
+    img.draft("RGB", (MAX_DIMENSION, MAX_DIMENSION))
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+    return img
+
+
+def _store(path, cut):
+    os.makedirs(CUTOUT_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        cut.save(f, "PNG")
+    os.replace(tmp, path)
+
+
+def cutout_paths(images):
+    """Cut-out PNG paths for a list of encoded images (bytes), in order.
+
+    Cached results are returned straight from disk; the rest are submitted
+    together so the pool can batch them. Failed images map to None.
+    """
+    paths = [_cache_path(data) for data in images]
+    misses = [i for i, path in enumerate(paths) if not os.path.exists(path)]
+    cache_stats["hits"] += len(paths) - len(misses)
+    cache_stats["misses"] += len(misses)
+    if not misses:
+        return paths
+    try:
+        _pool.wait_ready()                 # the input size is known once the model is loaded
+    except Exception:
+        cache_stats["errors"] += len(misses)
+        return [None if i in misses else p for i, p in enumerate(paths)]
+
+    todo = []
+    for i in misses:
+        try:
+            img = _open(images[i])
+            todo.append((i, img, preprocess(img, _pool.input_size, MEAN, STD)))
+        except Exception:
+            cache_stats["errors"] += 1
+            paths[i] = None
+    if not todo:
+        return paths
+    for (i, img, _), future in zip(todo, _pool.submit([a for _, _, a in todo])):
+        try:
+            _store(paths[i], apply_mask(img, future.result()[0]))
+        except Exception:
+            cache_stats["errors"] += 1
+            paths[i] = None
+    return paths
+
+
+def remove_background(data):
+    """PNG bytes of ``data`` (an encoded image) with its background removed, or None."""
+    path = cutout_paths([data])[0]
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Remote URL -> cut-out path, so a repeat lookup skips the download and the hash
+_url_paths = TTLCache(ttl=24 * 60 * 60, maxsize=2000)
+
+
+def _download(url):
+    with http_client.get(url, stream=True) as resp:
+        resp.raise_for_status()
+        raw = resp.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+    if len(raw) > MAX_SOURCE_BYTES:
+        raise ValueError(f"image too large: {url}")
+    return raw
+
+
+def _read(fileobj):
+    fileobj.seek(0)
+    data = fileobj.read()
+    fileobj.seek(0)
+    return data
+
+
+def cutout_sources(sources):
+    """Cut-out paths for remote image URLs and/or uploaded (seekable) files.
+
+    Everything not cached yet goes through the pool as one batch. Returns
+    paths in input order; None for None sources and failed images.
+    """
+    paths = [None] * len(sources)
+    todo = []
+    for i, source in enumerate(sources):
+        if source is None:
+            continue
+        if isinstance(source, str):
+            cached = _url_paths.get(source)
+            if cached and os.path.exists(cached):
+                paths[i] = cached
+                continue
+        try:
+            todo.append((i, _download(source) if isinstance(source, str) else _read(source)))
+        except Exception:
+            cache_stats["errors"] += 1
+    for (i, _), path in zip(todo, cutout_paths([data for _, data in todo])):
+        paths[i] = path
+        if path and isinstance(sources[i], str):
+            _url_paths.set(sources[i], path)
+    return paths
+
+
+def stats():
+    return dict(_pool.stats, **cache_stats, model=MODEL, sessions=_pool.size,
+                intra_op_threads=_pool.threads, batchable=_pool.batchable)
+
+
+def _collect():
+    return [("styletwin_cutout_cache_total", "counter", "Cut-out lookups by result.",
+             [("", {"result": k}, v) for k, v in cache_stats.items()])]
+
+
+telemetry.register_collector(_collect)
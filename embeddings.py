@@ -0,0 +1,349 @@
+"""On-device outfit embeddings and a "more like this" nearest-neighbour index.
+
+Every outfit shown in the coverflow is embedded on the CPU by a timm model
+exported to ONNX (``EMBED_MODEL``, default ``mobilenetv3_small_100``) and
+run on a warm, batching session pool (inference.py). Images are read from
+the coverflow thumbnail cache, preprocessed on a thread pool and sent to
+the model in batches.
+
+The index is two append-only files per model under ``EMBED_CACHE_DIR``:
+
+* ``vectors.f16`` - L2-normalised float16 rows, memory-mapped for queries
+* ``items.jsonl`` - one line per row: URL, SHA-256 of the image, image dict
+
+Rows are keyed by image hash, so the same picture under another URL is
+never embedded twice. A query is one matrix-vector product. Upcasting
+float16 is the expensive part, so the leading rows (DENSE_MAX_BYTES, about
+16k looks at 1024 dimensions) are kept upcast in RAM; rows beyond that are
+scored straight from the memory map.
+
+The model is exported on first use when timm and torch are installed, or
+ahead of time with ``python embeddings.py --export``. Without a model the
+index stays empty and ``similar_outfits`` returns [].
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from concurrency import InFlightBatches, run_concurrently
+from image_cache import thumbnail_path
+from inference import POOL_SIZE, SessionPool
+
+ENABLED = os.environ.get("EMBEDDINGS_ENABLED", "1") != "0"
+MODEL = os.environ.get("EMBED_MODEL", "mobilenetv3_small_100")
+CACHE_DIR = os.path.join(os.environ.get("EMBED_CACHE_DIR", ".embed_cache"), MODEL)
+MODEL_PATH = os.environ.get("EMBED_MODEL_PATH", os.path.join(CACHE_DIR, "model.onnx"))
+THUMB_SIZE = "coverflow"          # embeddings are computed from the coverflow thumbnails
+EMBED_CONCURRENCY = 4             # threads fetching/decoding/preprocessing images
+QUERY_CHUNK = 16384               # rows upcast to float32 per matrix-vector product
+# float16 -> float32 casts dominate query time, so this many bytes of rows stay upcast in RAM
+DENSE_MAX_BYTES = int(os.environ.get("EMBED_DENSE_MAX_BYTES", 64 * 1024 * 1024))
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+# -------------------------------------------------------------------
+# Model
+# -------------------------------------------------------------------
+def export_model(name=MODEL, path=MODEL_PATH):
+    """Export timm's ``name`` (pooled features, no classifier) to ONNX with a dynamic batch."""
+    import timm
+    import torch
+    model = timm.create_model(name, pretrained=True, num_classes=0).eval()
+    cfg = timm.data.resolve_data_config({}, model=model)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(model, torch.zeros(1, *cfg["input_size"]), tmp,
+                          input_names=["input"], output_names=["embedding"],
+                          dynamic_axes={"input": {0: "batch"}, "embedding": {0: "batch"}},
+                          opset_version=17)
+    os.replace(tmp, path)
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump({"model": name, "mean": list(cfg["mean"]), "std": list(cfg["std"])}, f)
+    return path
+
+
+def _model_file():
+    if not os.path.exists(MODEL_PATH):
+        export_model()
+    return MODEL_PATH
+
+
+def _normalization():
+    try:
+        with open(os.path.splitext(MODEL_PATH)[0] + ".json", encoding="utf-8") as f:
+            cfg = json.load(f)
+        return tuple(cfg["mean"]), tuple(cfg["std"])
+    except (OSError, ValueError, KeyError):
+        return IMAGENET_MEAN, IMAGENET_STD
+
+
+_pool = SessionPool("embed", _model_file, (224, 224),
+                    size=int(os.environ.get("EMBED_SESSIONS", POOL_SIZE)),
+                    max_batch=int(os.environ.get("EMBED_MAX_BATCH", 16)))
+
+
+def preprocess(img, size, mean, std):
+    """Centre-cropped, ImageNet-normalised CHW float32 array."""
+    arr = np.asarray(ImageOps.fit(img.convert("RGB"), size, Image.BILINEAR), dtype=np.float32) / 255.0
+    arr = (arr - np.asarray(mean, np.float32)) / np.asarray(std, np.float32)
+    return arr.transpose(2, 0, 1)
+
+
+def embed(images):
+    """Unit-length float32 embeddings for PIL images, batched through the pool."""
+    mean, std = _normalization()
+    _pool.wait_ready()
+    arrays = run_concurrently(lambda img: preprocess(img, _pool.input_size, mean, std),
+                              images, EMBED_CONCURRENCY)
+    vectors = np.stack([np.asarray(v, np.float32).reshape(-1) for v in _pool.run(arrays)])
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# -------------------------------------------------------------------
+# Index
+# -------------------------------------------------------------------
+class EmbeddingIndex:
+    """Append-only float16 vector index with a memory-mapped on-disk form."""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.items_path = os.path.join(directory, "items.jsonl")
+        self.dim = None
+        self.items = []           # row -> {"url", "digest", "image"}
+        self.rows_by_url = {}
+        self.rows_by_digest = {}
+        self._vectors = None      # np.memmap (rows, dim) float16
+        self._dense = None        # float32 copy of the leading rows, for fast queries
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        items = []
+        try:
+            with open(self.items_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        items.append(json.loads(line))
+                    except ValueError:
+                        break                  # torn last line from a crash
+        except OSError:
+            return
+        if not items:
+            return
+        self.dim = items[0]["dim"]
+        row_bytes = 2 * self.dim
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows = min(len(items), size // row_bytes)
+        if rows < len(items) or size != rows * row_bytes:
+            self._truncate(rows)
+        for item in items[:rows]:
+            self._add_item(item)
+        self._map()
+
+    def _truncate(self, rows):
+        """Drop rows past ``rows`` from both files (a crash between the two writes)."""
+        with open(self.vectors_path, "a+b") as f:
+            f.truncate(rows * 2 * self.dim)
+        with open(self.items_path, "r+b") as f:
+            for _ in range(rows):
+                f.readline()
+            f.truncate()
+
+    def _map(self):
+        rows = len(self.items)
+        self._vectors = (np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+                         if rows else None)
+
+    def _add_item(self, item):
+        row = len(self.items)
+        self.items.append(item)
+        self.rows_by_url[item["url"]] = row
+        self.rows_by_digest.setdefault(item["digest"], row)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self.items)
+
+    def row_for(self, url=None, digest=None):
+        with self._lock:
+            self._load()
+            if url in self.rows_by_url:
+                return self.rows_by_url[url]
+            return self.rows_by_digest.get(digest)
+
+    def add(self, entries):
+        """Append ``(url, digest, image, vector)`` tuples; vectors already unit length."""
+        if not entries:
+            return
+        with self._lock:
+            self._load()
+            entries = [e for e in entries if e[0] not in self.rows_by_url]
+            if not entries:
+                return
+            self.dim = self.dim or len(entries[0][3])
+            os.makedirs(os.path.dirname(self.vectors_path), exist_ok=True)
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack([e[3] for e in entries]).astype(np.float16).tobytes())
+            with open(self.items_path, "a", encoding="utf-8") as f:
+                for url, digest, image, _ in entries:
+                    item = {"url": url, "digest": digest, "image": image, "dim": self.dim}
+                    f.write(json.dumps(item) + "\n")
+                    self._add_item(item)
+            self._map()
+
+    def vector(self, row):
+        with self._lock:
+            return np.asarray(self._vectors[row], dtype=np.float32)
+
+    def _densify(self):
+        """float32 copy of the first rows (up to DENSE_MAX_BYTES), grown as rows are added."""
+        rows = min(len(self.items), DENSE_MAX_BYTES // (4 * self.dim)) if self.dim else 0
+        have = 0 if self._dense is None else len(self._dense)
+        if rows > have:
+            fresh = np.asarray(self._vectors[have:rows], dtype=np.float32)
+            self._dense = fresh if self._dense is None else np.concatenate([self._dense, fresh])
+        return self._dense
+
+    def nearest(self, query, k=10, exclude=()):
+        """Rows of the ``k`` most similar vectors to ``query`` (cosine), best first."""
+        with self._lock:
+            self._load()
+            vectors = self._vectors
+            dense = self._densify() if vectors is not None else None
+        if vectors is None:
+            return []
+        query = np.asarray(query, np.float32)
+        scores = np.empty(len(vectors), np.float32)
+        scores[:len(dense)] = dense @ query
+        # Rows past the float32 budget are upcast from the memory map chunk by chunk
+        for start in range(len(dense), len(vectors), QUERY_CHUNK):
+            scores[start:start + QUERY_CHUNK] = vectors[start:start + QUERY_CHUNK].astype(np.float32) @ query
+        for row in exclude:
+            scores[row] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(r) for r in top[np.argsort(-scores[top])] if scores[r] > -np.inf]
+
+
+_index = EmbeddingIndex()
+
+
+# -------------------------------------------------------------------
+# Indexing and queries
+# -------------------------------------------------------------------
+def _load_thumbnail(url):
+    path = thumbnail_path(url, THUMB_SIZE)
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    with Image.open(path) as img:
+        img.load()
+    return hashlib.sha256(data).hexdigest(), img
+
+
+def index_images(images):
+    """Embed and index outfit image dicts that are not in the index yet; returns rows added."""
+    todo = [img for img in images if _index.row_for(img["urls"]["regular"]) is None]
+    if not todo:
+        return 0
+    loaded = run_concurrently(lambda img: _load_thumbnail(img["urls"]["regular"]), todo, EMBED_CONCURRENCY)
+    fresh, known = {}, []                      # fresh: digest -> (pil, [image dicts])
+    for img, result in zip(todo, loaded):
+        if result is None:
+            continue
+        digest, pil = result
+        row = _index.row_for(digest=digest)
+        if row is not None:                    # same picture under another URL: reuse its vector
+            known.append((img["urls"]["regular"], digest, img, _index.vector(row)))
+        else:
+            fresh.setdefault(digest, (pil, []))[1].append(img)
+    if fresh:
+        vectors = embed([pil for pil, _ in fresh.values()])
+        known += [(img["urls"]["regular"], digest, img, vec)
+                  for (digest, (_, imgs)), vec in zip(fresh.items(), vectors) for img in imgs]
+    _index.add(known)
+    return len(known)
+
+
+_indexing = InFlightBatches()
+
+
+def index_images_background(images):
+    """``index_images`` on the background pool; returns immediately."""
+    if not ENABLED:
+        return
+    if _indexing.submit(images, index_images, key=lambda img: img["urls"]["regular"]):
+        _pool.start()
+
+
+def model_loading():
+    """True while the embedding model is still loading (``similar_outfits`` returns [] meanwhile)."""
+    return ENABLED and _pool.loading()
+
+
+def similar_outfits(image, k=12):
+    """Indexed outfit image dicts most like ``image`` (an image dict), best first.
+
+    Embeds ``image`` first if it is not indexed yet. Never waits for the
+    model: until it is loaded, ``image`` is queued for background indexing
+    and [] is returned. [] as well when no model is available.
+    """
+    if not ENABLED:
+        return []
+    url = image["urls"]["regular"]
+    if _index.row_for(url) is None:
+        if not _pool.ready():
+            index_images_background([image])
+            return []
+        try:
+            index_images([image])
+        except Exception:
+            return []
+    row = _index.row_for(url)
+    if row is None:
+        return []
+    digest = _index.items[row]["digest"]
+    query = _index.vector(row)
+    seen = {url}
+    similar = []
+    for r in _index.nearest(query, k + 4, exclude=[row]):
+        item = _index.items[r]
+        if item["digest"] == digest or item["url"] in seen:
+            continue
+        seen.add(item["url"])
+        similar.append(item["image"])
+    return similar[:k]
+
+
+def stats():
+    return dict(_pool.stats, model=MODEL, indexed=len(_index), batchable=_pool.batchable)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the outfit embedding model to ONNX.")
+    parser.add_argument("--export", action="store_true", help="export EMBED_MODEL to EMBED_MODEL_PATH")
+    parser.add_argument("--model", default=MODEL, help="timm model name")
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+    if args.export:
+        print(export_model(args.model, args.output))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Headless recommendation engine and batch CLI.
+
+The pipelines behind "Get Recommendations" and "Get Similar Songs", without
+any Streamlit: Qloo styles first, local archetype scoring as the fallback,
+then similar movies / songs. Results are plain dicts so they can be shown by
+the UI or written out as JSONL.
+
+Batch mode precomputes results for a CSV or JSONL file of inputs (columns /
+keys ``title``, ``genre`` or ``song``; optional ``id``, ``country`` and
+``tmdb_id``):
+
+    python engine.py titles.csv -o results.jsonl --workers 16 --target-rate 20
+
+The output file doubles as the checkpoint: records already in it are
+skipped on the next run, so an interrupted job resumes where it stopped.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import telemetry
+from media_api import (
+    DEFAULT_COUNTRY, QLOO_API_KEY, SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, detect_spotify_genre,
+    enrich_tracks_with_spotify, get_archetypes_from_media, get_enrichment_cache,
+    genre_source, get_movie_page, get_outfit_pools, get_qloo_related_styles, get_similar_songs,
+    get_spotify_token, get_style_tags_from_qloo, outfit_query, qloo_search_entity, similar_movies_source,
+)
+
+# -------------------------------------------------------------------
+# Pipelines
+# -------------------------------------------------------------------
+def recommend_for_movie(title=None, genre=None, country=DEFAULT_COUNTRY, tmdb_id=None):
+    """Archetypes + similar movies for a movie title or a genre.
+
+    ``tmdb_id`` (e.g. from the typeahead index) skips the TMDB title search.
+
+    ``source`` is "qloo" when Qloo returned styles, "archetypes" when the
+    local scorer was used, or None when neither found anything.
+    ``similar_movies`` is the first TMDB page of ``movie_source``; later
+    pages come from ``media_api.get_movie_page``.
+    """
+    media_name = title or genre
+    result = {"kind": "movie", "title": title, "genre": genre, "country": country,
+              "archetypes": [], "source": None, "similar_movies": [],
+              "movie_source": None, "movie_total_pages": 0}
+    if not media_name:
+        return result
+
+    with telemetry.span("get_recommendations", "flow"):
+        styles = []
+        entity_urn = qloo_search_entity(media_name, entity_type="movie")
+        if entity_urn:
+            styles = get_style_tags_from_qloo("movie", media_name, QLOO_API_KEY, entity_id=entity_urn)
+        if styles:
+            result["source"] = "qloo"
+        else:
+            if title:
+                styles = get_archetypes_from_media(movie=title, movie_id=tmdb_id)
+            else:
+                styles = get_archetypes_from_media(genre=genre)
+            result["source"] = "archetypes" if styles else None
+        result["archetypes"] = styles
+
+        if styles:
+            source = similar_movies_source(title, tmdb_id) if title else genre_source(genre, country)
+            if source:
+                page = get_movie_page(source, 1)
+                result["similar_movies"] = page["movies"]
+                result["movie_source"] = list(source)
+                result["movie_total_pages"] = page["total_pages"]
+    return result
+
+
+def recommend_for_song(song, token=None, track=None):
+    """Genre, archetypes and Spotify-enriched similar songs for a song name.
+
+    ``track`` is a typeahead entry for the song; its Spotify id and artist
+    skip the lookups that would otherwise find them.
+    """
+    track = track or {}
+    result = {"kind": "song", "song": song, "display_name": None, "genre": None,
+              "archetypes": [], "source": None, "similar_songs": [], "error": None}
+    if not song:
+        return result
+
+    with telemetry.span("get_similar_songs", "flow"):
+        token = token or get_spotify_token(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+        if not token:
+            result["error"] = "spotify_token"
+            return result
+
+        genre_key, result["display_name"] = detect_spotify_genre(song, token, track_id=track.get("id"))
+        result["genre"] = genre_key
+
+        styles = get_qloo_related_styles("music", song, limit=6)
+        if styles:
+            result["source"] = "qloo"
+        else:
+            styles = get_archetypes_from_media(music=genre_key)
+            result["source"] = "archetypes" if styles else None
+        result["archetypes"] = styles
+
+        similar = get_similar_songs(song, artist=track.get("artist"))
+        if similar:
+            result["similar_songs"] = enrich_tracks_with_spotify(similar, token, get_enrichment_cache())
+    return result
+
+
+def outfits_for(styles, per_style=5, timeout=10):
+    """{style: [image dicts]} from the shared outfit pools (fills them if cold)."""
+    pools = get_outfit_pools()
+    for style in styles:
+        pools.prefetch(outfit_query(style))
+    outfits = {}
+    for style in styles:
+        try:
+            outfits[style] = (pools.get(outfit_query(style), timeout=timeout) or [])[:per_style]
+        except Exception:
+            outfits[style] = []
+    return outfits
+
+
+def run_record(record, outfits=0):
+    """Dispatch one batch input record to the matching pipeline."""
+    if record.get("song"):
+        result = recommend_for_song(record["song"])
+    else:
+        result = recommend_for_movie(record.get("title") or None, record.get("genre") or None,
+                                     record.get("country") or DEFAULT_COUNTRY, record.get("tmdb_id"))
+    if outfits and result["archetypes"]:
+        result["outfits"] = outfits_for(result["archetypes"], per_style=outfits)
+    return result
+
+
+# -------------------------------------------------------------------
+# Batch
+# -------------------------------------------------------------------
+def record_key(record):
+    if record.get("id"):
+        return str(record["id"])
+    for field in ("song", "title", "genre"):
+        if record.get(field):
+            return f"{field}:{record[field].strip().lower()}"
+    return None
+
+
+def read_inputs(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def load_checkpoint(path, retry_errors=False):
+    """Keys already written to ``path``; drops a torn last line from a crash."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                break
+            good_bytes += len(line)
+            if not (retry_errors and row.get("error")):
+                done.add(row["key"])
+    if good_bytes < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+class _Pacer:
+    """Spaces task starts so the batch stays at or below ``rate`` items/s."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run_batch(inputs, output, workers=8, target_rate=None, outfits=0, retry_errors=False,
+              checkpoint_every=50, log=sys.stderr):
+    """Process ``inputs`` concurrently, appending one JSON line per record to ``output``."""
+    done = load_checkpoint(output, retry_errors)
+    pacer = _Pacer(target_rate)
+    counts = {"done": 0, "skipped": 0, "errors": 0}
+    started = time.monotonic()
+
+    def work(key, record):
+        pacer.wait()
+        t0 = time.perf_counter()
+        try:
+            row = run_record(record, outfits)
+        except Exception as e:
+            row = {"error": f"{type(e).__name__}: {e}"}
+        row.update(key=key, input=record, seconds=round(time.perf_counter() - t0, 3))
+        return row
+
+    def write(row, out):
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        counts["done"] += 1
+        counts["errors"] += bool(row.get("error"))
+        if counts["done"] % checkpoint_every == 0:
+            out.flush()
+            os.fsync(out.fileno())
+            rate = counts["done"] / (time.monotonic() - started)
+            print(f"{counts['done']} done, {counts['errors']} errors, {rate:.1f}/s", file=log)
+
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for record in inputs:
+            key = record_key(record)
+            if key is None or key in done:
+                counts["skipped"] += 1
+                continue
+            done.add(key)                      # dedupe repeats within the input too
+            pending.add(pool.submit(work, key, record))
+            if len(pending) >= workers * 2:   # bounded in-flight work, constant memory
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    write(future.result(), out)
+        for future in pending:
+            write(future.result(), out)
+        out.flush()
+        os.fsync(out.fileno())
+
+    elapsed = time.monotonic() - started
+    counts["seconds"] = round(elapsed, 2)
+    counts["rate"] = round(counts["done"] / elapsed, 2) if elapsed else 0.0
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute recommendations for a list of titles or songs.")
+    parser.add_argument("input", help="CSV or JSONL with title / genre / song columns")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--target-rate", type=float, help="items per second to aim for (and not exceed)")
+    parser.add_argument("--outfits", type=int, default=0, metavar="N",
+                        help="also fill outfit pools and store N images per style")
+    parser.add_argument("--retry-errors", action="store_true", help="re-run records that failed last time")
+    args = parser.parse_args()
+
+    counts = run_batch(read_inputs(args.input), args.output, workers=args.workers,
+                       target_rate=args.target_rate, outfits=args.outfits,
+                       retry_errors=args.retry_errors)
+    print(json.dumps(counts), file=sys.stderr)
+    if args.target_rate and counts["done"] and counts["rate"] < 0.9 * args.target_rate:
+        print(f"below target rate ({counts['rate']}/s < {args.target_rate}/s); try more --workers",
+              file=sys.stderr)
+    sys.exit(1 if counts["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Process-wide HTTP client shared by every API helper.
+
+One ``requests.Session`` per upstream host keeps TCP/TLS connections warm
+between Streamlit reruns, and every call gets a default timeout plus a
+bounded retry policy so a stuck upstream can't hang a worker. Calls are
+rate limited per provider (rate_limit.py) and traced (telemetry.py), and
+identical GETs already in flight are answered by that one call.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limit
+import telemetry
+from concurrency import SingleFlight
+
+# -------------------------------------------------------------------
+# Settings
+# -------------------------------------------------------------------
+DEFAULT_TIMEOUT = (3.05, 10)     # (connect, read) seconds
+DEFAULT_POOL_SIZE = 10
+
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.3             # 0.3s, 0.6s, 1.2s ...
+MAX_RETRY_AFTER = 10             # never sleep longer than this on Retry-After
+RETRY_STATUSES = (500, 502, 503, 504)   # 429 is handled by rate_limit, see request()
+MAX_429_RETRIES = 3
+
+# Max pooled connections kept open per host
+HOST_POOL_SIZES = {
+    "api.themoviedb.org":        20,
+    "image.tmdb.org":            20,
+    "ws.audioscrobbler.com":     10,
+    "api.spotify.com":           10,
+    "accounts.spotify.com":      2,
+    "hackathon.api.qloo.com":    10,
+    "api.unsplash.com":          10,
+    "api.pexels.com":            5,
+    "pixabay.com":               5,
+    "api.imgbb.com":             2,
+}
+
+# Hosts where a POST is not safe to replay (uploads)
+NON_IDEMPOTENT_POST_HOSTS = {"api.imgbb.com"}
+
+# Identical concurrent requests with these methods share one upstream call
+COALESCE_METHODS = {"GET", "HEAD"}
+
+
+class _CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps past MAX_RETRY_AFTER."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+def _make_retry(host):
+    methods = {"GET", "HEAD", "OPTIONS"}
+    if host not in NON_IDEMPOTENT_POST_HOSTS:
+        methods.add("POST")
+    return _CappedRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_for(url):
+    """Return the pooled session for the host of ``url``, creating it once."""
+    host = urlsplit(url).hostname or ""
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            pool_size = HOST_POOL_SIZES.get(host, DEFAULT_POOL_SIZE)
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=pool_size,
+                max_retries=_make_retry(host),
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+    return session
+
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def _span_name(method, url):
+    # Collapse ids so spans group by endpoint: /3/movie/603/similar -> /3/movie/{id}/similar
+    return method + " " + _ID_SEGMENT.sub("/{id}", urlsplit(url).path)
+
+
+_flights = SingleFlight()
+_coalesced = Counter()       # provider -> requests answered by another caller's call
+_coalesced_lock = threading.Lock()
+
+
+def request_key(method, url, params=None, headers=None):
+    """Normalized identity of a request: same key means same upstream response."""
+    prepared = requests.Request(method, url, params=params).prepare().url
+    parts = urlsplit(prepared)
+    return (
+        method,
+        parts.scheme,
+        parts.netloc.lower(),
+        parts.path,
+        tuple(sorted(parse_qsl(parts.query, keep_blank_values=True))),
+        tuple(sorted((k.lower(), str(v)) for k, v in (headers or {}).items())),
+    )
+
+
+def _send(method, url, provider, **kwargs):
+    # Rate-limited, traced request. A 429 pauses the provider and is retried in its queue.
+    bucket = rate_limit.bucket_key(url)     # API quota or the CDN bucket, not the whole domain
+    for attempt in range(MAX_429_RETRIES + 1):
+        rate_limit.acquire(bucket)
+        with telemetry.span(_span_name(method, url), "http", provider) as span:
+            resp = session_for(url).request(method, url, **kwargs)
+            span.status = resp.status_code
+            if kwargs.get("stream"):
+                span.bytes = int(resp.headers.get("Content-Length") or 0)
+            else:
+                span.bytes = len(resp.content)
+        if resp.status_code != 429 or attempt == MAX_429_RETRIES:
+            return resp
+        rate_limit.penalize(bucket, rate_limit.retry_after(resp))
+        resp.close()
+        if hasattr(kwargs.get("data"), "seek"):    # rewind a streamed body before resending
+            kwargs["data"].seek(0)
+
+
+def request(method, url, **kwargs):
+    """Pooled, rate-limited, traced request; identical in-flight GETs share one call."""
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    method = method.upper()
+    provider = telemetry.provider_for(url)
+    if method not in COALESCE_METHODS or kwargs.get("stream") or kwargs.get("data") or kwargs.get("files"):
+        return _send(method, url, provider, **kwargs)
+
+    key = request_key(method, url, kwargs.get("params"), kwargs.get("headers"))
+    started = time.time()
+    resp, shared = _flights.do(key, lambda: _send(method, url, provider, **kwargs))
+    if shared:
+        with _coalesced_lock:
+            _coalesced[provider] += 1
+        telemetry.record(_span_name(method, url), "coalesced", provider, started,
+                         time.time() - started, status=resp.status_code)
+    return resp
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    """Close every pooled session (tests / shutdown)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _collect():
+    return [("styletwin_http_coalesced_total", "counter",
+             "Requests answered by an identical call already in flight.",
+             [("", {"provider": p}, n) for p, n in sorted(_coalesced.items())])]
+
+
+telemetry.register_collector(_collect)
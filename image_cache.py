@@ -0,0 +1,227 @@
+"""Server-side thumbnail cache for remote images.
+
+Each remote image (Unsplash/Pexels/Pixabay looks, TMDB posters) is fetched
+once, cropped to the size it is actually displayed at, re-encoded as WebP
+(JPEG if this Pillow build lacks WebP) and kept on disk under a byte budget
+with LRU eviction. Files live in ``static/`` so Streamlit's static file
+serving can hand them to the browser directly. Tiny blurred LQIP previews
+are derived from the cached thumbnails for inline placeholders.
+"""
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps, features
+
+import http_client
+from concurrency import InFlightBatches, TTLCache, run_concurrently
+
+# Streamlit serves <app dir>/static/ at app/static/ when enableStaticServing is on
+THUMB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "thumbs")
+THUMB_URL_PATH = "app/static/thumbs/"
+MAX_BYTES = int(os.environ.get("THUMB_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+QUALITY = 75
+THUMB_CONCURRENCY = 6
+
+# (width, height) each image is shown at in the UI
+DISPLAY_SIZES = {
+    "coverflow": (200, 300),
+    "card":      (480, 640),
+    "poster":    (100, 150),
+}
+
+# Inline low-quality placeholder (LQIP): a tiny blurred JPEG shown while the real image loads
+LQIP_SIZE = (12, 18)
+LQIP_QUALITY = 40
+
+if features.check("webp"):
+    FORMAT, EXTENSION = "WEBP", ".webp"
+else:
+    FORMAT, EXTENSION = "JPEG", ".jpg"
+
+
+class ThumbnailCache:
+    def __init__(self, thumb_dir=THUMB_DIR, max_bytes=MAX_BYTES):
+        self.thumb_dir = thumb_dir
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "errors": 0, "evictions": 0,
+                      "bytes_in": 0, "bytes_out": 0}
+        self._index = None       # filename -> size, LRU order
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.thumb_dir):
+            if name.endswith(EXTENSION):
+                st = os.stat(os.path.join(self.thumb_dir, name))
+                entries.append((st.st_mtime, name, st.st_size))
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total_bytes = sum(self._index.values())
+
+    @staticmethod
+    def filename(url, size_name):
+        digest = hashlib.sha256(f"{url}|{size_name}|{FORMAT}|{QUALITY}".encode()).hexdigest()
+        return digest[:32] + EXTENSION
+
+    def _touch(self, name):
+        with self._lock:
+            self._load_index()
+            if name not in self._index:
+                return False
+            self._index.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.thumb_dir, name))
+        except OSError:
+            return False
+        return True
+
+    def _store(self, name, data):
+        with self._lock:
+            self._load_index()
+            path = os.path.join(self.thumb_dir, name)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._total_bytes += len(data) - self._index.pop(name, 0)
+            self._index[name] = len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                oldest, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                self.stats["evictions"] += 1
+                try:
+                    os.remove(os.path.join(self.thumb_dir, oldest))
+                except OSError:
+                    pass
+
+    def _render(self, url, size):
+        with http_client.get(url, stream=True) as resp:
+            resp.raise_for_status()
+            raw = resp.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+        if len(raw) > MAX_SOURCE_BYTES:
+            raise ValueError(f"image too large: {url}")
+
+        img = Image.open(BytesIO(raw))
+        img.draft("RGB", (size[0] * 2, size[1] * 2))   # cheap JPEG downscale on decode
+        img = ImageOps.fit(ImageOps.exif_transpose(img).convert("RGB"), size, Image.LANCZOS)
+        out = BytesIO()
+        if FORMAT == "WEBP":
+            img.save(out, FORMAT, quality=QUALITY, method=4)
+        else:
+            img.save(out, FORMAT, quality=QUALITY, optimize=True, progressive=True)
+        self.stats["bytes_in"] += len(raw)
+        self.stats["bytes_out"] += out.tell()
+        return out.getvalue()
+
+    def cached_path(self, url, size_name):
+        """Local path if the thumbnail is already on disk; never fetches."""
+        if not url:
+            return None
+        name = self.filename(url, size_name)
+        return os.path.join(self.thumb_dir, name) if self._touch(name) else None
+
+    def path(self, url, size_name):
+        """Local thumbnail path for ``url`` at a DISPLAY_SIZES size, or None on failure."""
+        if not url:
+            return None
+        name = self.filename(url, size_name)
+        if self._touch(name):
+            self.stats["hits"] += 1
+            return os.path.join(self.thumb_dir, name)
+
+        self.stats["misses"] += 1
+        try:
+            self._store(name, self._render(url, DISPLAY_SIZES[size_name]))
+        except Exception:
+            self.stats["errors"] += 1
+            return None
+        return os.path.join(self.thumb_dir, name)
+
+
+_default_cache = ThumbnailCache()
+
+
+def thumbnail_path(url, size_name):
+    return _default_cache.path(url, size_name)
+
+
+def thumbnail_url(url, size_name):
+    """Browser URL of the cached thumbnail; falls back to the original URL."""
+    path = thumbnail_path(url, size_name)
+    return thumb_url_prefix() + os.path.basename(path) if path else url
+
+
+def thumb_url_prefix():
+    """Absolute URL path of the thumbnail directory, under ``server.baseUrlPath``.
+
+    Must not be relative: custom components are served from
+    /component/<name>/, where "app/static/..." would resolve to a 404.
+    Read on every call (a dict lookup): cached, a call made before
+    Streamlit loaded its config would pin the wrong base path.
+    """
+    try:
+        import streamlit as st
+        base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    except Exception:
+        base = ""
+    return f"/{base}/{THUMB_URL_PATH}" if base else f"/{THUMB_URL_PATH}"
+
+
+def thumbnail_urls(urls, size_name):
+    return run_concurrently(lambda u: thumbnail_url(u, size_name), urls, THUMB_CONCURRENCY)
+
+
+def cached_thumbnail_path(url, size_name):
+    """Local thumbnail file if it is already rendered, else None (no network)."""
+    return _default_cache.cached_path(url, size_name)
+
+
+def cached_thumbnail_url(url, size_name):
+    """Thumbnail URL if it is already rendered, else None (no network)."""
+    path = _default_cache.cached_path(url, size_name)
+    return thumb_url_prefix() + os.path.basename(path) if path else None
+
+
+_warming = InFlightBatches()
+
+
+def warm_thumbnails(urls, size_name):
+    """Render missing thumbnails on the background pool; returns immediately."""
+    missing = [u for u in urls if u and not _default_cache.cached_path(u, size_name)]
+    _warming.submit(missing, lambda todo: thumbnail_urls(todo, size_name), key=lambda u: (u, size_name))
+
+
+_lqips = TTLCache(ttl=24 * 60 * 60, maxsize=20000)
+
+
+def lqip(url, size_name="coverflow"):
+    """``data:`` URI of a tiny blurred preview, made from the cached thumbnail (None if not cached)."""
+    key = (url, size_name)
+    value = _lqips.get(key)
+    if value is not None:
+        return value
+    path = _default_cache.cached_path(url, size_name)
+    if not path:
+        return None
+    try:
+        with Image.open(path) as img:
+            tiny = img.convert("RGB").resize(LQIP_SIZE, Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    except OSError:
+        return None
+    out = BytesIO()
+    tiny.save(out, "JPEG", quality=LQIP_QUALITY)
+    value = "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+    _lqips.set(key, value)
+    return value
+
+
+def stats():
+    return dict(_default_cache.stats)
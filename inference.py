@@ -0,0 +1,159 @@
+"""Warm, batching onnxruntime session pools for the on-device models.
+
+A pool loads one .onnx model into a few sessions on a background thread
+and warms each with a dummy inference, so no request pays for model loading
+or graph optimisation. Callers queue preprocessed CHW arrays; a session
+worker takes everything already waiting (up to ``max_batch``) and runs it as
+one batched inference when the model has a dynamic batch dimension, one
+image at a time otherwise. The host's cores are split across the sessions
+through their intra-op thread counts.
+
+onnxruntime is imported lazily (see the import policy in Testing.py).
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import telemetry
+
+CORES = os.cpu_count() or 1
+# Two sessions let one run while the other's batch is pre/post-processed; one on small hosts
+POOL_SIZE = 2 if CORES >= 4 else 1
+LOAD_TIMEOUT = 120.0          # first use waits this long for the model to load
+
+_pools = []
+
+
+class SessionPool:
+    """``size`` warm sessions draining one shared request queue in batches.
+
+    ``path`` is the model file, or a callable returning it (called once on
+    the loader thread, e.g. to download or export the model).
+    """
+
+    def __init__(self, name, path, input_size, size=POOL_SIZE, threads=None, max_batch=4):
+        self.name = name
+        self.path = path
+        self.input_size = input_size          # (width, height); replaced by the model's if fixed
+        self.size = size
+        self.threads = threads or max(1, CORES // size)
+        self.max_batch = max_batch
+        self.batchable = False
+        self.stats = {"images": 0, "batches": 0, "inference_seconds": 0.0, "warmup_seconds": None}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._ready = threading.Event()
+        self._error = None
+        self._started = False
+        self._lock = threading.Lock()
+        _pools.append(self)
+
+    def start(self):
+        """Load and warm the sessions on a background thread (idempotent, non-blocking)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name=f"{self.name}-load", daemon=True).start()
+
+    def ready(self):
+        """True once the sessions are loaded and warm (never blocks)."""
+        return self._ready.is_set() and self._error is None
+
+    def loading(self):
+        return self._started and not self._ready.is_set()
+
+    def wait_ready(self, timeout=LOAD_TIMEOUT):
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"{self.name} model not loaded after {timeout:.0f}s")
+        if self._error is not None:
+            raise RuntimeError(f"could not load the {self.name} model") from self._error
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            import onnxruntime as ort
+            path = self.path() if callable(self.path) else self.path
+            for i in range(self.size):
+                opts = ort.SessionOptions()
+                opts.intra_op_num_threads = self.threads
+                opts.inter_op_num_threads = 1
+                opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+                inp = session.get_inputs()[0]
+                if all(isinstance(d, int) for d in inp.shape[2:4]):
+                    self.input_size = (inp.shape[3], inp.shape[2])
+                self.batchable = not isinstance(inp.shape[0], int)
+                dummy = np.zeros((1, 3, self.input_size[1], self.input_size[0]), np.float32)
+                session.run(None, {inp.name: dummy})          # warm-up
+                threading.Thread(target=self._worker, args=(session, inp.name),
+                                 name=f"{self.name}-{i}", daemon=True).start()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.stats["warmup_seconds"] = round(time.perf_counter() - started, 3)
+            self._ready.set()
+
+    def submit(self, arrays):
+        """Queue preprocessed CHW arrays together; each future resolves to that image's output."""
+        self.wait_ready()
+        ctx = contextvars.copy_context()
+        futures = [Future() for _ in arrays]
+        with self._cond:
+            self._pending.extend((a, f, ctx) for a, f in zip(arrays, futures))
+            self._cond.notify_all()
+        return futures
+
+    def run(self, arrays):
+        """Blocking ``submit``: outputs in input order."""
+        return [future.result() for future in self.submit(arrays)]
+
+    def _next_batch(self):
+        """Everything already queued, up to max_batch (one item for fixed-batch models)."""
+        limit = self.max_batch if self.batchable else 1
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            return [self._pending.popleft() for _ in range(min(limit, len(self._pending)))]
+
+    def _worker(self, session, input_name):
+        while True:
+            batch = self._next_batch()
+            start = time.time()
+            try:
+                out = session.run(None, {input_name: np.stack([a for a, _, _ in batch])})[0]
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            duration = time.time() - start
+            self.stats["images"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["inference_seconds"] += duration
+            # Shows up in the waterfall of whoever queued the batch's first image
+            batch[0][2].run(telemetry.record, f"{self.name}_inference", "model", self.name, start,
+                            duration, detail=f"batch={len(batch)}")
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(out[i])
+
+
+def _collect():
+    pools = [p for p in _pools if p.stats["batches"]]
+    return [
+        ("styletwin_inference_images_total", "counter", "Images run through an on-device model.",
+         [("", {"model": p.name}, p.stats["images"]) for p in pools]),
+        ("styletwin_inference_batches_total", "counter", "On-device model inference calls.",
+         [("", {"model": p.name}, p.stats["batches"]) for p in pools]),
+        ("styletwin_inference_seconds_total", "counter", "Time spent in on-device model inference.",
+         [("", {"model": p.name}, p.stats["inference_seconds"]) for p in pools]),
+    ]
+
+
+telemetry.register_collector(_collect)
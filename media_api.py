@@ -0,0 +1,688 @@
+"""Network helpers behind the Streamlit UI.
+
+Everything here is importable without running the app (benchmarks, batch
+jobs). Process-wide objects are created once per process via ``@cache``
+getters, so they survive Streamlit reruns and are shared by all sessions.
+"""
+import random
+from functools import cache
+
+import http_client
+import response_cache
+import spotify_auth
+import qloo_client
+import telemetry
+import track_graph
+import typeahead
+from archetypes import ArchetypeScorer
+from concurrency import (
+    BackgroundLoader, CircuitBreaker, InFlightBatches, TTLCache, hedged_first, run_concurrently, submit_background,
+)
+from config import (
+    LASTFM_API_BASE, PEXELS_API_BASE, PIXABAY_API_BASE, QLOO_API_BASE, SPOTIFY_API_BASE,
+    TMDB_API_BASE, TMDB_IMAGE_BASE, UNSPLASH_API_BASE, secret,
+)
+from style_data import genre_to_tags, music_to_tags, style_search_terms, tag_to_style
+
+# -------------------------------------------------------------------
+# Secrets & API Keys
+# -------------------------------------------------------------------
+QLOO_API_KEY        = secret("api", "qloo_key")
+TMDB_API_KEY        = secret("api", "tmdb_key")
+UNSPLASH_ACCESS_KEY = secret("api", "unsplash_key")
+PEXELS_API_KEY      = secret("api", "pexels_key")
+PIXABAY_API_KEY     = secret("api", "pixabay_key")
+lastfm_API_KEY = secret("api", "lastfm_key")
+SPOTIFY_CLIENT_ID = secret("spotify", "client_id")
+SPOTIFY_CLIENT_SECRET = secret("spotify", "client_secret")
+
+# -------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------
+def clear_caches():
+    """Empty every process-wide cache (cold-start benchmarks)."""
+    response_cache.clear()
+    get_track_graph().clear()
+    spotify_auth.reset()
+    get_qloo_client().clear_cache()
+    get_provider_cache().clear()
+    get_enrichment_cache().clear()
+    get_outfit_pools().cache.clear()
+    get_movie_pages().cache.clear()
+    get_country_lookups().cache.clear()
+
+@telemetry.traced("pexels")
+def get_pexels_images(query, per_page=5):
+    try:
+        return [img["urls"]["small"] for img in search_pexels_outfits(query, per_page)]
+    except:
+        return []
+
+@telemetry.traced("pixabay")
+def get_pixabay_images(query, per_page=5):
+    try:
+        return [img["urls"]["small"] for img in search_pixabay_outfits(query, per_page)]
+    except:
+        return []
+
+# --- Outfit image providers ---
+# Every provider returns the same shape: {"urls": {"regular", "small", "thumb"}, "provider"}
+# and raises on HTTP errors so its circuit breaker can count failures.
+def normalize_image(provider, regular, small=None, thumb=None):
+    small = small or regular
+    return {"urls": {"regular": regular, "small": small, "thumb": thumb or small}, "provider": provider}
+
+@telemetry.traced("unsplash")
+def search_unsplash_outfits(query, per_page=5, page=1):
+    resp = http_client.get(
+        f"{UNSPLASH_API_BASE}/search/photos",
+        headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
+        params={"query": query, "per_page": per_page, "page": page}
+    )
+    resp.raise_for_status()
+    return [
+        normalize_image("unsplash", r["urls"]["regular"], r["urls"].get("small"), r["urls"].get("thumb"))
+        for r in resp.json().get("results", [])
+    ]
+
+@telemetry.traced("pexels")
+def search_pexels_outfits(query, per_page=5, page=1):
+    headers = {
+        "Authorization": PEXELS_API_KEY
+    }
+    params = {
+        "query": query,
+        "per_page": per_page,
+        "page": page
+    }
+    resp = http_client.get(f"{PEXELS_API_BASE}/search", headers=headers, params=params)
+    resp.raise_for_status()
+    return [
+        normalize_image("pexels", p["src"]["large"], p["src"]["medium"], p["src"].get("tiny"))
+        for p in resp.json().get("photos", [])
+    ]
+
+@telemetry.traced("pixabay")
+def search_pixabay_outfits(query, per_page=5, page=1):
+    params = {
+        "key": PIXABAY_API_KEY,
+        "q": query,
+        "image_type": "photo",
+        "per_page": max(per_page, 3),  # Pixabay rejects per_page < 3
+        "page": page
+    }
+    resp = http_client.get(PIXABAY_API_BASE, params=params)
+    resp.raise_for_status()
+    return [
+        normalize_image("pixabay", img.get("largeImageURL") or img["webformatURL"],
+                        img["webformatURL"], img.get("previewURL"))
+        for img in resp.json().get("hits", [])
+    ][:per_page]
+
+IMAGE_PROVIDERS = ["unsplash", "pexels", "pixabay"]   # priority order
+IMAGE_HEDGE_DELAY = 0.8   # seconds before a fallback provider joins the race
+IMAGE_DEADLINE = 6.0      # overall budget for get_outfit_images
+
+@cache
+def get_image_breakers():
+    return {name: CircuitBreaker(failure_threshold=3, reset_timeout=60) for name in IMAGE_PROVIDERS}
+
+def get_qloo_client():
+    # Process-wide: name -> URN lookups are memoized across sessions
+    return qloo_client.get_client(QLOO_API_KEY)
+
+@telemetry.traced("qloo")
+def qloo_search_entity(name, entity_type="movie"):
+    return get_qloo_client().resolve(name, entity_type)
+
+
+@telemetry.traced("qloo")
+def get_qloo_recommendations(entity_urn):
+    try:
+        return get_qloo_client().recommendations(entity_urn)
+    except Exception as e:
+        return []
+
+@telemetry.traced("qloo")
+def get_style_tags_from_qloo(input_type, input_value, api_key, limit=5, entity_id=None):
+    client = qloo_client.get_client(api_key)
+
+    # Step 1: Resolve the entity (skipped when the caller already has its id)
+    if not entity_id:
+        entity_id = client.resolve(input_value, input_type)
+    if not entity_id:
+        return []
+
+    # Step 2: Related entities -> combined tags
+    try:
+        return client.related_tags(entity_id, input_type, limit)
+    except Exception as e:
+        return []
+
+
+@telemetry.traced("qloo")
+def get_qloo_related_styles(domain, name, limit=8):
+    url = f"{QLOO_API_BASE}/v1/{domain}/related"
+    headers = {
+        "X-API-Key": QLOO_API_KEY,
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "name": name,
+        "limit": limit
+    }
+
+    try:
+        response = http_client.post(url, headers=headers, json=payload)
+        if response.status_code == 200:
+            items = response.json().get("results", [])
+            return [item["name"].lower() for item in items]
+        else:
+            return []
+    except Exception as e:
+        return []
+
+# --- Archetype scoring ---
+TMDB_GENRE_NAMES = {28:"action",35:"comedy",18:"drama",10749:"romance",
+                    27:"horror",16:"animation",878:"sci-fi",80:"crime"}
+ARCHETYPE_TOP_K = 8
+
+@cache
+def get_archetype_scorer():
+    # genre x tag and tag x style matrices, compiled once per process
+    return ArchetypeScorer(genre_to_tags, tag_to_style, music_to_tags)
+
+def score_archetypes_from_media(movie=None, genre=None, music=None, top_k=ARCHETYPE_TOP_K, movie_id=None):
+    genres, music_keys = [], []
+    if movie_id:
+        # Same cached bundle that serves the first page of recommendations
+        bundle = get_movie_bundle(movie_id) or {}
+        genres = [TMDB_GENRE_NAMES.get(g["id"], "") for g in bundle.get("genres", [])]
+    elif movie:
+        found = search_movie(movie)
+        if found:
+            genres = [TMDB_GENRE_NAMES.get(gid, "") for gid in found.get("genre_ids", [])]
+    elif genre:
+        genres = [genre.lower()]
+    elif music:
+        music_keys = [music.lower()]
+
+    return get_archetype_scorer().score(genres=genres, music=music_keys, top_k=top_k)
+
+@telemetry.traced("archetypes")
+def get_archetypes_from_media(movie=None, genre=None, music=None, top_k=ARCHETYPE_TOP_K, movie_id=None):
+    # Ranked style names, best match first
+    return [style for style, _ in score_archetypes_from_media(movie, genre, music, top_k, movie_id)]
+
+# --- Outfit pools ---
+# One cacheable pool of looks per style query, filled in the background as soon
+# as archetypes are known and shuffled at display time so refreshes look fresh.
+# Further provider pages are pooled the same way under (query, page) keys.
+OUTFIT_POOL_SIZE = 30          # Unsplash's max per_page
+OUTFIT_POOL_TTL = 60 * 60
+OUTFIT_MAX_PAGES = 10          # 300 looks per style is plenty
+
+def outfit_query(style):
+    return style_search_terms.get(style, f"{style} outfit")
+
+@telemetry.traced("images")
+def fetch_outfit_pool(q, breakers, page=1):
+    # Unsplash first, Pexels/Pixabay hedged in behind it; first non-empty result wins
+    calls = [
+        ("unsplash", lambda: search_unsplash_outfits(q, OUTFIT_POOL_SIZE, page)),
+        ("pexels",   lambda: search_pexels_outfits(q, OUTFIT_POOL_SIZE, page)),
+        ("pixabay",  lambda: search_pixabay_outfits(q, OUTFIT_POOL_SIZE, page)),
+    ]
+    _, images = hedged_first(calls, hedge_delay=IMAGE_HEDGE_DELAY, deadline=IMAGE_DEADLINE,
+                             breakers=breakers)
+    return images or []
+
+@cache
+def get_outfit_pools():
+    breakers = get_image_breakers()
+
+    def load(key):
+        q, page = key if isinstance(key, tuple) else (key, 1)
+        return fetch_outfit_pool(q, breakers, page)
+    return BackgroundLoader(load, ttl=OUTFIT_POOL_TTL, maxsize=500)
+
+def prefetch_outfit_pools(styles):
+    pools = get_outfit_pools()
+    for style in styles:
+        pools.prefetch(outfit_query(style))
+
+@telemetry.traced("images")
+def get_outfit_images(q, per_page=5):
+    try:
+        pool = get_outfit_pools().get(q, timeout=IMAGE_DEADLINE + 2) or []
+    except Exception:
+        return []
+    return random.sample(pool, min(per_page, len(pool)))
+
+def _outfit_page_key(q, page):
+    return q if page == 1 else (q, page)
+
+@telemetry.traced("images")
+def get_outfit_page(q, page):
+    """Provider page ``page`` of looks for ``q`` in provider order ([] past the end)."""
+    if page > OUTFIT_MAX_PAGES:
+        return []
+    try:
+        return get_outfit_pools().get(_outfit_page_key(q, page), timeout=IMAGE_DEADLINE + 2) or []
+    except Exception:
+        return []
+
+def prefetch_outfit_page(q, page):
+    if page <= OUTFIT_MAX_PAGES:
+        get_outfit_pools().prefetch(_outfit_page_key(q, page))
+
+# --- Country detection (off the critical path) ---
+DEFAULT_COUNTRY = "US"        # used until the background lookup resolves
+COUNTRY_TTL = 24 * 60 * 60
+
+@telemetry.traced("geoip")
+def get_user_country(ip="me"):
+    try:
+        import geocoder
+        g = geocoder.ip(ip)
+        return g.country or DEFAULT_COUNTRY
+    except:
+        return DEFAULT_COUNTRY
+
+@cache
+def get_country_lookups():
+    # Per client IP, shared across sessions
+    return BackgroundLoader(get_user_country, ttl=COUNTRY_TTL, maxsize=10000)
+
+# --- TMDB ---
+# One call per movie: detail, first page of recommendations and watch providers
+# come back together, and every per-movie helper shares that cached response.
+MOVIE_APPEND = "recommendations,watch/providers"
+MOVIE_PAGE_TTL = 60 * 60
+MOVIE_PAGE_CACHE_SIZE = 500
+
+TMDB_GENRE_IDS = {
+    "action": 28, "comedy": 35, "drama": 18, "sci-fi": 878,
+    "romance": 10749, "horror": 27, "animation": 16, "crime": 80
+    # Add more genres if needed
+}
+
+def format_movie(m):
+    return {
+        "id": m.get("id"),
+        "title": m.get("title"),
+        "overview": m.get("overview", ""),
+        "poster": f"{TMDB_IMAGE_BASE}/w200{m['poster_path']}" if m.get("poster_path") else None
+    }
+
+def get_movie_bundle(movie_id):
+    """``/movie/{id}`` with MOVIE_APPEND; None if TMDB doesn't know the id."""
+    detail = response_cache.get(
+        f"{TMDB_API_BASE}/movie/{movie_id}",
+        params={"api_key": TMDB_API_KEY, "language": "en-US", "append_to_response": MOVIE_APPEND}
+    ).json()
+    if not detail.get("id") or detail.get("status_code") == 34:
+        return None
+    typeahead.add_tmdb_movies([detail])
+    return detail
+
+def search_movie(name):
+    results = response_cache.get(
+        f"{TMDB_API_BASE}/search/movie",
+        params={"api_key": TMDB_API_KEY, "query": name, "include_adult": False}
+    ).json().get("results", [])
+    typeahead.add_tmdb_movies(results)
+    return results[0] if results else None
+
+@telemetry.traced("tmdb")
+def get_tmdb_details(name, tmdb_id=None):
+    detail = get_movie_bundle(tmdb_id) if tmdb_id else None
+    if not detail:
+        detail = search_movie(name)
+        if not detail:
+            return name, None, ""
+
+    title = detail.get("title", name)
+    poster = detail.get("poster_path")
+    overview = detail.get("overview", "")
+    poster_url = f"{TMDB_IMAGE_BASE}/w200{poster}" if poster else None
+    return title, poster_url, overview
+
+# --- Movie lists (paged incrementally) ---
+# A list source is ("recommendations", movie_id) or ("discover", genre_id, country).
+# Pages are fetched on demand, the next one in the background, into a bounded cache.
+def similar_movies_source(movie_name, movie_id=None):
+    # A canonical id (e.g. from the typeahead index) skips the search round-trip
+    if movie_id:
+        return ("recommendations", movie_id)
+    found = search_movie(movie_name)
+    return ("recommendations", found["id"]) if found else None
+
+def genre_source(genre_name, country_code="US"):
+    genre_id = TMDB_GENRE_IDS.get(genre_name.lower())
+    return ("discover", genre_id, country_code) if genre_id else None
+
+@telemetry.traced("tmdb")
+def fetch_movie_page(key):
+    *source, page = key
+    if source[0] == "recommendations":
+        movie_id = source[1]
+        if page == 1:
+            bundle = get_movie_bundle(movie_id) or {}
+            data = bundle.get("recommendations", {})
+        else:
+            data = response_cache.get(
+                f"{TMDB_API_BASE}/movie/{movie_id}/recommendations",
+                params={"api_key": TMDB_API_KEY, "page": page}
+            ).json()
+    else:
+        _, genre_id, country_code = source
+        data = response_cache.get(f"{TMDB_API_BASE}/discover/movie", params={
+            "api_key": TMDB_API_KEY,
+            "with_genres": genre_id,
+            "region": country_code,
+            "sort_by": "popularity.desc",
+            "language": "en-US",
+            "page": page,
+        }).json()
+    typeahead.add_tmdb_movies(data.get("results", []))
+    return {
+        "movies": [format_movie(m) for m in data.get("results", [])],
+        "page": page,
+        "total_pages": min(data.get("total_pages", 1), 500),   # TMDB caps paging at 500
+    }
+
+@cache
+def get_movie_pages():
+    return BackgroundLoader(fetch_movie_page, ttl=MOVIE_PAGE_TTL, maxsize=MOVIE_PAGE_CACHE_SIZE)
+
+def get_movie_page(source, page, timeout=10):
+    try:
+        return get_movie_pages().get(tuple(source) + (page,), timeout=timeout) or \
+            {"movies": [], "page": page, "total_pages": 0}
+    except Exception:
+        return {"movies": [], "page": page, "total_pages": 0}
+
+def prefetch_movie_page(source, page):
+    get_movie_pages().prefetch(tuple(source) + (page,))
+
+@telemetry.traced("tmdb")
+def get_similar_movies(movie_name, limit=5):
+    source = similar_movies_source(movie_name)
+    if not source:
+        return []
+    return get_movie_page(source, 1)["movies"][:limit]
+
+@telemetry.traced("tmdb")
+def get_movies_by_genre(genre_name, country_code="US"):
+    source = genre_source(genre_name, country_code)
+    if not source:
+        return []
+    return get_movie_page(source, 1)["movies"]
+
+@telemetry.traced("tmdb")
+def get_streaming_platforms(movie_id, country_code):
+    bundle = get_movie_bundle(movie_id) or {}
+    country_info = bundle.get("watch/providers", {}).get("results", {}).get(country_code, {})
+    flatrate = country_info.get("flatrate", [])
+    link = country_info.get("link", None)  # Generic landing page
+
+    return flatrate, link
+
+# --- Watch providers (batched + cached) ---
+PROVIDER_TTL = 6 * 60 * 60
+PROVIDER_CONCURRENCY = 5
+
+@cache
+def get_provider_cache():
+    # Shared across sessions and reruns, keyed by (movie_id, country)
+    return TTLCache(ttl=PROVIDER_TTL, maxsize=5000)
+
+@telemetry.traced("tmdb")
+def get_streaming_platforms_batch(movie_ids, country_code, cache):
+    results = {}
+    missing = []
+    for movie_id in movie_ids:
+        hit = cache.get((movie_id, country_code))
+        if hit is not None:
+            results[movie_id] = hit
+        else:
+            missing.append(movie_id)
+
+    def fetch(movie_id):
+        try:
+            return get_streaming_platforms(movie_id, country_code)
+        except Exception:
+            return None
+
+    for movie_id, res in zip(missing, run_concurrently(fetch, missing, PROVIDER_CONCURRENCY)):
+        if res is None:
+            results[movie_id] = ([], None)  # don't cache failures
+        else:
+            results[movie_id] = res
+            cache.set((movie_id, country_code), res)
+    return results
+
+def prefetch_streaming_platforms(movie_ids, country_code, cache):
+    movie_ids = [m for m in movie_ids if (m, country_code) not in cache]
+    if movie_ids:
+        submit_background(get_streaming_platforms_batch, movie_ids, country_code, cache)
+
+
+@cache
+def get_track_graph():
+    # Similar-track edges, persisted across restarts (see track_graph.py)
+    return track_graph.TrackGraph()
+
+def _fetch_similar_songs(song_name, artist=None):
+    """Resolve ``song_name`` on Last.fm and store its similar tracks in the graph; the track's ID or None."""
+    graph = get_track_graph()
+    base_url = LASTFM_API_BASE
+
+    # With a known artist (e.g. from the typeahead index) the track search is skipped
+    if artist:
+        track = song_name
+    else:
+        search_params = {
+            "method": "track.search",
+            "track": song_name,
+            "api_key": lastfm_API_KEY,
+            "format": "json",
+            "limit": 1
+        }
+        search_resp = response_cache.get(base_url, params=search_params).json()
+        results = search_resp.get("results", {}).get("trackmatches", {}).get("track", [])
+
+        # Ensure results is a list
+        if isinstance(results, dict):
+            results = [results]
+
+        if not results:
+            return None
+
+        artist = results[0].get("artist")
+        track = results[0].get("name")
+        typeahead.add_tracks([{"title": track, "artist": artist}])
+
+    sim_params = {
+        "method": "track.getsimilar",
+        "artist": artist,
+        "track": track,
+        "api_key": lastfm_API_KEY,
+        "format": "json",
+        "limit": track_graph.FETCH_LIMIT
+    }
+
+    sim_resp = response_cache.get(base_url, params=sim_params).json()
+    similar = sim_resp.get("similartracks", {}).get("track", [])
+
+    if isinstance(similar, dict):
+        similar = [similar]
+
+    songs = [
+        {
+            "title": s.get("name", "Unknown"),
+            "artist": s.get("artist", {}).get("name", "Unknown"),
+            "url": s.get("url", "#"),
+            "match": float(s.get("match") or 0.0)
+        }
+        for s in similar
+    ]
+    typeahead.add_tracks(songs)
+    node = graph.add_track(track, artist, query=song_name)
+    graph.set_similar(node, [(s["title"], s["artist"], s["url"], s["match"]) for s in songs])
+    return node
+
+_refreshing = InFlightBatches()
+
+def _refresh_similar_songs(nodes):
+    for node in nodes:
+        title, artist, _ = get_track_graph().tracks[node]
+        _fetch_similar_songs(title, artist)
+
+def refresh_similar_songs_background(node):
+    # Stale edges keep being served while Last.fm is asked again
+    _refreshing.submit([node], _refresh_similar_songs)
+
+@telemetry.traced("lastfm")
+def get_similar_songs(song_name, limit=5, artist=None, hops=track_graph.HOPS):
+    # Answered from the local track graph once a track's similar tracks are known;
+    # ``hops`` > 1 also ranks tracks similar to those, by summed match score
+    graph = get_track_graph()
+    node = graph.find(song_name, artist)
+    if node is None or not graph.has_edges(node):
+        node = _fetch_similar_songs(song_name, artist)
+        if node is None:
+            return []
+    elif graph.is_stale(node):
+        refresh_similar_songs_background(node)
+    return graph.similar(node, limit, hops)
+
+# --- Spotify Auth ---
+def get_spotify_tokens():
+    # Process-wide: cached until expiry, refreshed early, one refresh at a time
+    return spotify_auth.get_manager(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
+
+def get_spotify_token(client_id, client_secret):
+    return spotify_auth.get_manager(client_id, client_secret).get_token()
+    
+# --- Spotify Search ---
+@telemetry.traced("spotify")
+def get_spotify_song_data(song_name, token, limit=5):
+    search_url = f"{SPOTIFY_API_BASE}/search"
+    params = {"q": song_name, "type": "track", "limit": limit}
+
+    resp = get_spotify_tokens().get(search_url, token=token, params=params).json()
+    tracks = [format_spotify_track(t) for t in resp.get("tracks", {}).get("items", [])]
+    typeahead.add_tracks(tracks)
+    return tracks
+
+def format_spotify_track(t):
+    return {
+        "id": t.get("id"),
+        "title": t["name"],
+        "artist": t["artists"][0]["name"],
+        "album_img": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
+        "preview_url": t.get("preview_url"),
+        "spotify_url": t["external_urls"]["spotify"]
+    }
+
+@telemetry.traced("spotify")
+def get_spotify_tracks_by_ids(track_ids, token):
+    # Multi-ID lookup: up to 50 tracks per request instead of one search each
+    tracks_url = f"{SPOTIFY_API_BASE}/tracks"
+    found = []
+    for i in range(0, len(track_ids), 50):
+        params = {"ids": ",".join(track_ids[i:i + 50])}
+        resp = get_spotify_tokens().get(tracks_url, token=token, params=params).json()
+        found += [format_spotify_track(t) for t in resp.get("tracks", []) if t]
+    typeahead.add_tracks(found)
+    return found
+
+# --- Spotify enrichment of Last.fm tracks ---
+ENRICH_CONCURRENCY = 5
+ENRICH_TTL = 24 * 60 * 60           # preview URLs go stale, so re-fetch daily
+ENRICH_ID_TTL = 30 * 24 * 60 * 60   # track IDs don't change
+
+@cache
+def get_enrichment_cache():
+    # "title artist" -> enriched track, plus ("id", key) -> Spotify track id
+    return TTLCache(ttl=ENRICH_TTL, maxsize=20000)
+
+def enrichment_key(title, artist):
+    return " ".join(f"{title} {artist}".lower().split())
+
+@telemetry.traced("spotify")
+def enrich_tracks_with_spotify(tracks, token, cache, max_workers=ENRICH_CONCURRENCY):
+    keys = [enrichment_key(t["title"], t["artist"]) for t in tracks]
+    enriched = {}
+    by_id = {}
+    to_search = []
+    for track, key in zip(tracks, keys):
+        hit = cache.get(key)
+        if hit is not None:
+            enriched[key] = hit
+            continue
+        track_id = track.get("spotify_id") or cache.get(("id", key))
+        if track_id:
+            by_id[track_id] = key
+        elif key not in to_search:
+            to_search.append(key)
+
+    if by_id:
+        try:
+            for song in get_spotify_tracks_by_ids(list(by_id), token):
+                if song["id"] in by_id:
+                    enriched[by_id[song["id"]]] = song
+        except Exception:
+            pass
+        # Anything the ID lookup missed falls back to a search
+        to_search += [k for k in by_id.values() if k not in enriched and k not in to_search]
+
+    def search(key):
+        try:
+            found = get_spotify_song_data(key, token, limit=1)
+            return found[0] if found else None
+        except Exception:
+            return None
+
+    for key, song in zip(to_search, run_concurrently(search, to_search, max_workers)):
+        if song:
+            enriched[key] = song
+
+    for key, song in enriched.items():
+        cache.set(key, song)
+        if song.get("id"):
+            cache.set(("id", key), song["id"], ttl=ENRICH_ID_TTL)
+
+    return [enriched[k] for k in keys if k in enriched]
+
+@telemetry.traced("spotify")
+def detect_spotify_genre(song_name, token, track_id=None):
+    if track_id:
+        # Canonical id: fetch exactly that track instead of searching by name
+        track = get_spotify_tokens().get(f"{SPOTIFY_API_BASE}/tracks/{track_id}", token=token).json()
+        tracks = [track] if track.get("artists") else []
+    else:
+        search_url = f"{SPOTIFY_API_BASE}/search"
+        params = {"q": song_name, "type": "track", "limit": 1}
+
+        resp = get_spotify_tokens().get(search_url, token=token, params=params).json()
+        tracks = resp.get("tracks", {}).get("items", [])
+
+    if not tracks:
+        return None, None  # No result
+
+    track = tracks[0]
+    artist_id = track["artists"][0]["id"]
+
+    # Fetch artist details to get genre
+    artist_url = f"{SPOTIFY_API_BASE}/artists/{artist_id}"
+    artist_resp = get_spotify_tokens().get(artist_url, token=token).json()
+    genres = artist_resp.get("genres", [])
+
+    # Map Spotify genres to your defined keys
+    music_keys = get_archetype_scorer().music_keys_for(genres)
+    mapped_genre = music_keys[0] if music_keys else None
+
+    return mapped_genre, track["name"] + " - " + track["artists"][0]["name"]
@@ -0,0 +1,207 @@
+"""Dominant-colour palettes and a per-style colour index for outfit filtering.
+
+Each look's coverflow thumbnail is downsampled with PIL and clustered with a
+small vectorised NumPy k-means (seeded from a coarse colour histogram), giving
+PALETTE_SIZE dominant colours and their pixel shares. Palette colours are
+mapped to the nearest named shade in CIE Lab, so every look becomes one
+row of colour shares. Rows live in a per-style index (one float16 matrix per
+outfit query), which makes "only red looks" or "most blue first" a column
+lookup and a sort instead of another provider search.
+"""
+import threading
+
+import numpy as np
+from PIL import Image
+
+from concurrency import InFlightBatches, run_concurrently
+from image_cache import thumbnail_path
+
+PALETTE_SIZE = 5
+SAMPLE_SIZE = (32, 48)            # pixels clustered per image (thumbnail aspect)
+KMEANS_ITERATIONS = 8
+MIN_SHARE = 0.15                  # share of a colour for a look to pass its filter
+PALETTE_CONCURRENCY = 4
+THUMB_SIZE = "coverflow"
+
+# Named colours users filter by, each with a few representative sRGB shades
+COLORS = {
+    "black":  [(20, 20, 20)],
+    "white":  [(245, 245, 245)],
+    "grey":   [(80, 80, 80), (128, 128, 128), (190, 190, 190)],
+    "beige":  [(220, 200, 160), (200, 180, 140)],
+    "brown":  [(115, 75, 45), (160, 110, 70)],
+    "red":    [(200, 30, 40), (140, 20, 30)],
+    "orange": [(240, 140, 40)],
+    "yellow": [(240, 215, 60)],
+    "green":  [(60, 140, 70), (100, 120, 60), (30, 80, 50)],
+    "blue":   [(50, 110, 210), (30, 60, 200), (100, 160, 230)],
+    "navy":   [(25, 35, 80), (20, 30, 120)],
+    "purple": [(120, 60, 160), (170, 120, 200)],
+    "pink":   [(240, 150, 180), (230, 80, 140)],
+}
+COLOR_NAMES = tuple(COLORS)
+
+
+def to_lab(rgb):
+    """sRGB (..., 3) in 0-255 -> CIE Lab (D65)."""
+    c = np.asarray(rgb, np.float32) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124, 0.2126, 0.0193],
+                        [0.3576, 0.7152, 0.1192],
+                        [0.1805, 0.0722, 0.9505]], np.float32)
+    xyz /= np.array([0.95047, 1.0, 1.08883], np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], -1)
+
+
+_REFERENCE_LAB = to_lab(np.array([rgb for shades in COLORS.values() for rgb in shades]))
+_REFERENCE_NAME = np.array([i for i, shades in enumerate(COLORS.values()) for _ in shades])
+
+
+def _channel_sums(labels, pixels, n):
+    return np.stack([np.bincount(labels, weights=pixels[:, c], minlength=n) for c in range(3)], 1)
+
+
+def palette(img, k=PALETTE_SIZE):
+    """Dominant colours of a PIL image: ``(colors uint8 (k, 3), shares float32 (k,))``, largest first."""
+    pixels = np.asarray(img.convert("RGB").resize(SAMPLE_SIZE, Image.BILINEAR), np.float32).reshape(-1, 3)
+
+    # Seed with the k fullest cells of a 4x4x4 histogram
+    cells = (pixels // 64).astype(np.int64) @ np.array([16, 4, 1])
+    counts = np.bincount(cells, minlength=64)
+    seeds = np.argsort(-counts)[:k]
+    seeds = seeds[counts[seeds] > 0]
+    centers = _channel_sums(cells, pixels, 64)[seeds] / counts[seeds, None]
+
+    for _ in range(KMEANS_ITERATIONS):
+        distances = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(-1)
+        labels = distances.argmin(1)
+        counts = np.bincount(labels, minlength=len(centers))
+        moved = centers.copy()
+        filled = counts > 0
+        moved[filled] = _channel_sums(labels, pixels, len(centers))[filled] / counts[filled, None]
+        if np.abs(moved - centers).max() < 1.0:
+            centers = moved
+            break
+        centers = moved
+
+    shares = counts / counts.sum()
+    order = np.argsort(-shares)
+    return np.clip(centers[order].round(), 0, 255).astype(np.uint8), shares[order].astype(np.float32)
+
+
+def color_shares(colors, shares):
+    """Palette -> share of each of COLOR_NAMES (float32, sums to 1)."""
+    distances = ((to_lab(colors)[:, None, :] - _REFERENCE_LAB[None, :, :]) ** 2).sum(-1)
+    names = _REFERENCE_NAME[distances.argmin(1)]
+    return np.bincount(names, weights=shares, minlength=len(COLOR_NAMES)).astype(np.float32)
+
+
+class PaletteIndex:
+    """Colour-share rows for one style's looks: URL -> row of a float16 (n, len(COLOR_NAMES)) matrix."""
+
+    def __init__(self):
+        self.rows = {}
+        self.palettes = []            # row -> (colors, shares)
+        self._shares = np.zeros((64, len(COLOR_NAMES)), np.float16)
+        self._lock = threading.Lock()
+
+    def __contains__(self, url):
+        return url in self.rows
+
+    def add(self, url, colors, shares):
+        with self._lock:
+            if url in self.rows:
+                return
+            row = len(self.palettes)
+            if row == len(self._shares):      # grow by doubling
+                self._shares = np.concatenate([self._shares, np.zeros_like(self._shares)])
+            self._shares[row] = color_shares(colors, shares)
+            self.rows[url] = row
+            self.palettes.append((colors, shares))
+
+    def shares(self, urls, color):
+        """Share of ``color`` for each URL; NaN where the look is not indexed."""
+        column = COLOR_NAMES.index(color)
+        with self._lock:
+            rows = np.array([self.rows.get(u, -1) for u in urls], np.int64)
+            values = self._shares[np.maximum(rows, 0), column].astype(np.float32)
+        values[rows < 0] = np.nan
+        return values
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(q):
+    with _indexes_lock:
+        index = _indexes.get(q)
+        if index is None:
+            index = _indexes[q] = PaletteIndex()
+        return index
+
+
+def _image_palette(url):
+    path = thumbnail_path(url, THUMB_SIZE)
+    if not path:
+        return None
+    with Image.open(path) as img:
+        return palette(img)
+
+
+def index_images(q, images):
+    """Compute palettes for looks of outfit query ``q`` that are not indexed yet."""
+    index = index_for(q)
+    urls = [img["urls"]["regular"] for img in images if img["urls"]["regular"] not in index]
+    if not urls:
+        return 0
+
+    def one(url):
+        try:
+            return _image_palette(url)
+        except Exception:
+            return None
+    added = 0
+    for url, result in zip(urls, run_concurrently(one, urls, PALETTE_CONCURRENCY)):
+        if result is not None:
+            index.add(url, *result)
+            added += 1
+    return added
+
+
+_indexing = InFlightBatches()
+
+
+def index_images_background(q, images):
+    """``index_images`` on the background pool; returns immediately."""
+    _indexing.submit(images, lambda todo: index_images(q, todo), key=lambda img: (q, img["urls"]["regular"]))
+
+
+def sort_by_color(q, images, color):
+    """``images`` ordered by their share of ``color``, most first (unindexed looks last)."""
+    if not images:
+        return []
+    index_images(q, images)               # usually a no-op: the background pass got there first
+    shares = index_for(q).shares([img["urls"]["regular"] for img in images], color)
+    order = np.argsort(-np.nan_to_num(shares, nan=-1.0), kind="stable")
+    return [images[i] for i in order]
+
+
+def filter_by_color(q, images, color, min_share=MIN_SHARE):
+    """Looks with at least ``min_share`` of ``color``, most first."""
+    if not images:
+        return []
+    ranked = sort_by_color(q, images, color)
+    shares = index_for(q).shares([img["urls"]["regular"] for img in ranked], color)
+    return [img for img, share in zip(ranked, shares) if share >= min_share]
+
+
+def swatches(q, url):
+    """Hex codes of an indexed look's dominant colours (largest first); [] if not indexed."""
+    index = index_for(q)
+    row = index.rows.get(url)
+    if row is None:
+        return []
+    colors, _ = index.palettes[row]
+    return ["#%02x%02x%02x" % tuple(int(v) for v in c) for c in colors]
@@ -0,0 +1,122 @@
+"""Qloo client with a memoized name -> entity URN cache.
+
+A name is resolved to an entity once per process; later calls (and the
+related/insights lookups that need the id) reuse it. Misses are cached too,
+for a shorter time, so a typo doesn't trigger a search on every click.
+"""
+import threading
+
+import http_client
+from concurrency import TTLCache
+from config import QLOO_API_BASE
+
+BASE_URL = QLOO_API_BASE
+RESOLVE_TTL = 24 * 60 * 60
+NEGATIVE_TTL = 10 * 60
+
+ENTITY_URN_TYPES = {
+    "movie": "urn:entity:movie",
+    "music": "urn:entity:artist",
+    "genre": "urn:entity:genre"
+}
+
+RELATED_ENDPOINTS = {
+    "movie": "movies",
+    "music": "music",
+    "genre": "tags"
+}
+
+_NOT_FOUND = ""     # cached marker for negative results
+
+
+def normalize_name(name):
+    return " ".join(name.lower().split())
+
+
+class QlooClient:
+    def __init__(self, api_key, base_url=BASE_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.stats = {"resolve_hits": 0, "resolve_misses": 0, "searches": 0}
+        self._urns = TTLCache(ttl=RESOLVE_TTL, maxsize=20000)
+
+    def clear_cache(self):
+        self._urns.clear()
+
+    def _headers(self):
+        return {"X-API-Key": self.api_key, "Content-Type": "application/json"}
+
+    def resolve(self, name, entity_type="movie"):
+        """Entity id for ``name``, or None. Cached, including misses."""
+        key = (entity_type, normalize_name(name))
+        cached = self._urns.get(key)
+        if cached is not None:
+            self.stats["resolve_hits"] += 1
+            return cached or None
+
+        self.stats["resolve_misses"] += 1
+        try:
+            entity_id = self._search(name, entity_type)
+        except Exception:
+            return None     # transient failure: don't cache
+        if entity_id:
+            self._urns.set(key, entity_id)
+        else:
+            self._urns.set(key, _NOT_FOUND, ttl=NEGATIVE_TTL)
+        return entity_id
+
+    def _search(self, name, entity_type):
+        self.stats["searches"] += 1
+        params = {
+            "query": name.strip().title(),
+            "types": ENTITY_URN_TYPES.get(entity_type, "urn:entity:movie")
+        }
+        resp = http_client.get(f"{self.base_url}/search", headers=self._headers(), params=params)
+        if resp.status_code != 200:
+            if resp.status_code >= 500 or resp.status_code == 429:
+                raise RuntimeError(f"Qloo search failed: {resp.status_code}")
+            return None
+        results = resp.json().get("results", [])
+        if not results:
+            return None
+        return results[0].get("entity_id") or results[0].get("id")
+
+    def related_tags(self, entity_id, entity_type="movie", limit=5):
+        endpoint = RELATED_ENDPOINTS.get(entity_type)
+        if not endpoint or not entity_id:
+            return []
+        resp = http_client.post(
+            f"{self.base_url}/v1/{endpoint}/related",
+            headers=self._headers(),
+            json={"entity_id": entity_id, "limit": limit}
+        )
+        if resp.status_code != 200:
+            return []
+        style_tags = set()
+        for entity in resp.json().get("results", []):
+            for tag in entity.get("tags", []):
+                style_tags.add(tag.get("name"))
+        return list(style_tags)
+
+    def recommendations(self, entity_urn, entity_type="movie"):
+        resp = http_client.post(
+            f"{self.base_url}/v1/insights/recommendations",
+            headers=self._headers(),
+            json={"entities": [entity_urn], "type": entity_type}
+        )
+        if resp.status_code != 200:
+            return []
+        return [rec["name"].lower() for rec in resp.json().get("results", [])]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """One shared client (and URN cache) per API key, for the life of the process."""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = QlooClient(api_key)
+        return client
@@ -0,0 +1,269 @@
+"""Process-wide per-provider rate limiting.
+
+Every upstream call made through http_client takes a token from its
+provider's bucket first. When the bucket is empty the caller queues
+instead of failing. Interactive requests are served before background
+prefetch (work started with ``concurrency.submit_background``); a queued
+prefetch moves up once an interactive caller starts waiting on it. A 429
+pauses the whole provider for its Retry-After, so concurrent sessions stop
+hammering it together.
+
+Buckets are per API endpoint, not per domain: only the hosts in
+API_ENDPOINTS count against a provider's quota. Image and CDN downloads
+(images.pexels.com, images.unsplash.com, cdn.pixabay.com, ...) share the
+separate, generous CDN_BUCKET.
+
+Limits are ``(requests per second, burst)``; override one with
+``RATE_LIMIT_TMDB=20/40`` or switch limiting off with ``RATE_LIMIT_ENABLED=0``.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+import concurrency
+import telemetry
+
+ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") != "0"
+
+# Provider -> (sustained requests/second, burst). Roughly each API's published limit.
+RATE_LIMITS = {
+    "tmdb":     (40.0, 40),
+    "lastfm":   (5.0, 10),
+    "spotify":  (10.0, 20),
+    "qloo":     (10.0, 20),
+    "unsplash": (5000 / 3600, 20),       # production tier: 5000/hour
+    "pexels":   (200 / 3600, 20),
+    "pixabay":  (100 / 60, 20),
+    "imgbb":    (1.0, 5),
+    "cdn":      (50.0, 100),         # image downloads; not an API quota
+}
+DEFAULT_LIMIT = (10.0, 20)
+CDN_BUCKET = "cdn"
+
+# API host (or host + path prefix) -> provider whose quota it counts against
+API_ENDPOINTS = {
+    "api.themoviedb.org": "tmdb",
+    "api.spotify.com": "spotify",
+    "accounts.spotify.com": "spotify",
+    "ws.audioscrobbler.com": "lastfm",
+    "api.qloo.com": "qloo",
+    "api.unsplash.com": "unsplash",
+    "api.pexels.com": "pexels",
+    "pixabay.com/api": "pixabay",
+    "api.imgbb.com": "imgbb",
+}
+LOCAL_IMAGE_ROUTES = {"img", "tmdb-img"}   # image paths on the stand-in server
+
+INTERACTIVE, BACKGROUND = 0, 1
+MAX_WAIT = {INTERACTIVE: 30.0, BACKGROUND: 120.0}   # queueing longer than this raises
+MAX_PENALTY = 60.0                                   # cap on a single Retry-After pause
+
+
+class RateLimitTimeout(requests.RequestException):
+    """Waited longer than MAX_WAIT for a token."""
+
+
+def _limit_for(provider):
+    override = os.environ.get(f"RATE_LIMIT_{provider.upper()}")
+    if override:
+        rate, _, burst = override.partition("/")
+        return float(rate), int(burst or max(1, float(rate)))
+    return RATE_LIMITS.get(provider, DEFAULT_LIMIT)
+
+
+class TokenBucket:
+    """Token bucket with a priority-ordered queue of waiters."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.penalties = 0
+        self.waits = deque(maxlen=1000)   # recent queue waits, seconds
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self._waiters = []          # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self):
+        return len(self._waiters)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=INTERACTIVE, timeout=None, promoted=None):
+        """Block until a token is available; returns the seconds spent waiting.
+
+        ``promoted()`` is checked on every wakeup while queued at BACKGROUND;
+        once it returns True the ticket moves to the interactive class,
+        keeping its place among them.
+        """
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        deadline = start + (timeout if timeout is not None else MAX_WAIT[priority])
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if ticket[0] == BACKGROUND and promoted is not None and promoted():
+                        self._waiters.remove(ticket)
+                        ticket = (INTERACTIVE, ticket[1])
+                        self._waiters.append(ticket)
+                        heapq.heapify(self._waiters)
+                    head = self._waiters[0] == ticket
+                    if head and now >= self.blocked_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - start
+                    if now >= deadline:
+                        raise RateLimitTimeout(f"no token after {now - start:.1f}s")
+                    if head:
+                        delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+                    else:
+                        delay = deadline - now      # woken when the head moves
+                    self._cond.wait(min(delay, deadline - now))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def observe(self, waited):
+        with self._cond:
+            self.waits.append(waited)
+            self.wait_sum += waited
+            self.wait_count += 1
+
+    def recent_waits(self):
+        with self._cond:
+            return sorted(self.waits)
+
+    def penalize(self, seconds):
+        """Pause the bucket (upstream said 429 / Retry-After)."""
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.penalties += 1
+            self._cond.notify_all()
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_key(url):
+    """Bucket for ``url``: the provider for API endpoints, CDN_BUCKET for everything else."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host in telemetry.LOCAL_HOSTS:
+        if parts.path.strip("/").split("/")[0] in LOCAL_IMAGE_ROUTES:
+            return CDN_BUCKET
+        return telemetry.provider_for(url)
+    for endpoint, provider in API_ENDPOINTS.items():
+        api_host, _, prefix = endpoint.partition("/")
+        if (host == api_host or host.endswith("." + api_host)) and parts.path.startswith("/" + prefix):
+            return provider
+    return CDN_BUCKET
+
+
+def bucket_for(provider):
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(provider)
+            if bucket is None:
+                bucket = _buckets[provider] = TokenBucket(*_limit_for(provider))
+    return bucket
+
+
+def current_priority():
+    return BACKGROUND if concurrency.in_background() else INTERACTIVE
+
+
+def _wake_waiters():
+    # A prefetch was promoted: let its queued calls move to the interactive class
+    for bucket in list(_buckets.values()):
+        with bucket._cond:
+            bucket._cond.notify_all()
+
+
+concurrency.on_promote(_wake_waiters)
+
+
+def acquire(provider):
+    """Take a token for ``provider``, queueing at the caller's priority."""
+    if not ENABLED:
+        return 0.0
+    priority = current_priority()
+    bucket = bucket_for(provider)
+    started = time.time()
+    try:
+        waited = bucket.acquire(priority, promoted=lambda: not concurrency.in_background())
+    except RateLimitTimeout:
+        telemetry.record("rate_limit", "queue", provider, started, time.time() - started,
+                         error="RateLimitTimeout")
+        raise
+    bucket.observe(waited)
+    if waited >= 0.001:    # only real waits show up in the waterfall
+        telemetry.record("rate_limit", "queue", provider, started, waited,
+                         detail="background" if priority == BACKGROUND else "interactive")
+    return waited
+
+
+def retry_after(response, default=1.0):
+    """Seconds from a Retry-After header (delta or HTTP date), capped at MAX_PENALTY."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            seconds = default
+    return min(max(seconds, 0.0), MAX_PENALTY)
+
+
+def penalize(provider, seconds):
+    """Pause ``provider`` for everyone; with limiting off only the caller sleeps."""
+    if ENABLED:
+        bucket_for(provider).penalize(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def _collect():
+    buckets = sorted(_buckets.items())
+    depth = [("", {"provider": p}, b.depth) for p, b in buckets]
+    penalties = [("", {"provider": p}, b.penalties) for p, b in buckets]
+    waits = []
+    for p, b in buckets:
+        recent = b.recent_waits()
+        for q in (0.5, 0.95, 0.99):
+            waits.append(("", {"provider": p, "quantile": q}, telemetry.percentile(recent, q * 100)))
+        waits.append(("_sum", {"provider": p}, b.wait_sum))
+        waits.append(("_count", {"provider": p}, b.wait_count))
+    return [
+        ("styletwin_rate_limit_queue_depth", "gauge",
+         "Requests currently waiting for a rate-limit token.", depth),
+        ("styletwin_rate_limit_wait_seconds", "summary",
+         "Time spent queued for a rate-limit token.", waits),
+        ("styletwin_rate_limit_penalties_total", "counter",
+         "Times a provider was paused for a 429 / Retry-After.", penalties),
+    ]
+
+
+telemetry.register_collector(_collect)
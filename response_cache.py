@@ -0,0 +1,213 @@
+"""On-disk HTTP response cache with conditional revalidation.
+
+Used for the mostly-static TMDB and Last.fm JSON. Fresh entries (per the
+upstream Cache-Control max-age / Expires) are served from disk; stale ones
+are revalidated with If-None-Match / If-Modified-Since so a 304 only costs
+headers. The cache is size-capped and evicts least-recently-used entries.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import http_client
+import telemetry
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".http_cache")
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+DEFAULT_TTL = 10 * 60   # used when upstream sends no freshness info
+
+# Query params that never belong in a cache key or on disk
+SECRET_PARAMS = {"api_key", "key"}
+
+
+def _parse_cache_control(value):
+    directives = {}
+    for part in (value or "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip()] = arg.strip().strip('"')
+    return directives
+
+
+def _freshness_lifetime(headers, default_ttl):
+    cc = _parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in cc:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if cc.get(name, "").isdigit():
+            return int(cc[name])
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0, parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    return default_ttl
+
+
+def _is_storable(response):
+    cc = _parse_cache_control(response.headers.get("Cache-Control"))
+    return response.status_code == 200 and "no-store" not in cc and "private" not in cc
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0,
+                      "stores": 0, "evictions": 0}
+        self._index = None          # key -> size on disk, in LRU order
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    # --- index / disk -------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        self._index = OrderedDict()
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+        self._total_bytes = sum(self._index.values())
+
+    def _read(self, key):
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(self._path(key))   # persist LRU order across restarts
+                return entry
+            except (OSError, ValueError):
+                self._drop(key)
+                return None
+
+    def _write(self, key, entry):
+        data = json.dumps(entry).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._load_index()
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self.stats["stores"] += 1
+            while self._total_bytes > self.max_bytes and self._index:
+                oldest = next(iter(self._index))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    # --- public -------------------------------------------------------
+    @staticmethod
+    def cache_key(url, params=None):
+        params = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+        raw = url + "?" + urlencode(sorted(params.items()), doseq=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, url, params=None, default_ttl=DEFAULT_TTL, **kwargs):
+        """Cached ``http_client.get``; returns a ``requests.Response``."""
+        with telemetry.span("response_cache", "cache", telemetry.provider_for(url)) as span:
+            return self._get(span, url, params, default_ttl, **kwargs)
+
+    def _get(self, span, url, params, default_ttl, **kwargs):
+        key = self.cache_key(url, params)
+        entry = self._read(key)
+
+        if entry and entry["expires_at"] > time.time():
+            self.stats["hits"] += 1
+            span.cache = "hit"
+            return self._to_response(url, entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = http_client.get(url, params=params, headers=headers, **kwargs)
+
+        if entry and resp.status_code == 304:
+            self.stats["revalidations"] += 1
+            span.cache = "revalidated"
+            lifetime = _freshness_lifetime(resp.headers, default_ttl)
+            entry["expires_at"] = time.time() + lifetime
+            entry["etag"] = resp.headers.get("ETag", entry.get("etag"))
+            entry["last_modified"] = resp.headers.get("Last-Modified", entry.get("last_modified"))
+            self._write(key, entry)
+            return self._to_response(url, entry)
+
+        self.stats["misses"] += 1
+        span.cache = "miss"
+        if _is_storable(resp):
+            self._write(key, {
+                "status": resp.status_code,
+                "content_type": resp.headers.get("Content-Type", "application/json"),
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "expires_at": time.time() + _freshness_lifetime(resp.headers, default_ttl),
+                "body": resp.text,
+            })
+        return resp
+
+    @staticmethod
+    def _to_response(url, entry):
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp._content = entry["body"].encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.headers = CaseInsensitiveDict({"Content-Type": entry["content_type"]})
+        resp.url = url
+        return resp
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._drop(key)
+
+
+_default_cache = ResponseCache()
+
+
+def get(url, params=None, default_ttl=DEFAULT_TTL, **kwargs):
+    return _default_cache.get(url, params=params, default_ttl=default_ttl, **kwargs)
+
+
+def stats():
+    return dict(_default_cache.stats)
+
+
+def clear():
+    _default_cache.clear()
@@ -0,0 +1,82 @@
+"""Compact records for what a Streamlit session keeps between reruns.
+
+st.session_state lives as long as a browser tab, so with hundreds of live
+sessions the similar-movie and outfit lists are most of a worker's memory.
+Sessions store them as slotted records holding only the fields the UI
+reads, instead of the dicts media_api returns. Long strings (overviews,
+titles, image URLs) go through a process-wide table, so sessions that
+saw the same movie or look share one copy even when each got it from a
+separate JSON decode. The image dicts that palettes, embeddings and the
+coverflow expect are rebuilt per rerun with ``outfit_images``.
+"""
+import threading
+from collections import OrderedDict
+
+SHARED_MAX = 50000                # distinct strings kept in the shared table (LRU)
+
+_shared = OrderedDict()
+_shared_lock = threading.Lock()
+
+
+def share(value):
+    """The process-wide copy of string ``value`` (``value`` itself when first seen)."""
+    if not value:
+        return value
+    with _shared_lock:
+        found = _shared.get(value)
+        if found is None:
+            _shared[value] = found = value
+            if len(_shared) > SHARED_MAX:
+                _shared.popitem(last=False)
+        else:
+            _shared.move_to_end(value)
+        return found
+
+
+class Movie:
+    """One "You Might Also Like" row (from ``media_api.format_movie``)."""
+    __slots__ = ("id", "title", "overview", "poster")
+
+    def __init__(self, id, title, overview, poster):
+        self.id = id
+        self.title = title
+        self.overview = overview
+        self.poster = poster
+
+    @classmethod
+    def from_dict(cls, m):
+        return cls(m.get("id"), share(m.get("title")), share(m.get("overview") or ""), share(m.get("poster")))
+
+
+class Outfit:
+    """One look: the two image URLs the coverflow uses and the provider."""
+    __slots__ = ("regular", "small", "provider")
+
+    def __init__(self, regular, small, provider):
+        self.regular = regular
+        self.small = small
+        self.provider = provider
+
+    @classmethod
+    def from_image(cls, img):
+        urls = img["urls"]
+        small = urls.get("small")
+        return cls(share(urls["regular"]), share(small) if small != urls["regular"] else None,
+                   img.get("provider"))
+
+    def image(self):
+        # Same shape as media_api.normalize_image
+        small = self.small or self.regular
+        return {"urls": {"regular": self.regular, "small": small, "thumb": small}, "provider": self.provider}
+
+
+def compact_movies(movies):
+    return [Movie.from_dict(m) for m in movies if m]
+
+
+def compact_outfits(images):
+    return [Outfit.from_image(img) for img in images]
+
+
+def outfit_images(outfits):
+    return [o.image() for o in outfits]
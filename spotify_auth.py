@@ -0,0 +1,121 @@
+"""Process-wide Spotify client-credentials token manager.
+
+Tokens are reused until shortly before ``expires_in`` runs out, refreshed
+early in the background, and concurrent callers share a single refresh.
+"""
+import base64
+import threading
+import time
+from concurrent.futures import Future
+
+import http_client
+from config import SPOTIFY_ACCOUNTS_BASE
+
+TOKEN_URL = f"{SPOTIFY_ACCOUNTS_BASE}/api/token"
+REFRESH_MARGIN = 5 * 60     # refresh in the background this long before expiry
+EXPIRY_SAFETY = 30          # treat the token as expired this long before expiry
+REFRESH_WAIT = 15           # max seconds a caller waits on an in-flight refresh
+
+
+class SpotifyTokenManager:
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_count = 0
+        self._token = None
+        self._expires_at = 0.0
+        self._inflight = None
+        self._lock = threading.Lock()
+
+    def _fetch_token(self):
+        auth_header = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        resp = http_client.post(
+            TOKEN_URL,
+            headers={"Authorization": f"Basic {auth_header}"},
+            data={"grant_type": "client_credentials"},
+        )
+        data = resp.json()
+        return data.get("access_token"), int(data.get("expires_in", 3600))
+
+    def _refresh(self, future):
+        token = None
+        try:
+            token, expires_in = self._fetch_token()
+            if token:
+                with self._lock:
+                    self._token = token
+                    self._expires_at = time.monotonic() + expires_in - EXPIRY_SAFETY
+                    self.refresh_count += 1
+        except Exception:
+            token = None
+        finally:
+            with self._lock:
+                self._inflight = None
+            future.set_result(token)
+
+    def get_token(self):
+        """Return a valid access token, or None if Spotify can't issue one."""
+        with self._lock:
+            now = time.monotonic()
+            if self._token and now < self._expires_at - REFRESH_MARGIN:
+                return self._token
+
+            if self._token and now < self._expires_at:
+                # Still valid: keep serving it and refresh early off the hot path
+                if self._inflight is None:
+                    self._inflight = Future()
+                    threading.Thread(target=self._refresh, args=(self._inflight,),
+                                     daemon=True).start()
+                return self._token
+
+            future = self._inflight
+            leader = future is None
+            if leader:
+                future = self._inflight = Future()
+
+        if leader:
+            self._refresh(future)
+        try:
+            return future.result(timeout=REFRESH_WAIT)
+        except Exception:
+            return None
+
+    def invalidate(self, token):
+        """Drop ``token`` (e.g. after a 401) so the next caller fetches a new one."""
+        with self._lock:
+            if token and token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def get(self, url, token=None, **kwargs):
+        """GET with a bearer token, retrying once with a fresh token on 401."""
+        token = token or self.get_token()
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Authorization"] = f"Bearer {token}"
+        resp = http_client.get(url, headers=headers, **kwargs)
+        if resp.status_code == 401:
+            self.invalidate(token)
+            token = self.get_token()
+            if token:
+                headers["Authorization"] = f"Bearer {token}"
+                resp = http_client.get(url, headers=headers, **kwargs)
+        return resp
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(client_id, client_secret):
+    """One shared manager per client id, for the life of the process."""
+    with _managers_lock:
+        manager = _managers.get(client_id)
+        if manager is None or manager.client_secret != client_secret:
+            manager = _managers[client_id] = SpotifyTokenManager(client_id, client_secret)
+        return manager
+
+
+def reset():
+    """Forget every manager and its token (tests / benchmarks)."""
+    with _managers_lock:
+        _managers.clear()
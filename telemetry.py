@@ -0,0 +1,291 @@
+"""In-process tracing and latency metrics for outbound calls.
+
+Every HTTP request made through http_client, every traced helper and every
+UI flow records a span (timing, status code, bytes, cache result) into a
+bounded ring buffer. Spans started during one Streamlit rerun share a trace
+id, so the debug sidebar can draw that rerun's waterfall. Metrics are
+available as Prometheus text or JSON on demand, and optionally over HTTP
+(``start_exporter`` / ``METRICS_PORT``).
+"""
+import contextvars
+import functools
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+RING_SIZE = int(os.environ.get("TRACE_RING_SIZE", 5000))
+
+_spans = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_parent_id = contextvars.ContextVar("parent_id", default=None)
+
+# Cumulative (monotonic) counters for Prometheus; the ring only holds recent spans
+_requests_total = Counter()        # (provider, status) -> n
+_bytes_total = Counter()           # provider -> bytes
+_duration_sum = Counter()          # provider -> seconds
+_cache_total = Counter()           # (cache, result) -> n
+
+# Extra metric sources (e.g. rate_limit): fn() -> [(name, type, help, [(suffix, labels, value)])]
+_collectors = []
+
+PROVIDER_HOSTS = {
+    "themoviedb.org": "tmdb",
+    "tmdb.org": "tmdb",
+    "spotify.com": "spotify",
+    "audioscrobbler.com": "lastfm",
+    "qloo.com": "qloo",
+    "unsplash.com": "unsplash",
+    "pexels.com": "pexels",
+    "pixabay.com": "pixabay",
+    "imgbb.com": "imgbb",
+}
+LOCAL_HOSTS = {"127.0.0.1", "localhost"}
+
+
+def provider_for(url):
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if host in LOCAL_HOSTS:
+        # Stand-in server: provider is the first path segment (/tmdb/3/..., /spotify/v1/...)
+        return parts.path.strip("/").split("/")[0].split("-")[0] or host
+    for suffix, provider in PROVIDER_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return host
+
+
+class Span:
+    __slots__ = ("id", "parent_id", "trace_id", "name", "kind", "provider",
+                 "start", "duration", "status", "bytes", "cache", "error", "detail")
+
+    def __init__(self, name, kind, provider):
+        self.id = next(_ids)
+        self.parent_id = _parent_id.get()
+        self.trace_id = _trace_id.get()
+        self.name = name
+        self.kind = kind
+        self.provider = provider
+        self.start = time.time()
+        self.duration = None
+        self.status = None
+        self.bytes = None
+        self.cache = None
+        self.error = None
+        self.detail = None            # free-form note (queue priority, batch size); status is HTTP only
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+def _record(span):
+    with _lock:
+        _spans.append(span)
+        if span.kind == "http":
+            _requests_total[(span.provider, str(span.status or "error"))] += 1
+            _bytes_total[span.provider] += span.bytes or 0
+            _duration_sum[span.provider] += span.duration
+        if span.cache:
+            _cache_total[(span.kind if span.kind != "cache" else span.name, span.cache)] += 1
+
+
+@contextmanager
+def span(name, kind="helper", provider=None):
+    """Time a block; set ``.status``, ``.bytes``, ``.cache``, ``.detail`` on the yielded span."""
+    s = Span(name, kind, provider)
+    token = _parent_id.set(s.id)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except Exception as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - t0
+        _parent_id.reset(token)
+        _record(s)
+
+
+def record(name, kind, provider, start, duration, **attrs):
+    """Record an already-finished span (``start`` is wall-clock seconds)."""
+    s = Span(name, kind, provider)
+    s.start = start
+    s.duration = duration
+    for key, value in attrs.items():
+        setattr(s, key, value)
+    _record(s)
+
+
+def traced(provider=None, name=None):
+    """Decorator: record a helper span around every call."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, "helper", provider):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_trace():
+    """Begin a new trace (one per Streamlit rerun); returns its id."""
+    trace_id = uuid.uuid4().hex[:12]
+    _trace_id.set(trace_id)
+    _parent_id.set(None)
+    return trace_id
+
+
+def trace_spans(trace_id):
+    with _lock:
+        return [s for s in _spans if s.trace_id == trace_id]
+
+
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+def percentile(values, pct):
+    """Nearest-rank percentile (``pct`` in 0-100); 0.0 for no values. Shared with the benchmarks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def provider_latency(kind="http"):
+    """{provider: {"count", "p50", "p95", "p99", "errors"}} over the ring buffer (seconds)."""
+    durations, errors = defaultdict(list), Counter()
+    with _lock:
+        spans = list(_spans)
+    for s in spans:
+        if s.kind != kind:
+            continue
+        durations[s.provider].append(s.duration)
+        if s.error or (s.status and s.status >= 400):
+            errors[s.provider] += 1
+    return {
+        p: {"count": len(d), "p50": percentile(d, 50), "p95": percentile(d, 95),
+            "p99": percentile(d, 99), "errors": errors[p]}
+        for p, d in sorted(durations.items(), key=lambda kv: str(kv[0]))
+    }
+
+
+def register_collector(fn):
+    """Add a metric source; see ``_collectors`` for the shape ``fn`` returns."""
+    _collectors.append(fn)
+
+
+def _collected():
+    for fn in _collectors:
+        yield from fn()
+
+
+def metrics_json():
+    with _lock:
+        totals = {
+            "requests": {f"{p}:{s}": n for (p, s), n in _requests_total.items()},
+            "bytes": dict(_bytes_total),
+            "cache": {f"{c}:{r}": n for (c, r), n in _cache_total.items()},
+        }
+    extra = {name: [dict(labels, value=value, **({"series": suffix} if suffix else {}))
+                    for suffix, labels, value in samples]
+             for name, _, _, samples in _collected()}
+    return json.dumps({"latency": provider_latency(), "helpers": provider_latency("helper"),
+                       "totals": totals, **extra}, indent=2, default=str)
+
+
+def _labels(**kv):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in kv.items()) + "}"
+
+
+def prometheus_text():
+    lines = [
+        "# HELP styletwin_http_request_duration_seconds Outbound request latency (recent window).",
+        "# TYPE styletwin_http_request_duration_seconds summary",
+    ]
+    with _lock:
+        duration_sum = dict(_duration_sum)
+        requests_total = dict(_requests_total)
+        bytes_total = dict(_bytes_total)
+        cache_total = dict(_cache_total)
+    counts = Counter()
+    for (provider, _), n in requests_total.items():
+        counts[provider] += n
+    for provider, stats in provider_latency().items():
+        for q, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+            lines.append(f"styletwin_http_request_duration_seconds"
+                         f"{_labels(provider=provider, quantile=quantile)} {stats[q]:.6f}")
+        lines.append(f"styletwin_http_request_duration_seconds_sum{_labels(provider=provider)} "
+                     f"{duration_sum.get(provider, 0.0):.6f}")
+        lines.append(f"styletwin_http_request_duration_seconds_count{_labels(provider=provider)} "
+                     f"{counts.get(provider, 0)}")
+
+    lines += ["# HELP styletwin_http_requests_total Outbound requests by status.",
+              "# TYPE styletwin_http_requests_total counter"]
+    for (provider, status), n in sorted(requests_total.items(), key=str):
+        lines.append(f"styletwin_http_requests_total{_labels(provider=provider, status=status)} {n}")
+
+    lines += ["# HELP styletwin_http_response_bytes_total Response body bytes received.",
+              "# TYPE styletwin_http_response_bytes_total counter"]
+    for provider, n in sorted(bytes_total.items(), key=str):
+        lines.append(f"styletwin_http_response_bytes_total{_labels(provider=provider)} {n}")
+
+    lines += ["# HELP styletwin_cache_events_total Cache lookups by result.",
+              "# TYPE styletwin_cache_events_total counter"]
+    for (cache, result), n in sorted(cache_total.items(), key=str):
+        lines.append(f"styletwin_cache_events_total{_labels(cache=cache, result=result)} {n}")
+
+    for name, kind, help_text, samples in _collected():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{_labels(**labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------------------------
+# Optional HTTP exporter
+# -------------------------------------------------------------------
+_exporter = None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = metrics_json().encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = prometheus_text().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_exporter(port=None, host="127.0.0.1"):
+    """Serve /metrics and /metrics.json on ``port`` (once per process)."""
+    global _exporter
+    port = port or os.environ.get("METRICS_PORT")
+    if _exporter is not None or not port:
+        return _exporter
+    with _lock:
+        if _exporter is None:
+            _exporter = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            _exporter.daemon_threads = True
+            threading.Thread(target=_exporter.serve_forever, daemon=True).start()
+    return _exporter
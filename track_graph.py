@@ -0,0 +1,224 @@
+"""Persistent similar-track graph behind get_similar_songs.
+
+Tracks resolved through Last.fm get small integer IDs, and their
+track.getsimilar results are kept as weighted edges in CSR form: an
+``indptr`` row-offset array plus ``indices`` / ``weights`` arrays holding
+neighbour IDs and Last.fm match scores. The graph is saved as one .npz
+file, so it survives restarts. A repeat query is answered from the graph
+without calling Last.fm. Friends-of-friends are ranked locally by summing
+match scores along paths (a two-hop path scores ``match1 * match2``).
+Edits only mark the graph dirty; it is written off the request path at
+most every SAVE_DELAY seconds, and once more at exit.
+Rows older than TRACK_GRAPH_TTL are still served, and get_similar_songs
+refetches them in the background.
+"""
+import atexit
+import os
+import threading
+import time
+
+import numpy as np
+
+from typeahead import normalize
+
+GRAPH_PATH = os.environ.get("TRACK_GRAPH_PATH", os.path.join(".track_graph", "graph.npz"))
+TTL = int(os.environ.get("TRACK_GRAPH_TTL", 7 * 24 * 3600))
+FETCH_LIMIT = 30                  # similar tracks stored per fetched track
+HOPS = 2
+FRONTIER = 16                     # best tracks expanded on each further hop
+SAVE_DELAY = 5.0                  # seconds; edits within this window are written together
+
+
+class TrackGraph:
+    def __init__(self, path=GRAPH_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()     # one writer at a time; taken before _lock
+        self._save_timer = None
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.tracks = []              # id -> (title, artist, url)
+        self._ids = {}                # (normalized title, normalized artist) -> id
+        self._aliases = {}            # normalized query text -> id
+        # Node arrays have spare capacity (grown by doubling); only the first
+        # len(tracks) (+ 1 for indptr) entries are in use
+        self._indptr = np.zeros(65, np.int64)
+        self._indices = np.zeros(0, np.int32)
+        self._weights = np.zeros(0, np.float32)
+        self._fetched = np.zeros(64, np.float64)  # id -> unix time of its edges, 0 = never fetched
+        self._loaded = False
+        self._dirty = False
+
+    # --- disk ---------------------------------------------------------
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with np.load(self.path) as data:
+                tracks = list(zip(data["titles"].tolist(), data["artists"].tolist(), data["urls"].tolist()))
+                indptr, indices = data["indptr"], data["indices"]
+                if len(indptr) != len(tracks) + 1 or indptr[-1] != len(indices):
+                    return                # foreign or half-written file: start empty
+                capacity = max(64, 1 << len(tracks).bit_length())
+                self._indptr = np.zeros(capacity + 1, np.int64)
+                self._indptr[:len(indptr)] = indptr
+                self._fetched = np.zeros(capacity, np.float64)
+                self._fetched[:len(tracks)] = data["fetched"]
+                self._indices = indices.astype(np.int32)
+                self._weights = data["weights"].astype(np.float32)
+                aliases = zip(data["alias_keys"].tolist(), data["alias_ids"].tolist())
+        except (OSError, KeyError, ValueError):
+            return
+        self.tracks = tracks
+        self._ids = {(normalize(t), normalize(a)): i for i, (t, a, _) in enumerate(tracks)}
+        self._aliases = dict(aliases)
+
+    def _mark_dirty(self):
+        # Called under _lock; the write happens on a timer thread
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending edits to disk now (normally done by the save timer)."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Snapshot under the lock, write outside it; indices/weights are replaced, never mutated
+                n = len(self.tracks)
+                titles, artists, urls = zip(*self.tracks) if self.tracks else ((), (), ())
+                arrays = dict(indptr=self._indptr[:n + 1].copy(), indices=self._indices,
+                              weights=self._weights, fetched=self._fetched[:n].copy(),
+                              alias_keys=np.array(list(self._aliases), dtype=str),
+                              alias_ids=np.array(list(self._aliases.values()), np.int32))
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(tmp, "wb") as f:
+                    np.savez(f, titles=np.array(titles, dtype=str), artists=np.array(artists, dtype=str),
+                             urls=np.array(urls, dtype=str), **arrays)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass                      # the in-memory graph still works
+
+    def clear(self):
+        with self._save_lock, self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            self._reset()
+            self._loaded = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    # --- nodes --------------------------------------------------------
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self.tracks)
+
+    def _node(self, title, artist, url=None):
+        key = (normalize(title), normalize(artist))
+        node = self._ids.get(key)
+        if node is None:
+            node = self._ids[key] = len(self.tracks)
+            self.tracks.append((title, artist, url or "#"))
+            if node == len(self._fetched):         # grow by doubling
+                self._indptr = np.concatenate([self._indptr, np.zeros(len(self._fetched), np.int64)])
+                self._fetched = np.concatenate([self._fetched, np.zeros(len(self._fetched))])
+            self._indptr[node + 1] = self._indptr[node]
+            self._fetched[node] = 0.0
+            self._mark_dirty()
+        elif url and self.tracks[node][2] == "#":
+            self.tracks[node] = (title, artist, url)
+            self._mark_dirty()
+        return node
+
+    def find(self, song, artist=None):
+        """Track ID for ``song`` by ``artist``, or for a previously resolved query; None if unknown."""
+        with self._lock:
+            self._load()
+            if artist:
+                return self._ids.get((normalize(song), normalize(artist)))
+            return self._aliases.get(normalize(song))
+
+    def add_track(self, title, artist, query=None):
+        """ID for the track, added if new; ``query`` (what the user typed) becomes an alias for it."""
+        with self._lock:
+            self._load()
+            node = self._node(title, artist)
+            if query and self._aliases.get(normalize(query)) != node:
+                self._aliases[normalize(query)] = node
+                self._mark_dirty()
+            return node
+
+    # --- edges --------------------------------------------------------
+    def set_similar(self, node, similar):
+        """Replace ``node``'s edges with ``similar`` [(title, artist, url, match)] and mark them fresh."""
+        with self._lock:
+            self._load()
+            edges = {}                    # target -> match, first (best) one kept
+            for title, artist, url, match in similar:
+                target = self._node(title, artist, url)
+                if target != node:
+                    edges.setdefault(target, match)
+            start, end = self._indptr[node], self._indptr[node + 1]
+            row = np.fromiter(edges, np.int32, len(edges))
+            self._indices = np.concatenate([self._indices[:start], row, self._indices[end:]])
+            self._weights = np.concatenate([self._weights[:start],
+                                            np.fromiter(edges.values(), np.float32, len(edges)),
+                                            self._weights[end:]])
+            self._indptr[node + 1:len(self.tracks) + 1] += len(row) - (end - start)
+            self._fetched[node] = time.time()
+            self._mark_dirty()
+
+    def has_edges(self, node):
+        with self._lock:
+            self._load()
+            return self._fetched[node] > 0
+
+    def is_stale(self, node, ttl=TTL):
+        with self._lock:
+            self._load()
+            return time.time() - self._fetched[node] > ttl
+
+    def similar(self, node, limit, hops=HOPS):
+        """Tracks ranked by match score summed over paths of up to ``hops`` edges from ``node``.
+
+        Only edges already in the graph are followed; nothing is fetched.
+        """
+        with self._lock:
+            self._load()
+            indptr, indices, weights = self._indptr, self._indices, self._weights
+            scores = np.zeros(len(self.tracks), np.float32)
+            frontier, reach = np.array([node]), np.ones(1, np.float32)
+            for _ in range(hops):
+                starts, ends = indptr[frontier], indptr[frontier + 1]
+                counts = ends - starts
+                if not counts.sum():
+                    break
+                # Edge positions of every frontier row, each scaled by how strongly its row was reached
+                positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                reached = np.zeros(len(self.tracks), np.float32)
+                np.add.at(reached, indices[positions], weights[positions] * np.repeat(reach, counts))
+                reached[node] = 0
+                scores += reached
+                frontier = np.argsort(-reached, kind="stable")[:FRONTIER]
+                frontier = frontier[reached[frontier] > 0]
+                reach = reached[frontier]
+            scores[node] = 0
+            order = np.argsort(-scores, kind="stable")[:limit]
+            return [{"title": self.tracks[i][0], "artist": self.tracks[i][1], "url": self.tracks[i][2]}
+                    for i in order if scores[i] > 0]
@@ -0,0 +1,228 @@
+"""Local typeahead and fuzzy correction for movie titles, tracks and genres.
+
+Every movie and track that passes through the TMDB, Last.fm and Spotify
+helpers in media_api.py is added here with its canonical ID. Genres are
+built in. Suggestions are a bisect into a sorted list of word-suffix keys,
+so "run" finds "Blade Runner". Corrections for typos rank candidates by
+shared trigrams (Dice score). They are only ever offered as suggestions:
+a title that is not indexed yet must never be swapped for a neighbour.
+Neither touches the network, and both take well under a millisecond for
+a few thousand entries.
+
+Entries are appended to a JSONL file (``TYPEAHEAD_PATH``) and reloaded on
+the first lookup after a restart; a later line for the same movie or track
+overrides an earlier one (e.g. a Last.fm track that later got a Spotify ID).
+"""
+import bisect
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+INDEX_PATH = os.environ.get("TYPEAHEAD_PATH", os.path.join(".typeahead", "entries.jsonl"))
+MAX_SUGGESTIONS = 8
+SCAN_LIMIT = 200                  # prefix matches looked at per suggestion request
+FUZZY_MIN_SCORE = 0.5             # Dice similarity of trigram sets to accept a correction
+FUZZY_CANDIDATES = 50
+
+
+def normalize(text):
+    """Lowercase ASCII words: accents, punctuation and extra spaces dropped."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def trigrams(norm):
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def label(entry):
+    """Display text: "Title (1982)", "Track - Artist" or the genre name."""
+    if entry["kind"] == "movie" and entry.get("year"):
+        return f"{entry['name']} ({entry['year']})"
+    if entry["kind"] == "track" and entry.get("artist"):
+        return f"{entry['name']} - {entry['artist']}"
+    return entry["name"]
+
+
+def _entry_key(entry):
+    extra = entry.get("year") if entry["kind"] == "movie" else entry.get("artist")
+    return entry["kind"], normalize(f"{entry['name']} {extra or ''}")
+
+
+class TypeaheadIndex:
+    def __init__(self, path=INDEX_PATH, builtin=()):
+        self.path = path
+        self.entries = []
+        self._builtin = list(builtin)
+        self._rows = {}               # (kind, normalized name) -> row
+        self._keys = []               # sorted (key, row) word-suffix keys
+        self._grams = {}              # trigram -> [row]
+        self._gram_counts = []        # row -> number of distinct trigrams in its name
+        self._exact = {}              # normalized name -> [row]
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        for entry in self._builtin:
+            self._put(entry)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._put(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue          # torn or foreign line
+        except OSError:
+            pass
+
+    def _put(self, entry):
+        """Insert or update ``entry``; True if anything changed."""
+        key = _entry_key(entry)
+        row = self._rows.get(key)
+        if row is not None:
+            old = self.entries[row]
+            if all(old.get(k) == v for k, v in entry.items() if v is not None):
+                return False
+            old.update({k: v for k, v in entry.items() if v is not None})
+            return True
+        row = len(self.entries)
+        self.entries.append(entry)
+        self._rows[key] = row
+        norm = normalize(entry["name"])
+        self._exact.setdefault(norm, []).append(row)
+        words = norm.split()
+        for i in range(len(words)):
+            bisect.insort(self._keys, (" ".join(words[i:]), row))
+        grams = trigrams(norm)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(row)
+        return True
+
+    def add(self, entries):
+        """Add or update entries (dicts with kind, name and optional id/year/artist/genre_ids)."""
+        with self._lock:
+            self._load()
+            changed = [e for e in entries if e.get("name") and self._put(dict(e))]
+            if not changed:
+                return 0
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in changed)
+            except OSError:
+                pass                      # the in-memory index still works
+            return len(changed)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self.entries)
+
+    def suggest(self, text, kinds=None, limit=MAX_SUGGESTIONS):
+        """Entries whose name (or a later word of it) starts with ``text``, best first."""
+        norm = normalize(text)
+        if not norm:
+            return []
+        with self._lock:
+            self._load()
+            start = bisect.bisect_left(self._keys, (norm, -1))
+            seen, found = set(), []
+            for key, row in self._keys[start:start + SCAN_LIMIT]:
+                if not key.startswith(norm):
+                    break
+                entry = self.entries[row]
+                if row in seen or (kinds and entry["kind"] not in kinds):
+                    continue
+                seen.add(row)
+                # Whole-name prefixes first, then shorter names
+                found.append((normalize(entry["name"]) != key, len(key), row))
+            return [self.entries[row] for *_, row in sorted(found)[:limit]]
+
+    def corrections(self, text, kinds=None, limit=MAX_SUGGESTIONS):
+        """Entries spelled like ``text`` by trigram similarity (>= FUZZY_MIN_SCORE), best first."""
+        norm = normalize(text)
+        if not norm:
+            return []
+        query = trigrams(norm)
+        with self._lock:
+            self._load()
+            shared = Counter()
+            for gram in query:
+                shared.update(self._grams.get(gram, ()))
+            scored = []
+            for row, count in shared.most_common(FUZZY_CANDIDATES * 4):
+                entry = self.entries[row]
+                if kinds and entry["kind"] not in kinds:
+                    continue
+                score = 2 * count / (len(query) + self._gram_counts[row])
+                if score >= FUZZY_MIN_SCORE and normalize(entry["name"]) != norm:
+                    scored.append((-score, row))
+            return [self.entries[row] for _, row in sorted(scored)[:limit]]
+
+    def exact(self, text, kinds=None):
+        """The one entry named exactly ``text`` (ignoring case and punctuation), else None.
+
+        Ambiguous names (two movies called "Alien" with different ids) give None.
+        """
+        norm = normalize(text)
+        with self._lock:
+            self._load()
+            found = [self.entries[r] for r in self._exact.get(norm, ())
+                     if not kinds or self.entries[r]["kind"] in kinds]
+        return found[0] if len(found) == 1 else None
+
+
+# -------------------------------------------------------------------
+# Process-wide index, fed by media_api
+# -------------------------------------------------------------------
+def _builtin_genres():
+    from style_data import genre_options
+    return [{"kind": "genre", "name": g, "id": g} for g in genre_options]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TypeaheadIndex(builtin=_builtin_genres())
+    return _index
+
+
+def add_tmdb_movies(results):
+    """Index raw TMDB movie results (search, recommendations, discover, details)."""
+    get_index().add([{
+        "kind": "movie", "name": m["title"], "id": m.get("id"),
+        "year": (m.get("release_date") or "")[:4] or None,
+        "genre_ids": m.get("genre_ids") or [g["id"] for g in m.get("genres", [])] or None,
+    } for m in results if m.get("title")])
+
+
+def add_tracks(tracks):
+    """Index tracks as {"title", "artist", "id"?} (Spotify id when known)."""
+    get_index().add([{"kind": "track", "name": t["title"], "artist": t.get("artist"), "id": t.get("id")}
+                     for t in tracks if t.get("title") and t.get("title") != "Unknown"])
+
+
+def suggest(text, kinds=None, limit=MAX_SUGGESTIONS):
+    return get_index().suggest(text, kinds, limit)
+
+
+def corrections(text, kinds=None, limit=MAX_SUGGESTIONS):
+    return get_index().corrections(text, kinds, limit)
+
+
+def exact(text, kinds=None):
+    return get_index().exact(text, kinds)
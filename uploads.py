@@ -0,0 +1,184 @@
+"""Streaming, content-deduplicated image upload to imgbb.
+
+Uploads are keyed by the SHA-256 of the original file, hashed in chunks.
+A persistent index maps that hash to the hosted URL, so uploading the same
+photo again costs no network and no re-encoding. Oversized photos are
+downscaled and re-encoded as JPEG before sending. The request body is
+streamed as multipart from a spooled temp file instead of being base64
+encoded in memory, so peak memory per upload stays bounded by roughly one
+decoded (draft-reduced) image plus SPOOL_BYTES.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+from PIL import Image, ImageOps
+
+import http_client
+from config import IMGBB_API_BASE
+
+INDEX_PATH = os.environ.get("UPLOAD_INDEX_PATH", os.path.join(".upload_cache", "imgbb_index.json"))
+CHUNK_BYTES = 1024 * 1024
+SPOOL_BYTES = 2 * 1024 * 1024     # re-encoded bodies larger than this spill to disk
+MAX_DIMENSION = 2048              # longest side sent upstream
+MAX_UPLOAD_BYTES = 4 * 1024 * 1024
+PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+JPEG_QUALITY = 85
+MAX_PIXELS = 80_000_000           # refuse decompression bombs before decoding
+
+
+def sha256_file(fileobj):
+    """Hex SHA-256 of a seekable file, read in CHUNK_BYTES pieces; rewinds after."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(CHUNK_BYTES), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _size(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def prepare_image(fileobj):
+    """Return ``(file, content_type)`` ready to send: the original when it is
+    small enough, else a downscaled JPEG in a spooled temp file."""
+    size = _size(fileobj)
+    with Image.open(fileobj) as img:          # header only; pixels load lazily
+        if img.width * img.height > MAX_PIXELS:
+            raise ValueError(f"image too large: {img.width}x{img.height}")
+        fits = max(img.size) <= MAX_DIMENSION and size <= MAX_UPLOAD_BYTES
+        if fits and img.format in PASSTHROUGH_FORMATS:
+            fileobj.seek(0)
+            return fileobj, Image.MIME.get(img.format, "application/octet-stream")
+
+        img.draft("RGB", (MAX_DIMENSION, MAX_DIMENSION))   # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    out.seek(0)
+    return out, "image/jpeg"
+
+
+class MultipartStream:
+    """File-like multipart/form-data body with a known length.
+
+    requests sends it with a Content-Length and reads it in blocks, so the
+    file is never held in memory as a whole. ``seek(0)`` rewinds for a retry.
+    """
+
+    def __init__(self, field, filename, fileobj, content_type):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        head = (f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n").encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._file = fileobj
+        self._file_size = _size(fileobj)
+        self._parts = [head, None, tail]     # None = the file
+        self._length = len(head) + self._file_size + len(tail)
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if offset != 0 or whence != os.SEEK_SET:
+            raise OSError("MultipartStream only rewinds to the start")
+        self._part = 0
+        self._pos = 0
+        self._file.seek(0)
+        return 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        out = []
+        while size > 0 and self._part < len(self._parts):
+            part = self._parts[self._part]
+            if part is None:
+                chunk = self._file.read(size)
+            else:
+                chunk = part[self._pos:self._pos + size]
+                self._pos += len(chunk)
+            if not chunk:
+                self._part += 1
+                self._pos = 0
+                continue
+            out.append(chunk)
+            size -= len(chunk)
+        return b"".join(out)
+
+
+class UploadIndex:
+    """Persistent SHA-256 -> hosted URL map (JSON, replaced atomically)."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._urls = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._urls is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._urls = json.load(f)
+            except (OSError, ValueError):
+                self._urls = {}
+
+    def get(self, digest):
+        with self._lock:
+            self._load()
+            return self._urls.get(digest)
+
+    def set(self, digest, url):
+        with self._lock:
+            self._load()
+            self._urls[digest] = url
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._urls, f)
+            os.replace(tmp, self.path)
+
+
+_index = UploadIndex()
+stats = {"hits": 0, "uploads": 0, "reencoded": 0, "bytes_sent": 0}
+
+
+def upload_image(fileobj, api_key, filename="upload.jpg"):
+    """Hosted URL for the image in ``fileobj`` (seekable), uploading only if new."""
+    digest = sha256_file(fileobj)
+    url = _index.get(digest)
+    if url:
+        stats["hits"] += 1
+        return url
+
+    body_file, content_type = prepare_image(fileobj)
+    try:
+        if body_file is not fileobj:
+            stats["reencoded"] += 1
+            filename = os.path.splitext(filename)[0] + ".jpg"
+        body = MultipartStream("image", filename, body_file, content_type)
+        response = http_client.post(f"{IMGBB_API_BASE}/upload", params={"key": api_key},
+                                    data=body, headers={"Content-Type": body.content_type})
+        stats["uploads"] += 1
+        stats["bytes_sent"] += len(body)
+    finally:
+        if body_file is not fileobj:
+            body_file.close()
+
+    data = response.json()
+    url = data["data"]["url"] if data.get("data") else None
+    if url:
+        _index.set(digest, url)
+    return url